@@ -0,0 +1,48 @@
+"""Configuration des bases SQLite pour la production.
+
+Chaque connexion applique des pragmas adaptés à un site à écritures concurrentes :
+
+- journal WAL : les lecteurs ne bloquent plus l'écrivain et inversement ;
+- busy_timeout : une écriture attend le verrou au lieu d'échouer avec « database is locked » ;
+- synchronous=NORMAL : sûr en WAL, un fsync par checkpoint au lieu d'un par transaction ;
+- mmap_size et cache_size : pages lues depuis la mémoire plutôt que par appels système.
+
+Les transactions démarrent en mode IMMEDIATE : une transaction qui lit puis écrit
+prend le verrou d'écriture dès le BEGIN. En mode DEFERRED (par défaut), deux
+transactions de ce type peuvent s'interbloquer ; SQLite fait alors échouer l'une
+d'elles immédiatement, sans tenir compte de busy_timeout.
+"""
+BUSY_TIMEOUT = 5  # Secondes d'attente du verrou d'écriture
+
+PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': BUSY_TIMEOUT * 1000,  # En millisecondes
+    'mmap_size': 256 * 1024 * 1024,  # 256 Mo de fichier projetés en mémoire
+    'cache_size': -64 * 1024,  # Valeur négative : taille en Kio (64 Mo de cache de pages)
+    'temp_store': 'MEMORY',  # Tris et index temporaires en mémoire
+}
+
+CONN_MAX_AGE = 600  # Connexions persistantes : réutilisées pendant 10 minutes
+
+
+def sqlite_database(path, read_only=False, **pragmas):
+    """Retourne une entrée de DATABASES pour un fichier SQLite avec les pragmas de production.
+
+    `read_only` ajoute query_only (utilisé pour la réplique de lecture) ; les
+    arguments nommés remplacent ou complètent les pragmas par défaut.
+    """
+    pragmas = {**PRAGMAS, **pragmas}
+    if read_only:
+        pragmas['query_only'] = 'ON'
+    return {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': path,
+        'CONN_MAX_AGE': CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,  # Une connexion persistante coupée est rouverte au lieu de faire échouer la requête
+        'OPTIONS': {
+            'timeout': BUSY_TIMEOUT,
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': ';'.join(f'PRAGMA {name} = {value}' for name, value in pragmas.items()),
+        },
+    }
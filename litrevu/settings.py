@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from .database import sqlite_database
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -48,18 +51,27 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'reviews.db_routing.ReplicaStickinessMiddleware',  # Lecture de ses propres écritures après un POST
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'reviews.profiling.ProfilingMiddleware',  # En dernier : mesure la vue, ses requêtes SQL et ses templates
 ]
 
 ROOT_URLCONF = 'litrevu.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'reviews.profiling.ProfiledDjangoTemplates',  # DjangoTemplates avec mesure du temps de rendu
         'DIRS': [],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Templates compilés une fois par processus. Explicite pour rester actif quel que soit DEBUG ;
+            # en développement, l'autoreload de runserver vide ce cache quand un template change.
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -72,22 +84,80 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'litrevu.wsgi.application'
 
+# Tâches d'arrière-plan (reviews.tasks) : fan-out du flux, abonnements, index de recherche
+TASK_WORKERS = 2  # Threads du pool de chaque processus web ; 0 pour laisser la file aux workers run_tasks
+TASK_MAX_ATTEMPTS = 3  # Essais avant de laisser une tâche en échec
+TASK_RETRY_DELAY = 5  # Délai avant le deuxième essai (secondes), doublé à chaque essai
+TASKS_EAGER = False  # True : tâches exécutées immédiatement dans la requête (tests)
+
+# Profilage des requêtes (reviews.profiling)
+PROFILING_SLOW_MS = 500  # Requêtes journalisées au-delà de ce temps de vue (millisecondes)
+PROFILING_SLOW_LOG = BASE_DIR / 'slow_requests.jsonl'  # Journal JSONL des requêtes lentes (None pour le désactiver)
+PROFILING_MEMORY_SAMPLE_RATE = 0.01  # Part des requêtes dont la mémoire est tracée (tracemalloc ralentit la requête)
+PROFILING_BUFFER_SIZE = 5000  # Dernières requêtes gardées pour les percentiles de /admin/profiling/
+
 # Configuration de l'authentification
 LOGIN_URL = 'login'  # Utilisé pour rediriger vers la page de connexion
 LOGIN_REDIRECT_URL = 'feed'  # Redirection après une connexion réussie
 LOGOUT_REDIRECT_URL = 'login'  # Redirection après une déconnexion
+AUTHENTICATION_BACKENDS = [
+    'reviews.auth_cache.CachedModelBackend',  # ModelBackend avec l'utilisateur connecté en cache (reviews/auth_cache.py)
+    # Backend enregistré dans les sessions ouvertes avant le cache : elles restent valides (sans cache)
+    # jusqu'à la prochaine connexion, qui passe par le premier backend de la liste
+    'django.contrib.auth.backends.ModelBackend',
+]
+AUTH_USER_CACHE_TIMEOUT = 60  # Durée de vie de l'utilisateur en cache (secondes) ; 0 pour le relire en base à chaque requête
+
+# Stockage des sessions, choisi par la variable d'environnement LITREVU_SESSION_MODE :
+# - 'cache' : lue dans le cache, en base seulement si elle n'y est pas ; écrite dans les deux (cached_db) ;
+# - 'signed_cookies' : gardée dans un cookie signé, ni cache ni base ; lisible par le client (non chiffrée)
+#   et impossible à révoquer côté serveur avant son expiration, hormis par un changement de mot de passe ;
+# - 'db' : lue dans la table django_session à chaque requête.
+# Avec plusieurs processus, 'cache' demande un cache partagé (voir CACHES) : avec le cache en mémoire,
+# une déconnexion ne serait vue que par le processus qui l'a traitée.
+SESSION_MODE = os.environ.get('LITREVU_SESSION_MODE', 'cache')
+SESSION_ENGINES = {
+    'cache': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+    'db': 'django.contrib.sessions.backends.db',
+}
+SESSION_ENGINE = SESSION_ENGINES[SESSION_MODE]
 
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# Pragmas de production (WAL, busy_timeout...) et connexions persistantes : voir litrevu/database.py
+
 DATABASES = {
+    'default': sqlite_database(BASE_DIR / 'db.sqlite3'),
+}
+
+# Réplique de lecture (flux et listes), activée en définissant LITREVU_DB_REPLICA.
+# La copie est tenue à jour par la commande sync_replica.
+if os.environ.get('LITREVU_DB_REPLICA'):
+    DATABASES['replica'] = sqlite_database(os.environ['LITREVU_DB_REPLICA'], read_only=True)
+
+DATABASE_ROUTERS = ['reviews.db_routing.PrimaryReplicaRouter']
+REPLICA_STICKY_SECONDS = 10  # Lectures sur la base principale après une écriture (au-delà du retard de la réplique)
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# En local, un cache en mémoire suffit ; en production, remplacer par un backend
+# partagé entre les processus (FileBasedCache, RedisCache, PyMemcacheCache...).
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'litrevu',
+        'OPTIONS': {'MAX_ENTRIES': 50000},  # Pages du flux et fragments des posts (300 entrées par défaut)
     }
 }
 
+FEED_CACHE_TIMEOUT = 300  # Durée de vie d'une page du flux en cache (secondes)
+FRAGMENT_CACHE_TIMEOUT = 24 * 3600  # Durée de vie du HTML d'un post en cache (la clé change à chaque modification)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
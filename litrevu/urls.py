@@ -22,18 +22,31 @@ from django.contrib.auth.views import LogoutView  # Importation de la vue de dé
 
 
 urlpatterns = [
+    path('admin/profiling/', views.profiling_report, name='profiling_report'),  # Percentiles par vue (staff), avant l'admin
     path('admin/', admin.site.urls, name='admin'),  # URL pour accéder à l'interface d'administration
     path('login/', views.login_view, name='login'),  # Route pour la connexion
     path('', views.feed, name='feed'),  # Route pour le fil d'actualité
+    path('archive/', views.archive_feed, name='archive_feed'),  # Posts archivés, plus anciens que le flux
+    path('archive/ticket/<int:ticket_id>/', views.archived_ticket, name='archived_ticket'),  # Fil d'un billet archivé
+    path('api/feed/', views.feed_json, name='feed_json'),  # Flux au format JSON (clients mobiles et SPA)
+    path('search/', views.search_view, name='search'),  # Recherche plein texte
+    path('stats/', views.stats_view, name='stats'),  # Statistiques des notes précalculées
     path('register/', views.register_view, name='register'),
     path('logout/', LogoutView.as_view(), name='logout'),  # Route pour la déconnexion
     path('ticket/add/', views.add_ticket, name='add_ticket'),  # Route pour ajouter un billet
     path('ticket/<int:ticket_id>/edit/', views.edit_ticket, name='edit_ticket'),  # Route pour modifier un billet existant
     path('ticket/<int:ticket_id>/delete/', views.delete_ticket, name='delete_ticket'),  # Route pour supprimer un billet
-    path('add_comment/', views.add_comment, name='add_comment'),
+    path('ticket/<int:ticket_id>/comments/', views.comment_thread, name='comment_thread'),  # Fil des commentaires, paginé
+    path('add_comment/<int:ticket_id>/', views.add_comment, name='add_comment'),  # Commenter un billet
     path('edit_comment/<int:comment_id>/', views.edit_comment, name='edit_comment'),
     path('delete_comment/<int:comment_id>/', views.delete_comment, name='delete_comment'),
     path('follows/', views.list_followed_users, name='list_followed_users'),  # URL pour lister les utilisateurs suivis
     path('follows/add/', views.add_follow, name='add_follow'),  # URL pour ajouter un utilisateur suivi
+    path('follows/search/', views.user_search_view, name='user_search'),  # Autocomplétion des noms d'utilisateur
     path('follows/remove/<int:follow_id>/', views.remove_follow, name='remove_follow'),  # URL pour supprimer un utilisateur suivi
+    # Versions asynchrones (ASGI) du flux et des abonnements
+    path('async/', views.afeed, name='afeed'),
+    path('async/follows/', views.alist_followed_users, name='alist_followed_users'),
+    path('async/follows/add/', views.aadd_follow, name='aadd_follow'),
+    path('async/follows/remove/<int:follow_id>/', views.aremove_follow, name='aremove_follow'),
 ]
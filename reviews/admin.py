@@ -1,8 +1,184 @@
+"""Administration adaptée aux grandes tables (millions de billets, de critiques et d'abonnements).
+
+Les listes de l'administration par défaut font un COUNT(*) exact (deux fois),
+chargent l'auteur de chaque ligne par une requête séparée et listent tous les
+utilisateurs dans les listes déroulantes des formulaires. Ici :
+- le nombre de résultats est exact jusqu'à ADMIN_COUNT_LIMIT lignes, estimé au-delà ;
+- auteurs et billets sont chargés par jointure (list_select_related) ;
+- le tri suit un index (time_created, id) et la hiérarchie de dates interroge
+  l'index période par période au lieu de grouper toute la table ;
+- les clés étrangères se choisissent par autocomplétion, servie par les index
+  (préfixe de username_lower, index plein texte des billets).
+"""
+from datetime import datetime, timedelta
+
+from django.conf import settings
 from django.contrib import admin
-from .models import CustomUser, Ticket, Review, UserFollows
+from django.core.paginator import Paginator
+from django.db.models import Exists, F, Max, Min, QuerySet
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from .models import Comment, CustomUser, Review, Ticket, UserFollows, username_key
+from . import purge, search, user_search
+
+ADMIN_COUNT_LIMIT = getattr(settings, 'ADMIN_COUNT_LIMIT', 10000)  # Au-delà, le nombre de résultats est estimé
+
+
+class EstimatedCountPaginator(Paginator):
+    """Pagination sans COUNT(*) complet : compte borné, puis estimation par l'écart des identifiants."""
+
+    @cached_property
+    def count(self):
+        rows = self.object_list.order_by()
+        count = rows[:ADMIN_COUNT_LIMIT].count()  # S'arrête après ADMIN_COUNT_LIMIT lignes
+        if count < ADMIN_COUNT_LIMIT:
+            return count
+        bounds = rows.aggregate(first=Min('pk'), last=Max('pk'))  # Extrémités de l'index de la clé primaire
+        return max(count, bounds['last'] - bounds['first'] + 1)
+
+
+class IndexedAdminQuerySet(QuerySet):
+    """Queryset de l'administration dont les bornes et la hiérarchie de dates lisent les index sans parcourir la table.
+
+    - aggregate(first=Min(...), last=Max(...)) : SQLite ne s'arrête à la première
+      ligne de l'index que pour un MIN ou un MAX seul, sans filtre ; ici chaque borne
+      est une lecture de l'index dans l'ordre, LIMIT 1.
+    - datetimes() (hiérarchie de dates) groupe toute la table par période ; ici, une
+      requête vérifie par EXISTS, pour chaque période entre la première et la
+      dernière date, qu'elle contient au moins une ligne : une recherche d'intervalle
+      dans l'index par période.
+    """
+
+    def aggregate(self, *args, **kwargs):
+        if args or not all(_is_bound(expression) for expression in kwargs.values()):
+            return super().aggregate(*args, **kwargs)
+        return {name: self._edge(expression.source_expressions[0].name, last=isinstance(expression, Max))
+                for name, expression in kwargs.items()}
+
+    def _edge(self, field_name, last):
+        rows = self.filter(**{f'{field_name}__isnull': False}).order_by(f'-{field_name}' if last else field_name)
+        return rows.values_list(field_name, flat=True).first()
+
+    def datetimes(self, field_name, kind, order='ASC', tzinfo=None, is_dst=None):
+        bounds = self.aggregate(first=Min(field_name), last=Max(field_name))
+        if bounds['first'] is None:
+            return []
+        zone = tzinfo or timezone.get_current_timezone()
+        periods = list(_periods(timezone.localtime(bounds['first'], zone), timezone.localtime(bounds['last'], zone), kind))
+        checks = {f'p{i}': Exists(self.filter(**{f'{field_name}__gte': start, f'{field_name}__lt': end}))
+                  for i, (start, end) in enumerate(periods)}
+        found = self.order_by().annotate(**checks).values(*checks)[0]  # Une ligne suffit : les EXISTS ne dépendent pas d'elle
+        starts = [start for i, (start, _) in enumerate(periods) if found[f'p{i}']]
+        return starts if order == 'ASC' else starts[::-1]
+
+
+def _is_bound(expression):
+    """Min('champ') ou Max('champ') sans filtre : calculable par une lecture de l'index."""
+    return (isinstance(expression, (Min, Max)) and expression.filter is None
+            and isinstance(expression.source_expressions[0], F))
+
+
+def _periods(first, last, kind):
+    """Périodes (début, fin exclue) de `kind` ('year', 'month', 'day') couvrant first..last, dans le fuseau de first."""
+    zone = first.tzinfo
+    start = datetime(first.year, first.month if kind != 'year' else 1, first.day if kind == 'day' else 1)
+    while start <= last.replace(tzinfo=None):
+        if kind == 'year':
+            end = start.replace(year=start.year + 1)
+        elif kind == 'month':
+            end = start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+        else:
+            end = start + timedelta(days=1)
+        yield timezone.make_aware(start, zone), timezone.make_aware(end, zone)
+        start = end
+
+
+class ScalableAdmin(admin.ModelAdmin):
+    """Liste sans COUNT(*) complet, triée par un index, avec autocomplétion des clés étrangères."""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False  # Pas de second COUNT(*) sur la table entière
+    list_per_page = 50
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        return IndexedAdminQuerySet(model=queryset.model, query=queryset.query, using=queryset._db)
+
+
+class SoftDeleteAdmin(ScalableAdmin):
+    """Suppression depuis l'administration : suppression logique, purge en arrière-plan (voir reviews.purge)."""
+    soft_delete = None  # Fonction de suppression logique d'un objet
+
+    def delete_model(self, request, obj):
+        self.soft_delete(obj)
+
+    def delete_queryset(self, request, queryset):
+        for obj in queryset:
+            self.soft_delete(obj)
+
+    def get_deleted_objects(self, objs, request):
+        # La page de confirmation ne liste pas les dépendances : les charger prendrait autant de temps que les supprimer
+        return [str(obj) for obj in objs], {}, set(), []
+
+
+class CustomUserAdmin(SoftDeleteAdmin):
+    soft_delete = staticmethod(purge.soft_delete_user)
+    list_display = ('username', 'email', 'is_active', 'date_joined')
+    ordering = ('username',)  # Index unique du nom d'utilisateur
+    search_fields = ('username',)  # Autocomplétion des auteurs et des abonnements
+
+    def get_search_results(self, request, queryset, search_term):
+        prefix = username_key(search_term)
+        if not prefix:
+            return queryset, False
+        low, high = user_search.prefix_range(prefix)  # Préfixe du nom : parcours d'intervalle de l'index username_lower
+        return queryset.filter(username_lower__gte=low, username_lower__lt=high), False
+
+
+class TicketAdmin(SoftDeleteAdmin):
+    soft_delete = staticmethod(purge.soft_delete_ticket)
+    list_display = ('title', 'user', 'time_created')
+    list_select_related = ('user',)
+    autocomplete_fields = ('user',)
+    date_hierarchy = 'time_created'
+    ordering = ('-time_created',)  # L'administration ajoute -pk : parcours de l'index (time_created, rowid)
+    search_fields = ('title',)  # Autocomplétion des billets
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        ids = search.ids_matching(Ticket, search_term)  # Index plein texte plutôt que LIKE '%...%' sur toute la table
+        if ids is None:
+            return super().get_search_results(request, queryset, search_term)
+        return queryset.filter(pk__in=ids), False
+
+
+class ReviewAdmin(ScalableAdmin):
+    list_display = ('headline', 'ticket', 'user', 'rating', 'time_created')
+    list_select_related = ('user', 'ticket')
+    autocomplete_fields = ('user', 'ticket')
+    date_hierarchy = 'time_created'
+    ordering = ('-time_created',)
+
+
+class CommentAdmin(ScalableAdmin):
+    list_display = ('__str__', 'time_created')
+    list_select_related = ('user', 'ticket')  # __str__ affiche l'auteur et le billet
+    autocomplete_fields = ('user', 'ticket')
+    date_hierarchy = 'time_created'
+    ordering = ('-time_created',)
+
+
+class UserFollowsAdmin(ScalableAdmin):
+    list_display = ('user', 'followed_user')
+    list_select_related = ('user', 'followed_user')
+    autocomplete_fields = ('user', 'followed_user')
+    ordering = ('-pk',)
+
 
 # Enregistrer les modèles dans l'administration
-admin.site.register(CustomUser)
-admin.site.register(Ticket)
-admin.site.register(Review)
-admin.site.register(UserFollows)
+admin.site.register(CustomUser, CustomUserAdmin)
+admin.site.register(Ticket, TicketAdmin)
+admin.site.register(Review, ReviewAdmin)
+admin.site.register(Comment, CommentAdmin)
+admin.site.register(UserFollows, UserFollowsAdmin)
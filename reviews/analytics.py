@@ -0,0 +1,178 @@
+"""Statistiques des notes : instantanés par utilisateur et par billet, calculés par lots.
+
+La page de statistiques affiche, pour un utilisateur et pour ses billets, la
+distribution des notes (0 à 5), la moyenne et l'activité mois par mois. Les
+calculer à l'affichage ferait un GROUP BY sur toute la table des critiques ; elles
+sont donc précalculées dans RatingSnapshot, une ligne par utilisateur ou billet.
+
+Le calcul lit les colonnes utiles des critiques (identifiant, billet, auteur,
+note, mois de création) en un seul parcours, dans des tableaux d'entiers, puis
+compte les couples (sujet, note) et (sujet, mois) en une opération vectorisée
+(np.unique). Sans NumPy, des Counter font le même calcul.
+
+Le calcul incrémental repart du point haut (AnalyticsWatermark) : seules les
+critiques créées après la dernière critique traitée sont lues, et leurs comptes
+sont ajoutés aux instantanés existants. Les critiques des ANALYTICS_SAFETY_LAG
+dernières secondes sont laissées au passage suivant : une transaction validée en
+retard ne peut pas insérer une critique derrière le point haut. Les modifications
+et suppressions de critiques ne sont prises en compte que par un calcul complet
+(refresh(full=True), quotidien).
+"""
+from array import array
+from collections import Counter, defaultdict
+from datetime import timedelta
+from itertools import chain
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import AnalyticsWatermark, ArchivedReview, RatingSnapshot, Review
+
+try:
+    import numpy as np
+except ImportError:  # Dépendance facultative : calcul en Python pur
+    np = None
+
+ANALYTICS_SAFETY_LAG = getattr(settings, 'ANALYTICS_SAFETY_LAG', 60)  # Critiques plus récentes (secondes) : passage suivant
+ANALYTICS_BATCH_SIZE = getattr(settings, 'ANALYTICS_BATCH_SIZE', 2000)  # Instantanés écrits par requête
+STATS_TICKET_COUNT = getattr(settings, 'STATS_TICKET_COUNT', 20)  # Billets affichés sur la page de statistiques
+RATINGS = 6  # Notes possibles : 0 à 5
+WATERMARK = 'ratings'
+IN_CHUNK = 500  # Identifiants par clause IN (limite de variables de SQLite)
+
+
+class ReviewColumns:
+    """Colonnes des critiques lues, en tableaux d'entiers (mois : année × 12 + mois - 1, en UTC)."""
+
+    def __init__(self, rows):
+        self.ticket_ids, self.user_ids = array('q'), array('q')
+        self.ratings, self.months = array('b'), array('l')
+        self.last = None  # (time_created, id) de la dernière critique lue : le prochain point haut
+        for review_id, ticket_id, user_id, rating, time_created in rows:
+            self.ticket_ids.append(ticket_id)
+            self.user_ids.append(user_id)
+            self.ratings.append(rating)
+            self.months.append(time_created.year * 12 + time_created.month - 1)
+            self.last = (time_created, review_id)
+
+    def __len__(self):
+        return len(self.ratings)
+
+
+def load(after=None, until=None):
+    """Lit les critiques postérieures au point haut `after` (time_created, id), jusqu'à `until`, dans l'ordre de création.
+
+    Sans point haut (calcul complet), les critiques archivées sont lues d'abord : elles sont toutes plus anciennes
+    que le point haut suivant, et un calcul incrémental ne les relit jamais.
+    """
+    columns = ('id', 'ticket_id', 'user_id', 'rating', 'time_created')
+    reviews = Review.objects.filter(time_created__lte=until or timezone.now())
+    if after is not None:
+        time_created, review_id = after
+        reviews = reviews.filter(Q(time_created__gt=time_created) | Q(time_created=time_created, id__gt=review_id))
+    rows = reviews.order_by('time_created', 'id').values_list(*columns).iterator(chunk_size=10000)
+    if after is None:
+        archived = ArchivedReview.objects.order_by('time_created', 'id').values_list(*columns)
+        rows = chain(archived.iterator(chunk_size=10000), rows)
+    return ReviewColumns(rows)
+
+
+def _count_pairs(subjects, values, width):
+    """Compte les couples (sujet, valeur) ; retourne {sujet: {valeur: nombre}}. `width` borne les valeurs."""
+    counts = defaultdict(dict)
+    if np is not None:
+        subjects, values = np.asarray(subjects, dtype=np.int64), np.asarray(values, dtype=np.int64)
+        low = int(values.min()) if len(values) else 0
+        keys, totals = np.unique(subjects * width + (values - low), return_counts=True)  # Couple encodé en un entier
+        for subject, value, total in zip((keys // width).tolist(), (keys % width + low).tolist(), totals.tolist()):
+            counts[subject][value] = total
+        return counts
+    for (subject, value), total in Counter(zip(subjects, values)).items():
+        counts[subject][value] = total
+    return counts
+
+
+def month_label(month):
+    return f'{month // 12:04d}-{month % 12 + 1:02d}'
+
+
+def snapshots(columns):
+    """Calcule les instantanés (non enregistrés) des utilisateurs et des billets des critiques lues."""
+    month_width = (max(columns.months) - min(columns.months) + 1) if len(columns) else 1
+    computed = []
+    for kind, subjects in ((RatingSnapshot.USER, columns.user_ids), (RatingSnapshot.TICKET, columns.ticket_ids)):
+        ratings = _count_pairs(subjects, columns.ratings, RATINGS)
+        months = _count_pairs(subjects, columns.months, month_width)
+        for subject, by_rating in ratings.items():
+            distribution = [by_rating.get(rating, 0) for rating in range(RATINGS)]
+            computed.append(RatingSnapshot(
+                kind=kind, object_id=subject, ratings=distribution,
+                activity={month_label(month): total for month, total in sorted(months[subject].items())},
+                review_count=sum(distribution), rating_sum=sum(rating * total for rating, total in enumerate(distribution)),
+            ))
+    return computed
+
+
+def _merge(snapshot, existing):
+    """Ajoute à `snapshot` les comptes de l'instantané enregistré `existing`."""
+    snapshot.ratings = [new + old for new, old in zip(snapshot.ratings, existing.ratings)]
+    activity = Counter(existing.activity)
+    activity.update(snapshot.activity)
+    snapshot.activity = dict(sorted(activity.items()))
+    snapshot.review_count += existing.review_count
+    snapshot.rating_sum += existing.rating_sum
+
+
+def _existing(kind, object_ids):
+    found = {}
+    object_ids = list(object_ids)
+    for start in range(0, len(object_ids), IN_CHUNK):
+        rows = RatingSnapshot.objects.filter(kind=kind, object_id__in=object_ids[start:start + IN_CHUNK])
+        found.update((snapshot.object_id, snapshot) for snapshot in rows)
+    return found
+
+
+def refresh(full=False, batch_size=ANALYTICS_BATCH_SIZE):
+    """Met à jour les instantanés ; retourne le nombre de critiques lues.
+
+    Sans `full`, seules les critiques créées depuis le point haut sont lues et ajoutées aux instantanés.
+    """
+    watermark = AnalyticsWatermark.objects.filter(name=WATERMARK).first()
+    after = None if full or watermark is None else (watermark.time_created, watermark.last_id)
+    columns = load(after, until=timezone.now() - timedelta(seconds=ANALYTICS_SAFETY_LAG))
+    computed = snapshots(columns)
+    with transaction.atomic():
+        if after is None:
+            RatingSnapshot.objects.all().delete()
+        else:
+            for kind in (RatingSnapshot.USER, RatingSnapshot.TICKET):
+                existing = _existing(kind, [snapshot.object_id for snapshot in computed if snapshot.kind == kind])
+                for snapshot in computed:
+                    if snapshot.kind == kind and snapshot.object_id in existing:
+                        _merge(snapshot, existing[snapshot.object_id])
+        RatingSnapshot.objects.bulk_create(
+            computed, batch_size=batch_size, update_conflicts=True, unique_fields=['kind', 'object_id'],
+            update_fields=['ratings', 'activity', 'review_count', 'rating_sum', 'computed_at'])
+        if columns.last is not None:
+            AnalyticsWatermark.objects.update_or_create(
+                name=WATERMARK, defaults={'time_created': columns.last[0], 'last_id': columns.last[1]})
+    return len(columns)
+
+
+def distribution_rows(snapshot):
+    """Lignes (note, nombre, pourcentage de la plus grande barre) de l'histogramme des notes."""
+    ratings = snapshot.ratings if snapshot else [0] * RATINGS
+    peak = max(ratings) or 1
+    return [(rating, total, round(100 * total / peak)) for rating, total in enumerate(ratings)]
+
+
+def activity_rows(snapshot, months=12):
+    """Lignes (mois, nombre, pourcentage de la plus grande barre) des `months` derniers mois."""
+    now = timezone.now()
+    current = now.year * 12 + now.month - 1
+    activity = snapshot.activity if snapshot else {}
+    totals = [(month_label(month), activity.get(month_label(month), 0)) for month in range(current - months + 1, current + 1)]
+    peak = max(total for _, total in totals) or 1
+    return [(label, total, round(100 * total / peak)) for label, total in totals]
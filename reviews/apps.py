@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class ReviewsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'reviews'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from . import profiling, signals  # noqa: F401  Enregistre les récepteurs de signaux
+        connection_created.connect(profiling.install_sql_wrapper)  # Requêtes SQL mesurées par ProfilingMiddleware
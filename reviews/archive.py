@@ -0,0 +1,125 @@
+"""Archivage des fils anciens : billets, critiques et commentaires sortis des tables vivantes.
+
+Le flux n'affiche que l'activité récente, mais les tables Ticket, Review,
+Comment et FeedEntry (et leurs index) couvrent tout l'historique. La tâche
+archive_old_posts déplace les fils refroidis vers les tables ArchivedTicket,
+ArchivedReview et ArchivedComment, par lots de ARCHIVE_CHUNK_SIZE billets, une
+transaction par lot (copie puis DELETE ensembliste, sans collecteur ni signaux).
+
+L'unité d'archivage est le fil : un billet n'est archivé qu'avec toutes ses
+critiques et tous ses commentaires, quand aucun n'est plus récent que
+ARCHIVE_AFTER_DAYS jours. Aucune ligne vivante ne référence donc une ligne
+archivée. Les identifiants sont conservés : un ancien lien vers le fil d'un
+billet archivé redirige vers sa page d'archive.
+
+Les données dérivées du fil (entrées du flux, index de recherche, agrégats de
+TicketStats) sont retirées dans la même transaction ; les agrégats sont figés
+sur ArchivedTicket. Les posts archivés restent lisibles par la page « posts
+archivés » (get_archive_page), calculée à la lecture sur les tables d'archive.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import CharField, Exists, F, OuterRef, Q, Value
+from django.utils import timezone
+
+from . import feed_cache, follow_graph, search, tasks
+from .feed import (FEED_PAGE_SIZE, REVIEW, TICKET, _before_cursor, _ordered_posts, _paginate, _split_ids,
+                   decode_cursor)
+from .models import (ArchivedComment, ArchivedReview, ArchivedTicket, Comment, FeedEntry, Review, Ticket,
+                     TicketStats)
+from .purge import _raw_delete
+
+ARCHIVE_AFTER_DAYS = getattr(settings, 'ARCHIVE_AFTER_DAYS', 365)  # Âge du post le plus récent d'un fil archivé
+ARCHIVE_CHUNK_SIZE = getattr(settings, 'ARCHIVE_CHUNK_SIZE', 500)  # Billets (avec leur fil) déplacés par transaction
+
+TICKET_FIELDS = ('id', 'title', 'description', 'user_id', 'time_created', 'updated_at')
+REVIEW_FIELDS = ('id', 'ticket_id', 'rating', 'headline', 'body', 'user_id', 'time_created', 'updated_at')
+COMMENT_FIELDS = ('id', 'body', 'user_id', 'ticket_id', 'time_created', 'updated_at')
+
+
+def archivable(before):
+    """Billets dont tout le fil est antérieur à `before`, sans post en attente de purge (laissés au purgeur)."""
+    hot = Q(time_created__gte=before) | Q(deleted_at__isnull=False)
+    return (Ticket.objects.filter(time_created__lt=before)
+            .exclude(Exists(Review.all_objects.filter(hot, ticket=OuterRef('pk'))))
+            .exclude(Exists(Comment.all_objects.filter(hot, ticket=OuterRef('pk')))))
+
+
+def _archive_tickets(ids):
+    """Déplace des billets et leur fil vers les tables d'archive ; retourne les flux qui les affichaient."""
+    stats = {row.ticket_id: row for row in TicketStats.objects.filter(ticket_id__in=ids)}
+    tickets = [ArchivedTicket(**row) for row in Ticket.objects.filter(pk__in=ids).values(*TICKET_FIELDS)]
+    for ticket in tickets:
+        if ticket.pk in stats:
+            ticket.review_count = stats[ticket.pk].review_count
+            ticket.rating_sum = stats[ticket.pk].rating_sum
+            ticket.comment_count = stats[ticket.pk].comment_count
+    reviews = [ArchivedReview(**row) for row in Review.objects.filter(ticket_id__in=ids).values(*REVIEW_FIELDS)]
+    comments = [ArchivedComment(**row) for row in Comment.objects.filter(ticket_id__in=ids).values(*COMMENT_FIELDS)]
+    ArchivedTicket.objects.bulk_create(tickets)
+    ArchivedReview.objects.bulk_create(reviews)
+    ArchivedComment.objects.bulk_create(comments)
+
+    review_ids, comment_ids = [review.pk for review in reviews], [comment.pk for comment in comments]
+    entries = FeedEntry.objects.filter(Q(kind=FeedEntry.TICKET, object_id__in=ids)
+                                       | Q(kind=FeedEntry.REVIEW, object_id__in=review_ids))
+    readers = set(entries.values_list('owner_id', flat=True))
+    _raw_delete(entries)
+    search.unindex_ids(Comment, comment_ids)
+    search.unindex_ids(Review, review_ids)
+    search.unindex_ids(Ticket, ids)
+    _raw_delete(TicketStats.objects.filter(ticket_id__in=ids))
+    _raw_delete(Comment.all_objects.filter(pk__in=comment_ids))
+    _raw_delete(Review.all_objects.filter(pk__in=review_ids))
+    _raw_delete(Ticket.all_objects.filter(pk__in=ids))
+    return readers
+
+
+@tasks.task
+def archive_old_posts(days=ARCHIVE_AFTER_DAYS, chunk_size=ARCHIVE_CHUNK_SIZE, progress=None):
+    """Archive les fils dont le post le plus récent a plus de `days` jours, un lot de billets par transaction.
+
+    `progress(billets archivés)` est appelée après chaque lot. Retourne le nombre de billets archivés.
+    """
+    candidates = archivable(timezone.now() - timedelta(days=days))
+    archived = last_id = 0
+    while True:
+        # Sélection dans la transaction (IMMEDIATE) : aucun post ne peut s'ajouter au fil avant son déplacement
+        with transaction.atomic():
+            ids = list(candidates.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:chunk_size])
+            if not ids:
+                break
+            readers = _archive_tickets(ids)
+        feed_cache.invalidate(readers)
+        archived += len(ids)
+        last_id = ids[-1]
+        if progress is not None:
+            progress(archived)
+    return archived
+
+
+def get_archive_page(user, cursor=None, page_size=FEED_PAGE_SIZE):
+    """Retourne (posts, next_cursor) pour une page des posts archivés visibles par l'utilisateur.
+
+    Mêmes règles de visibilité et même curseur que le flux (voir feed.get_live_feed_page), lues sur les tables
+    d'archive : peu consultées, elles n'ont pas de flux matérialisé.
+    """
+    if isinstance(cursor, str):
+        cursor = decode_cursor(cursor)
+
+    authors = Q(user_id__in={user.pk, *follow_graph.followed_ids(user.pk)})
+    tickets = ArchivedTicket.objects.filter(authors, _before_cursor(TICKET, cursor)).values(
+        'time_created', kind=Value(TICKET, CharField()), object_id=F('id'))
+    reviews = ArchivedReview.objects.filter(authors | Q(ticket__user=user), _before_cursor(REVIEW, cursor)).values(
+        'time_created', kind=Value(REVIEW, CharField()), object_id=F('id'))
+    rows = list(tickets.union(reviews, all=True).order_by('-time_created', '-kind', '-object_id')[:page_size + 1])
+    rows, next_cursor = _paginate(rows, page_size)
+
+    ticket_ids, review_ids = _split_ids(rows)
+    objects = {
+        TICKET: ArchivedTicket.objects.select_related('user').in_bulk(ticket_ids) if ticket_ids else {},
+        REVIEW: ArchivedReview.objects.select_related('user', 'ticket__user').in_bulk(review_ids) if review_ids else {},
+    }
+    return _ordered_posts(rows, objects), next_cursor
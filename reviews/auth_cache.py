@@ -0,0 +1,62 @@
+"""Cache de l'utilisateur connecté : une requête SQL de moins par requête HTTP.
+
+Avant la vue, AuthenticationMiddleware lit la session (voir SESSION_MODE dans
+les settings : cache, cookie signé ou base) puis charge l'utilisateur avec une
+requête sur la table des comptes. CachedModelBackend garde cette ligne dans le
+cache AUTH_USER_CACHE_TIMEOUT secondes.
+
+La copie en cache est supprimée quand le compte change : enregistrement
+(profil, mot de passe, is_active, is_staff, is_superuser, dernière connexion),
+suppression, désactivation par soft_delete_user. Elle l'est tout de suite, puis
+de nouveau après la validation de la transaction, pour qu'une requête
+concurrente qui aurait relu l'ancienne ligne entre-temps ne la garde pas. Une
+mise à jour par queryset.update() n'envoie pas de signal : appeler invalidate().
+La durée de vie courte borne ce qui resterait périmé.
+
+Un changement de mot de passe déconnecte les autres sessions comme avant :
+Django compare le hash de session au mot de passe de l'utilisateur chargé, relu
+en base dès l'invalidation. Les permissions (groupes, user_permissions) ne sont
+pas dans la copie en cache : ModelBackend les relit à la première vérification
+de chaque requête, un changement de groupe est donc visible tout de suite.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import caches
+from django.db import transaction
+
+AUTH_USER_CACHE_TIMEOUT = getattr(settings, 'AUTH_USER_CACHE_TIMEOUT', 60)  # Durée de vie d'un utilisateur en cache (0 : désactivé)
+
+
+def _cache():
+    return caches[getattr(settings, 'AUTH_USER_CACHE_ALIAS', 'default')]
+
+
+def _key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def invalidate(user_ids):
+    """Retire du cache les utilisateurs donnés, maintenant et après la validation de la transaction en cours."""
+    keys = [_key(user_id) for user_id in set(user_ids)]
+    if keys:
+        _cache().delete_many(keys)
+        transaction.on_commit(lambda: _cache().delete_many(keys))
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend dont get_user() (appelé à chaque requête par AuthenticationMiddleware) lit d'abord le cache."""
+
+    def get_user(self, user_id):
+        if not AUTH_USER_CACHE_TIMEOUT:
+            return super().get_user(user_id)
+        cache = _cache()
+        user = cache.get(_key(user_id))
+        if user is None:
+            UserModel = get_user_model()
+            try:
+                user = UserModel._default_manager.get(pk=user_id)
+            except UserModel.DoesNotExist:
+                return None  # Compte supprimé : rien en cache, la session est déconnectée
+            cache.set(_key(user_id), user, AUTH_USER_CACHE_TIMEOUT)  # Copie prise avant tout cache de permissions
+        return user if self.user_can_authenticate(user) else None
@@ -0,0 +1,24 @@
+"""Outils communs aux commandes de benchmark (percentiles, résumés de latences)."""
+from django.conf import settings
+from django.test.utils import override_settings
+
+from .stats_utils import percentile
+
+
+def client_settings():
+    """Paramètres permettant au client de test (hôte 'testserver') d'interroger l'application hors des tests."""
+    return override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'])
+
+
+def summarize(latencies, elapsed=None):
+    """Résume des latences (en secondes) : p50/p95/p99 et moyenne en millisecondes, débit en requêtes/s."""
+    summary = {
+        'requests': len(latencies),
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'mean_ms': sum(latencies) / len(latencies) * 1000 if latencies else 0.0,
+    }
+    if elapsed:
+        summary['throughput_rps'] = len(latencies) / elapsed
+    return summary
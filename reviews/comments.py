@@ -0,0 +1,80 @@
+"""Fils de commentaires des billets : aperçu dans le flux et pagination par curseur.
+
+Le flux n'affiche que les COMMENT_PREVIEW_SIZE derniers commentaires de chaque
+billet, chargés pour tous les billets de la page en une requête (fonction de
+fenêtre ROW_NUMBER par billet). Le fil complet est chargé à la demande, page par
+page, du plus récent au plus ancien, avec un curseur sur (time_created, id).
+"""
+import base64
+from datetime import datetime
+
+from django.conf import settings
+from django.core.exceptions import BadRequest
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
+
+from .feed import TICKET
+from .models import Comment
+
+COMMENT_PAGE_SIZE = getattr(settings, 'COMMENT_PAGE_SIZE', 20)  # Commentaires par page du fil
+COMMENT_PREVIEW_SIZE = getattr(settings, 'COMMENT_PREVIEW_SIZE', 3)  # Derniers commentaires affichés sous un billet du flux
+
+NEWEST_FIRST = (F('time_created').desc(), F('id').desc())
+
+
+def encode_cursor(comment):
+    """Encode la position (time_created, id) d'un commentaire en curseur opaque pour l'URL."""
+    raw = f'{comment.time_created.isoformat()}|{comment.pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Décode un curseur produit par encode_cursor() ; lève BadRequest s'il est invalide."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        time_created, comment_id = raw.split('|')
+        return datetime.fromisoformat(time_created), int(comment_id)
+    except (ValueError, UnicodeDecodeError) as exc:
+        raise BadRequest('Curseur de pagination invalide.') from exc
+
+
+def _comments():
+    return Comment.objects.select_related('user')  # Auteurs chargés par jointure, pas un par commentaire
+
+
+def get_thread_page(ticket_id, cursor=None, page_size=COMMENT_PAGE_SIZE):
+    """Retourne une page du fil d'un billet, du plus récent au plus ancien, et le curseur de la page suivante."""
+    comments = _comments().filter(ticket_id=ticket_id)
+    if cursor is not None:
+        time_created, comment_id = cursor
+        comments = comments.filter(Q(time_created__lt=time_created) | Q(time_created=time_created, id__lt=comment_id))
+    comments = list(comments.order_by(*NEWEST_FIRST)[:page_size + 1])
+    next_cursor = None
+    if len(comments) > page_size:  # Un commentaire de plus que la page : il reste des commentaires plus anciens
+        comments = comments[:page_size]
+        next_cursor = encode_cursor(comments[-1])
+    return comments, next_cursor
+
+
+def get_previews(ticket_ids, size=COMMENT_PREVIEW_SIZE):
+    """Retourne {id du billet: derniers commentaires, du plus récent au plus ancien} en une requête."""
+    previews = {ticket_id: [] for ticket_id in ticket_ids}
+    if not ticket_ids:
+        return previews
+    comments = _comments().filter(ticket_id__in=ticket_ids).annotate(
+        rank=Window(RowNumber(), partition_by=F('ticket_id'), order_by=NEWEST_FIRST),
+    ).filter(rank__lte=size).order_by()  # Filtre sur la fenêtre : appliqué dans une requête englobante
+    for comment in comments:
+        previews[comment.ticket_id].append(comment)
+    for preview in previews.values():
+        preview.sort(key=lambda comment: comment.rank)  # Tri de quelques lignes en Python plutôt qu'un tri SQL sans index
+    return previews
+
+
+def attach_previews(posts):
+    """Renseigne `comment_preview` sur les billets d'une page du flux ; retourne les posts."""
+    tickets = [post for post in posts if post.content_type == TICKET]
+    previews = get_previews([ticket.pk for ticket in tickets])
+    for ticket in tickets:
+        ticket.comment_preview = previews[ticket.pk]
+    return posts
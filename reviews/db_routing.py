@@ -0,0 +1,156 @@
+"""Routage des lectures vers la réplique SQLite, avec lecture de ses propres écritures.
+
+Les écritures vont toujours à la base principale. Les vues de lecture du flux et
+des listes, décorées par read_from_replica, lisent la réplique (alias 'replica')
+si elle est configurée. La réplique est une copie de la base principale mise à
+jour périodiquement par la commande sync_replica : elle peut avoir quelques
+secondes de retard. Après un POST, un cookie renvoie donc l'utilisateur vers la
+base principale pendant REPLICA_STICKY_SECONDS, pour qu'il voie ses propres écritures.
+
+Les données rangées dans un cache invalidé par version (pages du flux, ensembles
+d'abonnements) sont toujours lues sur la base principale, dans un bloc primary() :
+construites sur une réplique en retard juste après une invalidation, elles
+seraient servies périmées sous la nouvelle version jusqu'à leur expiration.
+"""
+import contextvars
+import functools
+import sqlite3
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+REPLICA_ALIAS = 'replica'
+STICKY_COOKIE = 'primary_until'
+REPLICA_STICKY_SECONDS = getattr(settings, 'REPLICA_STICKY_SECONDS', 10)  # Doit couvrir l'intervalle de synchronisation
+
+_read_alias = contextvars.ContextVar('read_alias', default=None)
+
+
+def replica_configured():
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+class PrimaryReplicaRouter:
+    """Lectures sur l'alias choisi par read_from_replica (la base principale sinon), écritures sur la principale."""
+
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return {obj1._state.db, obj2._state.db} <= {DEFAULT_DB_ALIAS, REPLICA_ALIAS}
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA_ALIAS  # La réplique reçoit le schéma par copie de la base principale
+
+
+@contextmanager
+def primary():
+    """Lectures du bloc sur la base principale, même dans une vue décorée par read_from_replica."""
+    token = _read_alias.set(None)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+def is_sticky(request):
+    """Vrai si l'utilisateur a écrit récemment et doit lire la base principale."""
+    try:
+        return float(request.COOKIES.get(STICKY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def _alias_for(request):
+    if replica_configured() and not is_sticky(request):
+        return REPLICA_ALIAS
+    return None
+
+
+def _streaming_with_alias(content, alias):
+    """Garde l'alias de lecture pendant la diffusion d'une StreamingHttpResponse, après le retour de la vue."""
+    _read_alias.set(alias)
+    try:
+        yield from content
+    finally:
+        _read_alias.set(None)  # La diffusion a lieu hors de la vue, où aucun alias n'est défini
+
+
+def _route_response(response, alias):
+    if alias is not None and getattr(response, 'streaming', False) and not response.is_async:
+        response.streaming_content = _streaming_with_alias(response.streaming_content, alias)
+    return response
+
+
+def read_from_replica(view):
+    """Décorateur des vues de lecture : leurs requêtes vont à la réplique, sauf juste après une écriture."""
+    if iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            alias = _alias_for(request)
+            token = _read_alias.set(alias)
+            try:
+                return await view(request, *args, **kwargs)
+            finally:
+                _read_alias.reset(token)
+    else:
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            alias = _alias_for(request)
+            token = _read_alias.set(alias)
+            try:
+                return _route_response(view(request, *args, **kwargs), alias)
+            finally:
+                _read_alias.reset(token)
+    return wrapper
+
+
+class ReplicaStickinessMiddleware:
+    """Après une requête d'écriture (POST...), pose le cookie qui renvoie les lectures vers la base principale."""
+
+    sync_capable = True
+    async_capable = True  # Sous ASGI, la chaîne des middlewares reste asynchrone
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.stick(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.stick(request, await self.get_response(request))
+
+    def stick(self, request, response):
+        if request.method not in ('GET', 'HEAD', 'OPTIONS', 'TRACE') and replica_configured():
+            response.set_cookie(STICKY_COOKIE, str(time.time() + REPLICA_STICKY_SECONDS),
+                                max_age=REPLICA_STICKY_SECONDS, httponly=True, samesite='Lax')
+        return response
+
+
+def sync_replica(primary_path, replica_path):
+    """Copie la base principale dans la réplique avec l'API de sauvegarde en ligne de SQLite.
+
+    La copie se fait en une étape, sur un instantané de la base principale : en
+    mode WAL, les écritures sur la principale continuent pendant la copie, et les
+    lecteurs de la réplique lisent l'état précédent jusqu'à la fin de la copie.
+    Retourne la durée de la copie en secondes.
+    """
+    start = time.perf_counter()
+    source = sqlite3.connect(primary_path)
+    target = sqlite3.connect(replica_path, timeout=30)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+    return time.perf_counter() - start
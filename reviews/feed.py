@@ -0,0 +1,158 @@
+"""Pagination par curseur du flux.
+
+Le flux est lu dans la table matérialisée FeedEntry (voir reviews.timeline) ;
+get_live_feed_page() fusionne directement les tables sources et sert de référence.
+"""
+import asyncio
+import base64
+from datetime import datetime
+
+from django.conf import settings
+from django.core.exceptions import BadRequest
+from django.db.models import CharField, F, Q, Value
+
+from . import follow_graph
+from .models import FeedEntry, Review, Ticket
+
+TICKET = FeedEntry.TICKET
+REVIEW = FeedEntry.REVIEW
+
+FEED_PAGE_SIZE = getattr(settings, 'FEED_PAGE_SIZE', 20)  # Nombre de posts par page du flux
+
+
+def encode_cursor(time_created, kind, object_id):
+    """Encode la position (time_created, kind, id) d'un post en curseur opaque pour l'URL."""
+    raw = f'{time_created.isoformat()}|{kind}|{object_id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Décode un curseur produit par encode_cursor() ; lève BadRequest s'il est invalide."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        time_created, kind, object_id = raw.split('|')
+        if kind not in (TICKET, REVIEW):
+            raise ValueError(kind)
+        return datetime.fromisoformat(time_created), kind, int(object_id)
+    except (ValueError, UnicodeDecodeError) as exc:
+        raise BadRequest('Curseur de pagination invalide.') from exc
+
+
+def _before_cursor(kind, cursor):
+    """Condition « strictement après le curseur » dans l'ordre (time_created, kind, id) décroissant.
+
+    Le type étant constant dans chaque branche de l'union, la comparaison de tuple
+    se réduit à une condition simple sur time_created et id.
+    """
+    if cursor is None:
+        return Q()
+    time_created, cursor_kind, object_id = cursor
+    if kind < cursor_kind:
+        return Q(time_created__lte=time_created)
+    if kind > cursor_kind:
+        return Q(time_created__lt=time_created)
+    return Q(time_created__lt=time_created) | Q(time_created=time_created, id__lt=object_id)
+
+
+def _paginate(rows, page_size):
+    """Coupe les lignes à la taille de la page et calcule le curseur de la page suivante."""
+    next_cursor = None
+    if len(rows) > page_size:  # Une ligne de plus que la page : il reste des posts à afficher
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_cursor = encode_cursor(last['time_created'], last['kind'], last['object_id'])
+    return rows, next_cursor
+
+
+def _timeline_rows(user, cursor, page_size):
+    """Requête des entrées FeedEntry d'une page (une ligne de plus pour détecter la page suivante)."""
+    if isinstance(cursor, str):
+        cursor = decode_cursor(cursor)
+
+    entries = FeedEntry.objects.filter(owner=user)
+    if cursor is not None:
+        time_created, kind, object_id = cursor
+        entries = entries.filter(
+            Q(time_created__lt=time_created)
+            | Q(time_created=time_created, kind__lt=kind)
+            | Q(time_created=time_created, kind=kind, object_id__lt=object_id)
+        )
+    return (entries.order_by('-time_created', '-kind', '-object_id')
+            .values('time_created', 'kind', 'object_id')[:page_size + 1])
+
+
+def get_feed_page(user, cursor=None, page_size=FEED_PAGE_SIZE):
+    """Retourne (posts, next_cursor) pour une page du flux matérialisé de l'utilisateur.
+
+    Une page est un seul parcours de l'index (owner, time_created, kind, object_id).
+    """
+    rows, next_cursor = _paginate(list(_timeline_rows(user, cursor, page_size)), page_size)
+    return hydrate_posts(rows), next_cursor
+
+
+async def aget_feed_page(user, cursor=None, page_size=FEED_PAGE_SIZE):
+    """Version asynchrone de get_feed_page() : billets et critiques de la page sont chargés en parallèle."""
+    rows = [row async for row in _timeline_rows(user, cursor, page_size)]
+    rows, next_cursor = _paginate(rows, page_size)
+    ticket_ids, review_ids = _split_ids(rows)
+    tickets, reviews = await asyncio.gather(_tickets().ain_bulk(ticket_ids), _reviews().ain_bulk(review_ids))
+    return _ordered_posts(rows, {TICKET: tickets, REVIEW: reviews}), next_cursor
+
+
+def get_live_feed_page(user, cursor=None, page_size=FEED_PAGE_SIZE):
+    """Retourne (posts, next_cursor) en fusionnant directement les tables Ticket et Review.
+
+    La fusion des billets et critiques, le tri et la limite sont faits par la base
+    (UNION ALL ... ORDER BY ... LIMIT). Chaque critique n'apparaît qu'une fois, même si
+    elle est à la fois d'un utilisateur suivi et sur un billet de l'utilisateur.
+    """
+    if isinstance(cursor, str):
+        cursor = decode_cursor(cursor)
+
+    authors = Q(user_id__in={user.pk, *follow_graph.followed_ids(user.pk)})
+
+    tickets = Ticket.objects.filter(authors, _before_cursor(TICKET, cursor)).values(
+        'time_created', kind=Value(TICKET, CharField()), object_id=F('id'))
+    reviews = Review.objects.filter(authors | Q(ticket__user=user), _before_cursor(REVIEW, cursor)).values(
+        'time_created', kind=Value(REVIEW, CharField()), object_id=F('id'))
+
+    rows = list(
+        tickets.union(reviews, all=True).order_by('-time_created', '-kind', '-object_id')[:page_size + 1]
+    )
+    rows, next_cursor = _paginate(rows, page_size)
+    return hydrate_posts(rows), next_cursor
+
+
+def hydrate_posts(rows):
+    """Charge en bloc les objets d'une page à partir de lignes {'kind', 'object_id'} et conserve leur ordre."""
+    ticket_ids, review_ids = _split_ids(rows)
+    objects = {
+        TICKET: _tickets().in_bulk(ticket_ids) if ticket_ids else {},
+        REVIEW: _reviews().in_bulk(review_ids) if review_ids else {},
+    }
+    return _ordered_posts(rows, objects)
+
+
+def _tickets():
+    return Ticket.objects.select_related('user', 'stats')  # Auteur et agrégats chargés par jointure
+
+
+def _reviews():
+    return Review.objects.select_related('user', 'ticket__user')  # Auteur, billet critiqué et auteur du billet
+
+
+def _split_ids(rows):
+    ticket_ids = [row['object_id'] for row in rows if row['kind'] == TICKET]
+    review_ids = [row['object_id'] for row in rows if row['kind'] == REVIEW]
+    return ticket_ids, review_ids
+
+
+def _ordered_posts(rows, objects):
+    """Assemble les posts chargés dans l'ordre des lignes de la page."""
+    posts = []
+    for row in rows:
+        post = objects[row['kind']].get(row['object_id'])
+        if post is not None:  # Le post a pu être supprimé entre les deux requêtes
+            post.content_type = row['kind']
+            posts.append(post)
+    return posts
@@ -0,0 +1,110 @@
+"""Flux au format JSON pour les clients mobiles et SPA.
+
+Les posts sont sérialisés au fil de la lecture du curseur de la base et envoyés
+par morceaux (StreamingHttpResponse). Les validateurs HTTP (ETag, Last-Modified)
+sont calculés sans charger aucun post : un client déjà à jour reçoit une
+réponse 304 pour le prix d'une requête d'agrégat sur l'index du flux.
+"""
+import hashlib
+import json
+from itertools import islice
+
+from django.conf import settings
+from django.core.exceptions import BadRequest
+from django.db.models import Count, Max
+
+from . import feed_cache
+from .feed import FEED_PAGE_SIZE, TICKET, encode_cursor, hydrate_posts, _timeline_rows
+from .models import FeedEntry
+
+FEED_API_MAX_LIMIT = getattr(settings, 'FEED_API_MAX_LIMIT', 500)  # Nombre maximal de posts par réponse
+FEED_API_CHUNK_SIZE = 100  # Nombre de posts chargés par aller-retour avec la base pendant la diffusion
+
+
+def _validators(request):
+    """Retourne (etag, last_modified) du flux de l'utilisateur, calculés une fois par requête.
+
+    Le plus récent time_created et le nombre d'entrées du flux changent à chaque
+    nouveau post ou suppression ; la version du cache du flux change aussi quand un
+    post visible est modifié (édition, nouvelle critique ou commentaire sur un billet).
+    """
+    if not hasattr(request, '_feed_validators'):
+        summary = FeedEntry.objects.filter(owner=request.user).aggregate(newest=Max('time_created'), count=Count('pk'))
+        version = feed_cache.get_version(request.user.pk)
+        raw = f"{request.user.pk}:{version}:{summary['count']}:{summary['newest']}"
+        request._feed_validators = hashlib.sha1(raw.encode()).hexdigest(), summary['newest']
+    return request._feed_validators
+
+
+def etag(request, *args, **kwargs):
+    return _validators(request)[0]
+
+
+def last_modified(request, *args, **kwargs):
+    return _validators(request)[1]
+
+
+def parse_limit(value):
+    """Valide le paramètre `limit` (nombre de posts par réponse)."""
+    if value is None:
+        return FEED_PAGE_SIZE
+    try:
+        limit = int(value)
+    except ValueError:
+        raise BadRequest('Paramètre limit invalide.')
+    if not 1 <= limit <= FEED_API_MAX_LIMIT:
+        raise BadRequest(f'Le paramètre limit doit être compris entre 1 et {FEED_API_MAX_LIMIT}.')
+    return limit
+
+
+def serialize_post(post):
+    """Représentation JSON d'un billet ou d'une critique du flux."""
+    if post.content_type == TICKET:
+        stats = getattr(post, 'stats', None)
+        return {
+            'type': 'ticket',
+            'id': post.pk,
+            'title': post.title,
+            'description': post.description,
+            'user': post.user.username,
+            'time_created': post.time_created.isoformat(),
+            'review_count': stats.review_count if stats else 0,
+            'average_rating': stats.average_rating if stats else None,
+            'comment_count': stats.comment_count if stats else 0,
+        }
+    return {
+        'type': 'review',
+        'id': post.pk,
+        'headline': post.headline,
+        'body': post.body,
+        'rating': post.rating,
+        'user': post.user.username,
+        'time_created': post.time_created.isoformat(),
+        'ticket': {'id': post.ticket_id, 'title': post.ticket.title, 'user': post.ticket.user.username},
+    }
+
+
+def stream_feed(user, cursor, limit, chunk_size=FEED_API_CHUNK_SIZE):
+    """Génère le document JSON {"posts": [...], "next_cursor": ...} morceau par morceau.
+
+    Les entrées du flux sont lues avec un curseur de base de données ; chaque
+    morceau de `chunk_size` posts est chargé en bloc (deux requêtes) puis envoyé.
+    """
+    rows = _timeline_rows(user, cursor, limit).iterator(chunk_size=chunk_size)
+    yield '{"posts": ['
+    read, emitted, last = 0, 0, None
+    while read < limit:
+        chunk = list(islice(rows, min(chunk_size, limit - read)))
+        if not chunk:
+            break
+        read += len(chunk)
+        last = chunk[-1]
+        posts = [json.dumps(serialize_post(post)) for post in hydrate_posts(chunk)]
+        if posts:  # Un morceau peut être vide si ses posts ont été supprimés entre-temps
+            yield (', ' if emitted else '') + ', '.join(posts)
+            emitted += len(posts)
+    # Une ligne de plus que la limite : il reste des posts, le dernier envoyé sert de curseur
+    next_cursor = None
+    if last is not None and next(rows, None) is not None:
+        next_cursor = encode_cursor(last['time_created'], last['kind'], last['object_id'])
+    yield f'], "next_cursor": {json.dumps(next_cursor)}}}'
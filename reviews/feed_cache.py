@@ -0,0 +1,142 @@
+"""Cache des pages du flux par utilisateur, invalidé par numéro de version.
+
+Chaque utilisateur a un numéro de version de flux ; les pages sont mises en cache
+sous une clé qui contient ce numéro. Incrémenter la version rend toutes les pages
+de l'utilisateur inaccessibles d'un coup, sans avoir à les énumérer.
+
+Une page rangée en cache est construite sur la base principale, jamais sur la
+réplique : en retard sur une invalidation, elle donnerait une page périmée sous
+la nouvelle version (voir db_routing.primary).
+"""
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+
+from . import db_routing
+from .models import FeedEntry, Review
+
+FEED_CACHE_TIMEOUT = getattr(settings, 'FEED_CACHE_TIMEOUT', 300)  # Durée de vie d'une page en cache (secondes)
+
+HITS = 'feed:stats:hits'
+MISSES = 'feed:stats:misses'
+INVALIDATIONS = 'feed:stats:invalidations'
+
+
+def _cache():
+    return caches[getattr(settings, 'FEED_CACHE_ALIAS', 'default')]
+
+
+def _version_key(user_id):
+    return f'feed:version:{user_id}'
+
+
+def _page_key(user_id, version, cursor):
+    return f'feed:page:{user_id}:{version}:{cursor or ""}'
+
+
+def _incr(key, delta=1):
+    """Incrémente un compteur partagé, en le créant au besoin."""
+    cache = _cache()
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key, delta)
+    except ValueError:  # Clé évincée entre add() et incr()
+        cache.set(key, delta, timeout=None)
+
+
+def get_version(user_id):
+    """Retourne la version courante du flux d'un utilisateur.
+
+    Une version absente (jamais créée ou évincée) est initialisée à partir de l'horloge,
+    pour ne jamais retomber sur une version déjà utilisée par des pages encore en cache.
+    """
+    cache = _cache()
+    version = cache.get(_version_key(user_id))
+    if version is None:
+        cache.add(_version_key(user_id), time.time_ns(), timeout=None)
+        version = cache.get(_version_key(user_id))
+    return version
+
+
+def get_or_build_page(user, cursor, build):
+    """Retourne la page (posts, next_cursor) en cache ou la construit avec `build()` et la met en cache.
+
+    La version est lue une seule fois, avant la construction : si une écriture
+    invalide le flux pendant la construction, la page est rangée sous l'ancienne
+    version et ne sera jamais servie.
+    """
+    cache = _cache()
+    key = _page_key(user.pk, get_version(user.pk), cursor)
+    page = cache.get(key)
+    if page is not None:
+        _incr(HITS)
+        return page
+    _incr(MISSES)
+    with db_routing.primary():
+        page = build()
+    cache.set(key, page, FEED_CACHE_TIMEOUT)
+    return page
+
+
+async def aget_version(user_id):
+    """Version asynchrone de get_version()."""
+    cache = _cache()
+    version = await cache.aget(_version_key(user_id))
+    if version is None:
+        await cache.aadd(_version_key(user_id), time.time_ns(), timeout=None)
+        version = await cache.aget(_version_key(user_id))
+    return version
+
+
+async def aget_or_build_page(user, cursor, build):
+    """Version asynchrone de get_or_build_page() ; `build()` retourne une coroutine."""
+    cache = _cache()
+    key = _page_key(user.pk, await aget_version(user.pk), cursor)
+    page = await cache.aget(key)
+    if page is not None:
+        await sync_to_async(_incr)(HITS)
+        return page
+    await sync_to_async(_incr)(MISSES)
+    with db_routing.primary():
+        page = await build()
+    await cache.aset(key, page, FEED_CACHE_TIMEOUT)
+    return page
+
+
+def invalidate(user_ids):
+    """Invalide les pages en cache des utilisateurs donnés en incrémentant leur version."""
+    cache = _cache()
+    for user_id in set(user_ids):
+        try:
+            cache.incr(_version_key(user_id))
+        except ValueError:  # Pas de version : aucune page en cache pour cet utilisateur
+            continue
+        _incr(INVALIDATIONS)
+
+
+def post_readers(kind, object_id):
+    """Retourne les propriétaires des flux qui affichent ce post.
+
+    Pour un billet, les flux qui affichent une critique de ce billet sont inclus,
+    puisque la critique affiche le titre du billet.
+    """
+    readers = set(FeedEntry.objects.filter(kind=kind, object_id=object_id).values_list('owner_id', flat=True))
+    if kind == FeedEntry.TICKET:
+        reviews = Review.objects.filter(ticket_id=object_id).values('pk')
+        readers.update(FeedEntry.objects.filter(kind=FeedEntry.REVIEW, object_id__in=reviews)
+                       .values_list('owner_id', flat=True))
+    return readers
+
+
+def stats():
+    """Retourne les compteurs du cache du flux et le taux de succès."""
+    values = _cache().get_many([HITS, MISSES, INVALIDATIONS])
+    hits, misses = values.get(HITS, 0), values.get(MISSES, 0)
+    return {
+        'hits': hits,
+        'misses': misses,
+        'invalidations': values.get(INVALIDATIONS, 0),
+        'hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+    }
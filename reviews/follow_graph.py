@@ -0,0 +1,114 @@
+"""Graphe des abonnements : ensembles d'identifiants suivis et d'abonnés, servis depuis le cache.
+
+Deux niveaux de cache : un LRU en mémoire du processus, et le cache partagé de Django.
+Chaque ensemble a un numéro de version dans le cache partagé ; une entrée du LRU
+n'est utilisée que si sa version est toujours la version courante, ce qui garde les
+processus cohérents entre eux après un abonnement ou un désabonnement.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+from . import db_routing
+from .models import UserFollows
+
+FOLLOWED = 'followed'  # Utilisateurs suivis par un utilisateur
+FOLLOWERS = 'followers'  # Abonnés d'un utilisateur
+
+FOLLOW_GRAPH_LRU_SIZE = getattr(settings, 'FOLLOW_GRAPH_LRU_SIZE', 1024)  # Nombre d'ensembles gardés en mémoire
+FOLLOW_GRAPH_TIMEOUT = getattr(settings, 'FOLLOW_GRAPH_TIMEOUT', 3600)  # Durée de vie d'un ensemble dans le cache partagé
+
+
+class LRUCache:
+    """Petit cache LRU thread-safe."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_local = LRUCache(FOLLOW_GRAPH_LRU_SIZE)
+
+
+def _cache():
+    return caches[getattr(settings, 'FOLLOW_GRAPH_CACHE_ALIAS', 'default')]
+
+
+def _version_key(kind, user_id):
+    return f'follows:{kind}:{user_id}:version'
+
+
+def _version(kind, user_id):
+    """Retourne la version courante d'un ensemble (initialisée depuis l'horloge si absente)."""
+    cache = _cache()
+    version = cache.get(_version_key(kind, user_id))
+    if version is None:
+        cache.add(_version_key(kind, user_id), time.time_ns(), timeout=None)
+        version = cache.get(_version_key(kind, user_id))
+    return version
+
+
+def _load(kind, user_id):
+    if kind == FOLLOWED:
+        rows = UserFollows.objects.filter(user_id=user_id).values_list('followed_user_id', flat=True)
+    else:
+        rows = UserFollows.objects.filter(followed_user_id=user_id).values_list('user_id', flat=True)
+    with db_routing.primary():  # Rangé sous la version courante : jamais lu sur une réplique en retard
+        return frozenset(rows)
+
+
+def _get(kind, user_id):
+    version = _version(kind, user_id)
+    local = _local.get((kind, user_id))
+    if local is not None and local[0] == version:
+        return local[1]
+
+    key = f'follows:{kind}:{user_id}:{version}'
+    ids = _cache().get(key)
+    if ids is None:
+        ids = _load(kind, user_id)
+        _cache().set(key, ids, FOLLOW_GRAPH_TIMEOUT)
+    _local.set((kind, user_id), (version, ids))
+    return ids
+
+
+def followed_ids(user_id):
+    """Retourne l'ensemble (frozenset) des identifiants des utilisateurs suivis par `user_id`."""
+    return _get(FOLLOWED, user_id)
+
+
+def follower_ids(user_id):
+    """Retourne l'ensemble (frozenset) des identifiants des abonnés de `user_id`."""
+    return _get(FOLLOWERS, user_id)
+
+
+def invalidate(user_id, followed_user_id):
+    """Invalide les ensembles touchés par l'ajout ou la suppression de l'abonnement user_id -> followed_user_id."""
+    cache = _cache()
+    for kind, owner_id in ((FOLLOWED, user_id), (FOLLOWERS, followed_user_id)):
+        try:
+            cache.incr(_version_key(kind, owner_id))
+        except ValueError:  # Aucune version : l'ensemble n'a jamais été mis en cache
+            pass
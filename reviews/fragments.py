@@ -0,0 +1,72 @@
+"""Cache des fragments HTML des posts du flux.
+
+Un billet ou une critique s'affiche de la même façon pour tous les abonnés : son
+HTML est rendu une fois et mis en cache sous une clé qui contient son type, son
+identifiant, sa date de modification (updated_at) et une empreinte des noms
+d'utilisateur affichés (auteur du post et du billet). Une modification du post, de
+son billet ou un changement de nom change la clé : l'ancien fragment n'est plus lu
+et expire de lui-même, sans invalidation.
+
+Une page du flux lit tous ses fragments en une fois (get_many) et ne rend que
+ceux qui manquent. Les agrégats des billets (nombre de critiques...) changent
+sans modifier le billet : ils restent hors du fragment, rendus par feed.html.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .feed import REVIEW, TICKET
+
+FRAGMENT_CACHE_TIMEOUT = getattr(settings, 'FRAGMENT_CACHE_TIMEOUT', 24 * 3600)  # Durée de vie d'un fragment (secondes)
+
+TEMPLATES = {
+    TICKET: ('snippets/ticket_snippet.html', 'ticket'),  # (template, nom du post dans le contexte)
+    REVIEW: ('snippets/review_snippet.html', 'review'),
+}
+
+
+def _cache():
+    return caches[getattr(settings, 'FRAGMENT_CACHE_ALIAS', 'default')]
+
+
+def stamp(post):
+    """Date de dernière modification du contenu affiché par le fragment."""
+    if post.content_type == REVIEW:
+        return max(post.updated_at, post.ticket.updated_at)  # La critique affiche le titre de son billet
+    return post.updated_at
+
+
+def usernames(post):
+    """Noms d'utilisateur affichés par le fragment (sans date de modification : ils entrent tels quels dans la clé)."""
+    if post.content_type == REVIEW:
+        return post.user.username, post.ticket.user.username
+    return post.user.username,
+
+
+def fragment_key(post):
+    names = hashlib.sha1('\0'.join(usernames(post)).encode()).hexdigest()[:16]  # Noms quelconques : clé sûre pour memcached
+    return f'fragment:{post.content_type}:{post.pk}:{stamp(post).timestamp():.6f}:{names}'
+
+
+def render_post(post):
+    template_name, name = TEMPLATES[post.content_type]
+    return render_to_string(template_name, {name: post})
+
+
+def render_posts(posts):
+    """Renseigne `post.fragment` (HTML du post) pour chaque post de la page, depuis le cache ou par rendu."""
+    cache = _cache()
+    keys = [(post, fragment_key(post)) for post in posts]
+    cached = cache.get_many([key for _, key in keys])
+    missing = {}
+    for post, key in keys:
+        if key not in cached:
+            missing[key] = cached[key] = render_post(post)
+    if missing:
+        cache.set_many(missing, FRAGMENT_CACHE_TIMEOUT)
+    for post, key in keys:
+        post.fragment = mark_safe(cached[key])  # HTML produit par nos templates, déjà échappé
+    return posts
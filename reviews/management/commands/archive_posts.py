@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from reviews import archive
+
+
+class Command(BaseCommand):
+    help = ("Déplace vers les tables d'archive les billets dont tout le fil (critiques et commentaires compris) "
+            "est plus ancien que --days jours, par lots (une transaction par lot). À lancer chaque jour.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=archive.ARCHIVE_AFTER_DAYS,
+                            help="Âge minimal du post le plus récent d'un fil archivé.")
+        parser.add_argument('--chunk-size', type=int, default=archive.ARCHIVE_CHUNK_SIZE,
+                            help="Nombre de billets déplacés par transaction.")
+
+    def handle(self, *args, **options):
+        count = archive.archive_old_posts(options['days'], options['chunk_size'],
+                                          progress=lambda done: self.stdout.write(f'Billets : {done}', ending='\r'))
+        self.stdout.write(f'{count} billet(s) archivé(s) avec leurs critiques et commentaires.')
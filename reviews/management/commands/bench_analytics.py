@@ -0,0 +1,95 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, Q
+from django.db.models.functions import TruncMonth
+from django.test import Client
+from django.urls import reverse
+
+from reviews import analytics
+from reviews.benchmarks import client_settings, summarize
+from reviews.models import RatingSnapshot, Review, Ticket
+
+
+def orm_aggregates():
+    """Mêmes comptes que analytics.refresh(full=True), par des GROUP BY de l'ORM (référence du benchmark)."""
+    reviews = Review.objects.order_by()
+    return (
+        list(reviews.values('ticket_id', 'rating').annotate(n=Count('pk'))),
+        list(reviews.values('user_id', 'rating').annotate(n=Count('pk'))),
+        list(reviews.annotate(month=TruncMonth('time_created')).values('user_id', 'month').annotate(n=Count('pk'))),
+        list(reviews.annotate(month=TruncMonth('time_created')).values('ticket_id', 'month').annotate(n=Count('pk'))),
+    )
+
+
+def live_stats(user):
+    """Ce qu'afficherait la page de statistiques sans instantanés : agrégats calculés à la demande."""
+    tickets = list(Ticket.objects.filter(user=user).order_by('-time_created')[:analytics.STATS_TICKET_COUNT])
+    reviews = Review.objects.order_by()
+    return (
+        list(reviews.filter(user=user).values('rating').annotate(n=Count('pk'))),
+        list(reviews.filter(user=user).annotate(month=TruncMonth('time_created')).values('month').annotate(n=Count('pk'))),
+        list(reviews.filter(ticket__in=tickets).values('ticket_id', 'rating').annotate(n=Count('pk'))),
+    )
+
+
+def snapshot_stats(user):
+    """Lecture des instantanés, comme stats_view."""
+    tickets = list(Ticket.objects.filter(user=user).order_by('-time_created')[:analytics.STATS_TICKET_COUNT])
+    return list(RatingSnapshot.objects.filter(Q(kind=RatingSnapshot.USER, object_id=user.pk)
+                                              | Q(kind=RatingSnapshot.TICKET, object_id__in=[t.pk for t in tickets])))
+
+
+class Command(BaseCommand):
+    help = ("Compare le calcul par lots des statistiques des notes (analytics.refresh) aux agrégats GROUP BY de "
+            "l'ORM, puis la lecture des instantanés aux agrégats calculés à chaque affichage (p50/p95/p99). "
+            "Peuplez d'abord la base avec seed_litrevu.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20, help="Nombre de mesures de la lecture par page.")
+        parser.add_argument('--users', type=int, default=20, help="Nombre d'auteurs de billets dont la page est lue.")
+
+    def handle(self, *args, **options):
+        count = Review.objects.count()
+        if not count:
+            raise CommandError('Base vide : lancez seed_litrevu au préalable.')
+        self.stdout.write(f'{count} critiques')
+
+        start = time.perf_counter()
+        orm_aggregates()
+        self.stdout.write(f"{'GROUP BY (ORM)':<24} {time.perf_counter() - start:8.2f} s")
+        for backend in ('numpy', 'python'):
+            if backend == 'numpy' and analytics.np is None:
+                continue
+            saved, analytics.np = analytics.np, analytics.np if backend == 'numpy' else None
+            try:
+                start = time.perf_counter()
+                analytics.refresh(full=True)
+                self.stdout.write(f"{'refresh --full (' + backend + ')':<24} {time.perf_counter() - start:8.2f} s")
+            finally:
+                analytics.np = saved
+
+        users = [ticket.user for ticket in Ticket.objects.select_related('user').order_by('-time_created')[:options['users']]]
+        for name, method in (('instantanés', snapshot_stats), ('agrégats à la demande', live_stats)):
+            latencies = []
+            for i in range(options['iterations']):
+                user = users[i % len(users)]
+                start = time.perf_counter()
+                method(user)
+                latencies.append(time.perf_counter() - start)
+            summary = summarize(latencies)
+            self.stdout.write(f"{name:<24} p50 {summary['p50_ms']:8.1f} ms  p95 {summary['p95_ms']:8.1f} ms  "
+                              f"p99 {summary['p99_ms']:8.1f} ms")
+
+        with client_settings():  # Page complète, rendu compris
+            client, latencies = Client(), []
+            for i in range(options['iterations']):
+                client.force_login(users[i % len(users)])
+                start = time.perf_counter()
+                response = client.get(reverse('stats'))
+                latencies.append(time.perf_counter() - start)
+                if response.status_code != 200:
+                    raise CommandError(f'Page de statistiques : HTTP {response.status_code}')
+            summary = summarize(latencies)
+            self.stdout.write(f"{'page /stats/':<24} p50 {summary['p50_ms']:8.1f} ms  p95 {summary['p95_ms']:8.1f} ms  "
+                              f"p99 {summary['p99_ms']:8.1f} ms")
@@ -0,0 +1,63 @@
+import asyncio
+import time
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient
+from django.urls import reverse
+
+from reviews.benchmarks import client_settings, summarize
+
+# Vues comparées : (variante synchrone, variante asynchrone)
+VARIANTS = {
+    'feed': ('feed', 'afeed'),
+    'follows': ('list_followed_users', 'alist_followed_users'),
+}
+
+
+class Command(BaseCommand):
+    help = ("Compare le débit et la latence p99 des vues synchrones et asynchrones à travers le "
+            "gestionnaire ASGI, à concurrence croissante. À lancer sur une base peuplée (seed_litrevu).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', required=True, help="Utilisateur connecté pendant le benchmark.")
+        parser.add_argument('--requests', type=int, default=200, help="Nombre de requêtes par mesure.")
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16, 64],
+                            help="Niveaux de concurrence à mesurer.")
+        parser.add_argument('--view', choices=sorted(VARIANTS), default='feed', help="Vue à mesurer.")
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(username=options['username'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"Utilisateur inconnu : {options['username']}")
+        with client_settings():
+            asyncio.run(self.run(user, options))
+
+    async def run(self, user, options):
+        client = AsyncClient()
+        await sync_to_async(client.force_login)(user)
+
+        self.stdout.write(f"{'variante':<8} {'concurrence':>11} {'débit (req/s)':>14} {'p50 (ms)':>9} {'p99 (ms)':>9}")
+        for concurrency in options['concurrency']:
+            for variant, url_name in zip(('sync', 'async'), VARIANTS[options['view']]):
+                summary = await self.measure(client, reverse(url_name), options['requests'], concurrency)
+                self.stdout.write(f"{variant:<8} {concurrency:>11} {summary['throughput_rps']:>14.1f} "
+                                  f"{summary['p50_ms']:>9.1f} {summary['p99_ms']:>9.1f}")
+
+    async def measure(self, client, url, requests, concurrency):
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies = []
+
+        async def one_request():
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.get(url)
+                latencies.append(time.perf_counter() - start)
+                if response.status_code != 200:
+                    raise CommandError(f'{url} a répondu {response.status_code}')
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one_request() for _ in range(requests)))
+        return summarize(latencies, time.perf_counter() - start)
@@ -0,0 +1,115 @@
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+from django.test import Client
+from django.urls import reverse
+
+from litrevu.database import sqlite_database
+from reviews import throttling
+from reviews.benchmarks import client_settings, summarize
+from reviews.models import Ticket
+
+MARKER = 'bench-concurrency'  # Titre des billets créés par le benchmark, supprimés à la fin
+
+PROFILES = {
+    # Réglages par défaut de Django : journal DELETE, transactions DEFERRED, pas de pragma
+    'defaults': {'init_command': 'PRAGMA journal_mode = DELETE'},
+    # Réglages de production de litrevu.database
+    'tuned': sqlite_database(settings.DATABASES['default']['NAME'])['OPTIONS'],
+}
+
+
+class Command(BaseCommand):
+    help = ("Mesure la concurrence sur SQLite : des écrivains (add_ticket) et des lecteurs (flux, abonnements) "
+            "en parallèle, avec les réglages par défaut puis les réglages de production. Affiche le débit, "
+            "les latences et les erreurs « database is locked ». Les billets créés sont supprimés à la fin.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8, help="Nombre de threads écrivains.")
+        parser.add_argument('--readers', type=int, default=8, help="Nombre de threads lecteurs.")
+        parser.add_argument('--duration', type=float, default=10, help="Durée de chaque mesure (secondes).")
+        parser.add_argument('--profile', action='append', dest='profiles', choices=sorted(PROFILES), default=[],
+                            help="Réglages mesurés (option répétable ; par défaut : tous).")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Ce benchmark concerne SQLite.')
+        users = list(get_user_model().objects.order_by('?')[:options['writers'] + options['readers']])
+        if len(users) < options['writers'] + options['readers']:
+            raise CommandError("Pas assez d'utilisateurs : lancez seed_litrevu au préalable.")
+
+        original = dict(connections.settings['default']['OPTIONS'])
+        try:
+            for profile in options['profiles'] or ['defaults', 'tuned']:
+                self.configure(PROFILES[profile])
+                stats = self.run(users, options['writers'], options['duration'])
+                self.report(profile, stats, options['duration'])
+                Ticket.objects.filter(title=MARKER).delete()
+        finally:
+            self.configure(original)  # Rétablit aussi le journal WAL à la prochaine connexion
+
+    def configure(self, db_options):
+        """Change les options des nouvelles connexions ; chaque thread ouvre la sienne."""
+        settings_dict = connections.settings['default']
+        settings_dict['OPTIONS'] = dict(db_options)
+        connections['default'].close()
+        connections['default'].connect()  # Applique le mode de journal au fichier avant de lancer les threads
+
+    def run(self, users, writers, duration):
+        stats = {'write': [], 'read': [], 'locked': 0}
+        lock = threading.Lock()
+        clients = []
+        with client_settings(), throttling.disabled():  # Concurrence de SQLite, sans limitation des écritures
+            for i, user in enumerate(users):
+                client = Client()
+                client.force_login(user)
+                clients.append(('write' if i < writers else 'read', client))
+
+            start = threading.Barrier(len(clients))
+            threads = [threading.Thread(target=self.worker, args=(kind, client, start, duration, stats, lock))
+                       for kind, client in clients]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        return stats
+
+    def worker(self, kind, client, start, duration, stats, lock):
+        requests = {
+            'write': [('post', reverse('add_ticket'), {'title': MARKER, 'description': ''})],
+            'read': [('get', reverse('feed'), None), ('get', reverse('list_followed_users'), None)],
+        }[kind]
+        latencies, locked = [], 0
+        start.wait()
+        deadline = time.perf_counter() + duration
+        try:
+            while time.perf_counter() < deadline:
+                method, url, data = random.choice(requests)
+                began = time.perf_counter()
+                try:
+                    getattr(client, method)(url, data)
+                except OperationalError as error:
+                    if 'locked' not in str(error):
+                        raise
+                    locked += 1
+                else:
+                    latencies.append(time.perf_counter() - began)
+        finally:
+            connection.close()
+        with lock:
+            stats[kind].extend(latencies)
+            stats['locked'] += locked
+
+    def report(self, profile, stats, duration):
+        for kind in ('write', 'read'):
+            summary = summarize(stats[kind], elapsed=duration)
+            self.stdout.write(
+                f"{profile:<9} {kind:<6} {summary['throughput_rps']:7.1f} req/s  p50 {summary['p50_ms']:7.1f} ms  "
+                f"p95 {summary['p95_ms']:7.1f} ms  p99 {summary['p99_ms']:7.1f} ms"
+            )
+        self.stdout.write(f"{profile:<9} erreurs « database is locked » : {stats['locked']}")
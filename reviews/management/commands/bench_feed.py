@@ -0,0 +1,147 @@
+import json
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+
+from reviews import throttling
+from reviews.benchmarks import client_settings, summarize
+from reviews.feed import get_feed_page
+from reviews.models import Comment, Ticket, UserFollows
+from reviews.query_budget import count_queries
+
+
+class Rollback(Exception):
+    """Annule la transaction du benchmark : la base est laissée telle quelle."""
+
+
+class Command(BaseCommand):
+    help = ("Mesure les vues principales avec le client de test (latences p50/p95/p99, requêtes SQL par "
+            "requête, pic mémoire) et écrit les résultats en JSON. Les écritures sont annulées à la fin.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', help="Utilisateur mesuré (par défaut : celui qui suit le plus de comptes).")
+        parser.add_argument('--iterations', type=int, default=50, help="Nombre de requêtes par scénario.")
+        parser.add_argument('--output', default='bench_results.json', help="Fichier JSON des résultats.")
+        parser.add_argument('--scenario', action='append', dest='scenarios', default=[],
+                            help="Ne lancer que ce scénario (option répétable).")
+
+    def handle(self, *args, **options):
+        user = self.pick_user(options['username'])
+        self.stdout.write(f'Utilisateur mesuré : {user.username}')
+
+        results = {}
+        try:
+            with client_settings(), throttling.disabled(), transaction.atomic():  # Coût des vues, sans limitation
+                client = Client()
+                client.force_login(user)
+                scenarios = self.scenarios(user, options['iterations'])
+                for name, requests in scenarios.items():
+                    if not requests or (options['scenarios'] and name not in options['scenarios']):
+                        continue
+                    results[name] = self.measure(client, requests)
+                    self.report(name, results[name])
+                raise Rollback
+        except Rollback:
+            pass
+
+        payload = {
+            'commit': self.git_commit(),
+            'date': datetime.now(timezone.utc).isoformat(),
+            'user': user.username,
+            'iterations': options['iterations'],
+            'results': results,
+        }
+        with open(options['output'], 'w') as output:
+            json.dump(payload, output, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Résultats écrits dans {options['output']}"))
+
+    def pick_user(self, username):
+        User = get_user_model()
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'Utilisateur inconnu : {username}')
+        user = User.objects.annotate(n=Count('following')).order_by('-n').first()
+        if user is None:
+            raise CommandError('Base vide : lancez seed_litrevu au préalable.')
+        return user
+
+    def scenarios(self, user, iterations):
+        """Prépare, hors mesure, les requêtes de chaque scénario : {nom: [(méthode, url, données)]}."""
+        feed = reverse('feed')
+        _, next_cursor = get_feed_page(user)  # Curseur de la deuxième page
+
+        own_tickets = [Ticket.objects.create(user=user, title=f'Bench {i}') for i in range(iterations)]
+        own_comments = [Comment.objects.create(user=user, ticket=ticket, body='Bench') for ticket in own_tickets]
+        followed = set(UserFollows.objects.filter(user=user).values_list('followed_user_id', flat=True))
+        to_follow = list(get_user_model().objects.exclude(pk__in=followed | {user.pk})
+                         .values_list('username', flat=True)[:iterations])
+
+        return {
+            'feed': [('get', feed, None)] * iterations,
+            'feed_page_2': [('get', feed, {'cursor': next_cursor})] * iterations if next_cursor else [],
+            'list_followed_users': [('get', reverse('list_followed_users'), None)] * iterations,
+            'add_ticket': [('post', reverse('add_ticket'), {'title': f'Nouveau {i}', 'description': ''})
+                           for i in range(iterations)],
+            'add_follow': [('post', reverse('add_follow'), {'username': username}) for username in to_follow],
+            'edit_ticket': [('post', reverse('edit_ticket', args=[t.pk]), {'title': 'Modifié', 'description': ''})
+                            for t in own_tickets],
+            'edit_comment': [('post', reverse('edit_comment', args=[c.pk]), {'body': 'Modifié'})
+                             for c in own_comments],
+            'delete_comment': [('post', reverse('delete_comment', args=[c.pk]), None) for c in own_comments],
+            'delete_ticket': [('post', reverse('delete_ticket', args=[t.pk]), None) for t in own_tickets],
+        }
+
+    def measure(self, client, requests, memory_samples=3):
+        """Exécute les requêtes d'un scénario.
+
+        Les premières requêtes servent d'échauffement et de mesure mémoire (tracemalloc
+        ralentit fortement l'exécution) ; les suivantes seules sont chronométrées.
+        """
+        latencies, queries, peak = [], [], 0
+        for i, (method, url, data) in enumerate(requests):
+            traced = i < memory_samples
+            if traced:
+                tracemalloc.start()
+            with count_queries() as counter:
+                start = time.perf_counter()
+                response = getattr(client, method)(url, data)
+                elapsed = time.perf_counter() - start
+            if traced:
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+                tracemalloc.stop()
+            else:
+                latencies.append(elapsed)
+            if response.status_code >= 400:
+                raise CommandError(f'{url} a répondu {response.status_code}')
+            queries.append(counter.count)
+
+        summary = summarize(latencies)
+        summary['queries_per_request'] = sum(queries) / len(queries)
+        summary['max_queries'] = max(queries)
+        summary['peak_memory_kb'] = peak / 1024
+        return summary
+
+    def report(self, name, summary):
+        self.stdout.write(
+            f"{name:<20} p50 {summary['p50_ms']:7.1f} ms  p95 {summary['p95_ms']:7.1f} ms  "
+            f"p99 {summary['p99_ms']:7.1f} ms  {summary['queries_per_request']:5.1f} req. SQL  "
+            f"pic {summary['peak_memory_kb']:8.0f} Ko"
+        )
+
+    def git_commit(self):
+        try:
+            return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                                  capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
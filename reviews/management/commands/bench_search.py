@@ -0,0 +1,54 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+
+from reviews import search
+from reviews.benchmarks import summarize
+from reviews.models import Comment, Review, Ticket
+
+DEFAULT_QUERIES = ['roman', 'intrigue captivant', 'terme150', 'terme15000', 'myst']
+
+
+class Command(BaseCommand):
+    help = ("Compare la recherche FTS5 à la recherche naïve LIKE '%mot%' (latences p50/p95/p99 par requête). "
+            "Peuplez d'abord la base avec seed_litrevu, par exemple avec un million de posts.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', help="Utilisateur qui cherche (par défaut : celui qui suit le plus de comptes).")
+        parser.add_argument('--query', action='append', dest='queries', default=[],
+                            help="Requête mesurée (option répétable).")
+        parser.add_argument('--iterations', type=int, default=20, help="Nombre d'exécutions par requête et par méthode.")
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            raise CommandError("La recherche FTS5 n'existe que sous SQLite.")
+        user = self.pick_user(options['username'])
+        rows = Ticket.objects.count() + Review.objects.count() + Comment.objects.count()
+        self.stdout.write(f'{rows} posts, utilisateur : {user.username}')
+
+        for query in options['queries'] or DEFAULT_QUERIES:
+            for name, method in (('fts5', search.fts_search), ('like', search.like_search)):
+                latencies = []
+                for _ in range(options['iterations']):
+                    start = time.perf_counter()
+                    found = method(user, query)
+                    latencies.append(time.perf_counter() - start)
+                summary = summarize(latencies)
+                self.stdout.write(
+                    f"{query!r:<24} {name:<5} p50 {summary['p50_ms']:8.1f} ms  p95 {summary['p95_ms']:8.1f} ms  "
+                    f"p99 {summary['p99_ms']:8.1f} ms  {len(found)} résultat(s) en première page"
+                )
+
+    def pick_user(self, username):
+        User = get_user_model()
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'Utilisateur inconnu : {username}')
+        user = User.objects.annotate(n=Count('following')).order_by('-n').first()
+        if user is None:
+            raise CommandError('Base vide : lancez seed_litrevu au préalable.')
+        return user
@@ -0,0 +1,74 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from reviews import auth_cache
+from reviews.benchmarks import client_settings, summarize
+from reviews.query_budget import count_queries, view_query_counts
+
+BACKENDS = {
+    'base': 'django.contrib.auth.backends.ModelBackend',  # Utilisateur relu à chaque requête
+    'cache': 'reviews.auth_cache.CachedModelBackend',
+}
+
+
+class Command(BaseCommand):
+    help = ("Compare les modes de session (base, cache, cookie signé), avec et sans utilisateur en cache : "
+            "requêtes SQL hors vue (session et utilisateur) et latences d'une page du flux déjà en cache.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', help="Utilisateur mesuré (par défaut : celui qui suit le plus de comptes).")
+        parser.add_argument('--iterations', type=int, default=500, help="Nombre de requêtes par mode.")
+
+    def handle(self, *args, **options):
+        user = self.pick_user(options['username'])
+        self.stdout.write(f'Utilisateur mesuré : {user.username}')
+        for session_mode, engine in settings.SESSION_ENGINES.items():  # Modes possibles de SESSION_MODE
+            for user_mode, backend in BACKENDS.items():
+                with client_settings(), override_settings(SESSION_ENGINE=engine, AUTHENTICATION_BACKENDS=[backend]):
+                    auth_cache.invalidate([user.pk])  # Chaque mode part d'un cache vide
+                    client = Client()  # Nouveau client : le middleware de session lit SESSION_ENGINE à son chargement
+                    client.force_login(user)
+                    self.report(session_mode, user_mode, self.measure(client, options['iterations']))
+
+    def pick_user(self, username):
+        User = get_user_model()
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'Utilisateur inconnu : {username}')
+        user = User.objects.annotate(n=Count('following')).order_by('-n').first()
+        if user is None:
+            raise CommandError('Base vide : lancez seed_litrevu au préalable.')
+        return user
+
+    def measure(self, client, iterations):
+        url = reverse('feed')
+        for _ in range(5):  # Échauffement : page du flux, session et utilisateur mis en cache
+            client.get(url)
+        latencies, outside_view = [], 0
+        for _ in range(iterations):
+            began = time.perf_counter()
+            with count_queries() as counter:
+                response = client.get(url)
+            latencies.append(time.perf_counter() - began)
+            if response.status_code != 200:
+                raise CommandError(f'Réponse {response.status_code} : session perdue ?')
+            outside_view += counter.count - view_query_counts['feed']  # Session, utilisateur (middlewares)
+        summary = summarize(latencies)
+        summary['queries_outside_view'] = outside_view / iterations
+        return summary
+
+    def report(self, session_mode, user_mode, summary):
+        self.stdout.write(
+            f"session {session_mode:<15} utilisateur {user_mode:<6} requêtes hors vue "
+            f"{summary['queries_outside_view']:4.2f}  p50 {summary['p50_ms']:6.2f} ms  "
+            f"p95 {summary['p95_ms']:6.2f} ms  moyenne {summary['mean_ms']:6.2f} ms"
+        )
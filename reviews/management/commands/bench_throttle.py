@@ -0,0 +1,125 @@
+import logging
+import multiprocessing
+import threading
+import time
+from contextlib import nullcontext
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from django.test import Client
+from django.urls import reverse
+
+from reviews import throttling
+from reviews.benchmarks import client_settings, summarize
+from reviews.models import Ticket
+
+MARKER = 'bench-throttle'  # Titre des billets créés par le benchmark, supprimés à la fin
+
+SCENARIOS = (
+    ('calme', False, True),  # (nom, inondation, limitation)
+    ('inondé', True, False),
+    ('inondé, limité', True, True),
+)
+
+
+class Command(BaseCommand):
+    help = ("Test de charge de la limitation des écritures : des lecteurs du flux mesurent leurs latences "
+            "(p50/p95/p99) sans écriture, puis pendant qu'un seul client publie en boucle, sans puis avec "
+            "limitation. Lecteurs et client qui inonde tournent dans deux processus, comme deux workers du "
+            "serveur sur la même base. Les billets créés sont supprimés à la fin.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4, help="Nombre de threads lecteurs du flux.")
+        parser.add_argument('--flooders', type=int, default=4,
+                            help="Threads du client qui inonde (même compte, même adresse IP).")
+        parser.add_argument('--duration', type=float, default=10, help="Durée de chaque mesure (secondes).")
+
+    def handle(self, *args, **options):
+        count = options['readers'] + len(SCENARIOS)
+        users = list(get_user_model().objects.filter(is_active=True, deleted_at__isnull=True).order_by('?')[:count])
+        if len(users) < count:
+            raise CommandError("Pas assez d'utilisateurs : lancez seed_litrevu au préalable.")
+        readers = users[len(SCENARIOS):]
+        request_logger = logging.getLogger('django.request')
+        level = request_logger.level
+        request_logger.setLevel(logging.ERROR)  # Pas d'avertissement « Too Many Requests » par écriture refusée
+        try:
+            for i, (name, flood, limited) in enumerate(SCENARIOS):
+                flooder = (users[i], f'192.0.2.{i + 1}') if flood else None  # Compte et adresse neufs : seaux pleins
+                with client_settings(), (nullcontext() if limited else throttling.disabled()):
+                    stats = self.run(readers, flooder, options['flooders'], options['duration'])
+                self.report(name, stats, options['duration'])
+        finally:
+            request_logger.setLevel(level)
+            Ticket.all_objects.filter(title=MARKER).delete()
+
+    def run(self, readers, flooder, flooders, duration):
+        """Lance les lecteurs et le client qui inonde dans deux processus ; retourne leurs mesures réunies."""
+        groups = [[('read', user, f'10.0.0.{i + 1}') for i, user in enumerate(readers)]]  # Une adresse par lecteur
+        if flooder is not None:
+            groups.append([('flood', *flooder)] * flooders)
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+        start = context.Barrier(sum(len(group) for group in groups))
+        connection.close()  # Pas de connexion SQLite partagée avec les processus enfants
+        processes = [context.Process(target=self.process, args=(group, start, duration, results)) for group in groups]
+        for process in processes:
+            process.start()
+        stats = {'read': [], 'accepted': 0, 'rejected': 0, 'locked': 0}
+        for _ in processes:
+            for key, value in results.get().items():
+                stats[key] += value
+        for process in processes:
+            process.join()
+        return stats
+
+    def process(self, workers, start, duration, results):
+        """Processus enfant : un thread par client, mesures renvoyées au parent."""
+        stats = {'read': [], 'accepted': 0, 'rejected': 0, 'locked': 0}
+        lock = threading.Lock()
+        threads = [threading.Thread(target=self.worker, args=(kind, user, address, start, duration, stats, lock))
+                   for kind, user, address in workers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        results.put(stats)
+
+    def worker(self, kind, user, address, start, duration, stats, lock):
+        client = Client(REMOTE_ADDR=address)
+        client.force_login(user)
+        latencies, counts = [], {'accepted': 0, 'rejected': 0, 'locked': 0}
+        start.wait()
+        deadline = time.perf_counter() + duration
+        try:
+            while time.perf_counter() < deadline:
+                began = time.perf_counter()
+                try:
+                    if kind == 'read':
+                        client.get(reverse('feed'))
+                    else:
+                        status = client.post(reverse('add_ticket'), {'title': MARKER, 'description': ''}).status_code
+                        counts['rejected' if status == 429 else 'accepted'] += 1
+                except OperationalError as error:
+                    if 'locked' not in str(error):
+                        raise
+                    counts['locked'] += 1
+                else:
+                    if kind == 'read':
+                        latencies.append(time.perf_counter() - began)
+        finally:
+            connection.close()
+        with lock:
+            stats['read'].extend(latencies)
+            for key, count in counts.items():
+                stats[key] += count
+
+    def report(self, name, stats, duration):
+        summary = summarize(stats['read'], elapsed=duration)
+        self.stdout.write(
+            f"{name:<16} flux {summary['throughput_rps']:7.1f} req/s  p50 {summary['p50_ms']:7.1f} ms  "
+            f"p95 {summary['p95_ms']:7.1f} ms  p99 {summary['p99_ms']:7.1f} ms  |  écritures acceptées "
+            f"{stats['accepted']}, refusées (429) {stats['rejected']}, « database is locked » {stats['locked']}"
+        )
+
@@ -0,0 +1,38 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from reviews import timeline
+
+
+class Command(BaseCommand):
+    help = "Compare les flux matérialisés aux requêtes de visibilité en direct et signale les écarts."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', dest='usernames', default=[],
+                            help="Ne vérifier que le flux de cet utilisateur (option répétable).")
+        parser.add_argument('--fix', action='store_true', help="Reconstruit les flux incohérents.")
+
+    def handle(self, *args, **options):
+        users = get_user_model().objects.order_by('pk')
+        if options['usernames']:
+            users = users.filter(username__in=options['usernames'])
+
+        inconsistent = 0
+        for user in users.iterator():
+            missing, extra = timeline.check(user)
+            if not missing and not extra:
+                continue
+            inconsistent += 1
+            self.stdout.write(f'{user.username} : {len(missing)} manquant(s), {len(extra)} en trop')
+            for kind, object_id in sorted(missing):
+                self.stdout.write(f'  - manquant {kind} {object_id}')
+            for kind, object_id in sorted(extra):
+                self.stdout.write(f'  + en trop {kind} {object_id}')
+            if options['fix']:
+                with transaction.atomic():
+                    timeline.rebuild(user.pk)
+
+        if inconsistent and not options['fix']:
+            raise CommandError(f'{inconsistent} flux incohérent(s).')
+        self.stdout.write(self.style.SUCCESS(f'Vérification terminée ({inconsistent} flux incohérent(s)).'))
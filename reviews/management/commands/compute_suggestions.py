@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from reviews import recommendations
+
+
+class Command(BaseCommand):
+    help = ("Recalcule les suggestions d'abonnement des utilisateurs dont les abonnements ont changé depuis "
+            "le dernier passage (et de leurs abonnés). Avec --full, recalcule celles de tous les utilisateurs.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help="Recalcule tout (à lancer chaque jour : l'activité récente évolue sans abonnement).")
+        parser.add_argument('--batch-size', type=int, default=recommendations.SUGGESTION_BATCH_SIZE,
+                            help="Nombre d'utilisateurs écrits par transaction.")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = recommendations.refresh(full=options['full'], batch_size=options['batch_size'],
+                                        progress=lambda done: self.stdout.write(f'Utilisateurs : {done}', ending='\r'))
+        backend = 'NumPy' if recommendations.np is not None else 'Python'
+        self.stdout.write(f'Suggestions recalculées pour {count} utilisateur(s) en {time.perf_counter() - started:.2f} s '
+                          f'(calcul {backend}).')
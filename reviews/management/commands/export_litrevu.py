@@ -0,0 +1,38 @@
+import json
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from reviews import transfer
+
+
+class Command(BaseCommand):
+    help = ("Exporte utilisateurs, billets, critiques, commentaires, fils archivés et abonnements au format JSONL "
+            "(une ligne par objet), en flux et en mémoire constante.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Fichier JSONL à écrire ('-' pour la sortie standard).")
+        parser.add_argument('--chunk-size', type=int, default=transfer.CHUNK_SIZE,
+                            help="Nombre de lignes lues par requête.")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        counts = dict.fromkeys(transfer.SECTIONS, 0)
+        output = sys.stdout if options['path'] == '-' else open(options['path'], 'w', encoding='utf-8')
+        try:
+            for record in transfer.export_records(chunk_size=options['chunk_size']):
+                output.write(json.dumps(record, cls=transfer.JSONEncoder, ensure_ascii=False))
+                output.write('\n')
+                counts[record['model']] += 1
+        finally:
+            if output is not sys.stdout:
+                output.close()
+
+        elapsed = time.perf_counter() - start
+        total = sum(counts.values())
+        # Le résumé va sur stderr : la sortie standard peut contenir l'export lui-même
+        self.stderr.write(', '.join(f'{section} : {count}' for section, count in counts.items()))
+        self.stderr.write(self.style.SUCCESS(
+            f'{total} objets exportés en {elapsed:.1f} s ({total / elapsed if elapsed else 0:.0f} objets/s).'
+        ))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from reviews import feed_cache
+
+
+class Command(BaseCommand):
+    help = ("Affiche les compteurs du cache du flux (succès, échecs, invalidations). "
+            "Avec un cache en mémoire locale, seuls les compteurs de ce processus sont visibles.")
+
+    def handle(self, *args, **options):
+        stats = feed_cache.stats()
+        self.stdout.write(f"Succès : {stats['hits']}")
+        self.stdout.write(f"Échecs : {stats['misses']}")
+        self.stdout.write(f"Invalidations : {stats['invalidations']}")
+        self.stdout.write(f"Taux de succès : {stats['hit_rate']:.1%}")
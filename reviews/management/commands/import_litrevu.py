@@ -0,0 +1,133 @@
+import json
+import os
+import time
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from reviews import transfer
+
+
+class Command(BaseCommand):
+    help = ("Importe un export JSONL de export_litrevu : lignes validées, insérées par lots dans des "
+            "transactions successives, avec reprise sur point de contrôle après une interruption.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Fichier JSONL à importer.")
+        parser.add_argument('--chunk-size', type=int, default=5000,
+                            help="Nombre de lignes importées par transaction.")
+        parser.add_argument('--batch-size', type=int, default=transfer.BATCH_SIZE,
+                            help="Nombre d'objets par bulk_create.")
+        parser.add_argument('--checkpoint', help="Fichier de point de contrôle (par défaut : <path>.checkpoint).")
+        parser.add_argument('--restart', action='store_true',
+                            help="Ignorer un point de contrôle existant et reprendre l'import au début.")
+        parser.add_argument('--skip-derived', action='store_true',
+                            help="Ne pas reconstruire les flux matérialisés et les agrégats à la fin.")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        checkpoint_path = options['checkpoint'] or f'{path}.checkpoint'
+        state = None if options['restart'] else self.load_checkpoint(checkpoint_path, path)
+        try:
+            source = open(path, 'rb')  # Mode binaire : la taille des lignes en octets donne la position de reprise
+        except OSError as error:
+            raise CommandError(f'Impossible de lire {path} : {error}')
+        with source:
+            if state is None:
+                # Première passe sur le fichier : plages d'identifiants réservées avant le premier lot
+                offsets = transfer.reserve_offsets(transfer.max_source_ids(source))
+                state = {'path': os.path.abspath(path), 'offset': 0, 'line': 0, 'offsets': offsets,
+                         'created': dict.fromkeys(transfer.SECTIONS, 0), 'rejected': 0}
+                self.save_checkpoint(checkpoint_path, state)  # Une reprise réutilise la plage réservée
+            else:
+                self.stdout.write(f"Reprise à la ligne {state['line'] + 1}.")
+
+            importer = transfer.Importer(state['offsets'], batch_size=options['batch_size'])
+            start, lines_done = time.perf_counter(), 0
+            source.seek(state['offset'])
+            for chunk, size in self.read_chunks(source, state['line'], options['chunk_size']):
+                created, errors = importer.import_chunk(chunk.records)
+                for line_no, message in chunk.errors + errors:
+                    self.stderr.write(f'Ligne {line_no} : {message}')
+                for section, count in created.items():
+                    state['created'][section] += count
+                state['rejected'] += len(chunk.errors) + len(errors)
+                state['offset'] += size
+                state['line'] = chunk.last_line
+                self.save_checkpoint(checkpoint_path, state)  # Après le commit : un lot n'est jamais rejoué à moitié
+                lines_done += chunk.line_count
+                elapsed = time.perf_counter() - start
+                self.stdout.write(f"{state['line']} lignes ({lines_done / elapsed:.0f} lignes/s)", ending='\r')
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write('')
+        self.stdout.write(', '.join(f'{section} : {count}' for section, count in state['created'].items()))
+        if not options['skip_derived']:
+            # Les insertions en masse n'envoient pas de signaux : agrégats, index de recherche et flux sont reconstruits en bloc
+            call_command('recompute_ticket_stats', stdout=self.stdout)
+            call_command('rebuild_search', stdout=self.stdout)
+            call_command('rebuild_feed', stdout=self.stdout)
+        cache.clear()  # Les ensembles d'abonnements et les pages du flux en cache sont périmés
+        if os.path.exists(checkpoint_path):  # Import terminé : une nouvelle exécution repartira du début
+            os.remove(checkpoint_path)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{state['line']} lignes traitées, {state['rejected']} rejetée(s), en {elapsed:.1f} s "
+            f"({lines_done / elapsed if elapsed else 0:.0f} lignes/s)."
+        ))
+
+    def read_chunks(self, source, line_no, chunk_size):
+        """Découpe le fichier en lots de `chunk_size` lignes ; génère (lot, taille en octets du lot)."""
+        chunk, size = Chunk(), 0
+        for raw in source:
+            line_no += 1
+            size += len(raw)
+            chunk.add(line_no, raw)
+            if chunk.line_count >= chunk_size:
+                yield chunk, size
+                chunk, size = Chunk(), 0
+        if chunk.line_count:
+            yield chunk, size
+
+    def load_checkpoint(self, checkpoint_path, path):
+        try:
+            with open(checkpoint_path) as checkpoint:
+                state = json.load(checkpoint)
+        except FileNotFoundError:
+            return None
+        if state['path'] != os.path.abspath(path):
+            raise CommandError(f"Le point de contrôle {checkpoint_path} concerne un autre fichier : {state['path']}")
+        return state
+
+    def save_checkpoint(self, checkpoint_path, state):
+        """Écrit le point de contrôle de façon atomique (fichier temporaire puis renommage)."""
+        tmp_path = f'{checkpoint_path}.tmp'
+        with open(tmp_path, 'w') as checkpoint:
+            json.dump(state, checkpoint)
+        os.replace(tmp_path, checkpoint_path)
+
+
+class Chunk:
+    """Lot de lignes lues : enregistrements décodés et erreurs de décodage."""
+
+    def __init__(self):
+        self.records = []
+        self.errors = []
+        self.line_count = 0
+        self.last_line = 0
+
+    def add(self, line_no, raw):
+        self.line_count += 1
+        self.last_line = line_no
+        if not raw.strip():
+            return
+        try:
+            record = json.loads(raw)
+        except ValueError as error:
+            self.errors.append((line_no, f'JSON invalide ({error})'))
+            return
+        if not isinstance(record, dict):
+            self.errors.append((line_no, 'un objet JSON est attendu'))
+        else:
+            self.records.append((line_no, record))
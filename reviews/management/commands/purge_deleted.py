@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from reviews import purge
+
+
+class Command(BaseCommand):
+    help = ("Supprime définitivement les comptes, billets, critiques et commentaires supprimés logiquement, "
+            "par lots (une transaction par lot). Normalement exécuté en tâche d'arrière-plan après chaque suppression.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=purge.PURGE_CHUNK_SIZE,
+                            help="Nombre de lignes supprimées par transaction.")
+
+    def handle(self, *args, **options):
+        totals = purge.purge_deleted(options['chunk_size'], progress=self.progress)
+        self.stdout.write('Purge terminée : ' + ', '.join(f'{count} {stage}' for stage, count in totals.items()))
+
+    def progress(self, stage, count):
+        self.stdout.write(f'  {stage} : {count} supprimé(e)s')
@@ -0,0 +1,29 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from reviews import timeline
+
+
+class Command(BaseCommand):
+    help = "Reconstruit les flux matérialisés (FeedEntry) à partir des tables Ticket, Review et UserFollows."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', dest='usernames', default=[],
+                            help="Ne reconstruire que le flux de cet utilisateur (option répétable).")
+        parser.add_argument('--batch-size', type=int, default=timeline.BATCH_SIZE,
+                            help="Nombre d'entrées insérées par requête.")
+
+    def handle(self, *args, **options):
+        users = get_user_model().objects.order_by('pk')
+        if options['usernames']:
+            users = users.filter(username__in=options['usernames'])
+
+        total = users.count()
+        for done, user_id in enumerate(users.values_list('pk', flat=True).iterator(), start=1):
+            with transaction.atomic():  # Un flux n'est jamais visible à moitié reconstruit
+                timeline.rebuild(user_id, batch_size=options['batch_size'])
+            if done % 100 == 0 or done == total:
+                self.stdout.write(f'{done}/{total} flux reconstruits')
+
+        self.stdout.write(self.style.SUCCESS(f'{total} flux reconstruits.'))
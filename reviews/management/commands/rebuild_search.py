@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from reviews import search
+
+
+class Command(BaseCommand):
+    help = "Reconstruit l'index de recherche plein texte (FTS5) à partir des billets, critiques et commentaires."
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            self.stdout.write("L'index FTS5 n'existe que sous SQLite ; la recherche utilise LIKE sur ce moteur.")
+            return
+        count = search.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'{count} posts indexés.'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from reviews import ticket_stats
+
+
+class Command(BaseCommand):
+    help = "Recalcule les agrégats des billets (critiques, notes, commentaires) et signale les écarts corrigés."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=ticket_stats.BATCH_SIZE,
+                            help="Nombre de billets recalculés par requête.")
+
+    def handle(self, *args, **options):
+        drift = ticket_stats.recompute(batch_size=options['batch_size'])
+        for ticket_id, stored, computed in drift:
+            self.stdout.write(f'Billet {ticket_id} : {stored or "absent"} -> {computed}')
+        self.stdout.write(self.style.SUCCESS(f'Agrégats recalculés ({len(drift)} écart(s) corrigé(s)).'))
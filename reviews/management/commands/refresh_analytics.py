@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from reviews import analytics
+
+
+class Command(BaseCommand):
+    help = ("Met à jour les statistiques des notes (distribution, moyenne, activité mensuelle) avec les critiques "
+            "publiées depuis le dernier passage. Avec --full, les recalcule entièrement.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help="Recalcule tout (à lancer chaque jour : prend en compte les critiques modifiées ou supprimées).")
+        parser.add_argument('--batch-size', type=int, default=analytics.ANALYTICS_BATCH_SIZE,
+                            help="Nombre d'instantanés écrits par requête.")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = analytics.refresh(full=options['full'], batch_size=options['batch_size'])
+        backend = 'NumPy' if analytics.np is not None else 'Python'
+        self.stdout.write(f'{count} critique(s) prise(s) en compte en {time.perf_counter() - started:.2f} s '
+                          f'(calcul {backend}).')
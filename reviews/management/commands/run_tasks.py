@@ -0,0 +1,45 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from reviews import tasks
+
+
+class Command(BaseCommand):
+    help = ("Lance un worker de tâches d'arrière-plan (pool de threads alimenté par la file en base). "
+            "Avec --burst, s'arrête quand la file est vide ; avec --stats, affiche les métriques de la file.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4, help="Nombre de threads d'exécution.")
+        parser.add_argument('--burst', action='store_true', help="Traite la file puis s'arrête.")
+        parser.add_argument('--stats', action='store_true', help="Affiche la profondeur de la file et la latence, sans rien exécuter.")
+        parser.add_argument('--purge-days', type=float, default=1,
+                            help="Supprime au démarrage les tâches terminées depuis plus de N jours.")
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self.report()
+            return
+        purged = tasks.purge(timedelta(days=options['purge_days']))
+        requeued = tasks.requeue_stale()
+        self.stdout.write(f'{purged} tâche(s) terminée(s) supprimée(s), {requeued} tâche(s) interrompue(s) remise(s) en file.')
+
+        worker = tasks.Worker(options['threads'])
+        try:
+            worker.loop(burst=options['burst'])  # Distribution dans le thread principal ; Ctrl+C pour arrêter
+        except KeyboardInterrupt:
+            self.stdout.write('Arrêt : fin des tâches en cours...')
+        finally:
+            worker.stop()
+        self.report()
+
+    def report(self):
+        stats = tasks.metrics()
+        self.stdout.write(
+            f"File : {stats['pending']} en attente (la plus ancienne depuis {stats['oldest_pending_s']:.1f} s), "
+            f"{stats['running']} en cours, {stats['failed']} en échec, {stats['done']} terminée(s)"
+        )
+        self.stdout.write(
+            f"Latence sur la dernière heure ({stats['done_in_window']} tâches) : p50 {stats['latency_p50_ms']:.1f} ms, "
+            f"p95 {stats['latency_p95_ms']:.1f} ms, p99 {stats['latency_p99_ms']:.1f} ms"
+        )
@@ -0,0 +1,194 @@
+import random
+import time
+from array import array
+from bisect import bisect
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from reviews.models import Comment, Review, Ticket, UserFollows, username_key
+from reviews import transfer
+
+RATING_WEIGHTS = [2, 3, 8, 20, 37, 30]  # Répartition réaliste des notes de 0 à 5
+
+# Vocabulaire des textes générés : mots courants, puis une longue traîne de termes rares
+COMMON_WORDS = (
+    'livre roman auteur histoire personnage lecture page chapitre fin début style intrigue récit '
+    'monde vie amour guerre famille enfant ville voyage nuit temps mémoire secret mystère enquête '
+    'poésie théâtre essai science fiction fantastique policier thriller biographie classique '
+    'magnifique captivant ennuyeux long court lent rapide émouvant drôle sombre brillant original '
+    'recommande conseille déçu surpris touché ému passionnant profond léger dense fluide '
+    'écriture traduction édition couverture suite tome saga série lecteur critique avis note'
+).split()
+VOCABULARY = COMMON_WORDS + [f'terme{i}' for i in range(20000)]
+
+
+class PowerLaw:
+    """Tirage d'indices 0..n-1 selon une loi de puissance (rang ** -alpha) : quelques comptes très populaires."""
+
+    def __init__(self, n, alpha, rng):
+        self.rng = rng
+        self.cum_weights = list(accumulate((rank + 1) ** -alpha for rank in range(n)))
+        self.total = self.cum_weights[-1]
+
+    def sample(self):
+        return bisect(self.cum_weights, self.rng.random() * self.total)
+
+
+class Command(BaseCommand):
+    help = ("Peuple la base avec des données synthétiques réalistes : graphe d'abonnements en loi de "
+            "puissance, billets, critiques et commentaires étalés dans le temps.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000, help="Nombre d'utilisateurs.")
+        parser.add_argument('--tickets', type=int, default=10000, help="Nombre de billets.")
+        parser.add_argument('--reviews', type=int, default=20000, help="Nombre de critiques.")
+        parser.add_argument('--comments', type=int, default=20000, help="Nombre de commentaires.")
+        parser.add_argument('--follows-per-user', type=int, default=20, help="Nombre moyen d'abonnements par utilisateur.")
+        parser.add_argument('--days', type=int, default=365, help="Période couverte par les dates de création.")
+        parser.add_argument('--batch-size', type=int, default=5000, help="Nombre de lignes par bulk_create.")
+        parser.add_argument('--seed', type=int, default=None, help="Graine aléatoire, pour des données reproductibles.")
+        parser.add_argument('--skip-derived', action='store_true',
+                            help="Ne pas reconstruire les flux matérialisés et les agrégats à la fin.")
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+        self.days = options['days']
+        self.word_weights = list(accumulate(1 / (rank + 1) for rank in range(len(VOCABULARY))))
+        start = time.perf_counter()
+
+        user_ids = self.create_users(options['users'])
+        self.create_follows(user_ids, options['follows_per_user'])
+        # Identifiants réservés d'avance : billets, critiques et commentaires sont insérés avec leurs dates, sans pre_save
+        self.offsets = transfer.reserve_offsets({transfer.TICKET: options['tickets'], transfer.REVIEW: options['reviews'],
+                                                 transfer.COMMENT: options['comments']})
+        ticket_ids, ticket_times = self.create_tickets(user_ids, options['tickets'])
+        self.create_replies(Review, user_ids, ticket_ids, ticket_times, options['reviews'])
+        self.create_replies(Comment, user_ids, ticket_ids, ticket_times, options['comments'])
+
+        if not options['skip_derived']:
+            # Les insertions en masse n'envoient pas de signaux : agrégats, index de recherche et flux sont reconstruits en bloc
+            call_command('recompute_ticket_stats', stdout=self.stdout)
+            call_command('rebuild_search', stdout=self.stdout)
+            call_command('rebuild_feed', batch_size=self.batch_size, stdout=self.stdout)
+        cache.clear()  # Les ensembles d'abonnements et les pages du flux en cache sont périmés
+
+        self.stdout.write(self.style.SUCCESS(f'Base peuplée en {time.perf_counter() - start:.1f} s.'))
+
+    def text(self, min_words, max_words):
+        """Texte aléatoire dont les mots suivent une loi de Zipf, comme dans une langue réelle."""
+        return ' '.join(self.rng.choices(VOCABULARY, cum_weights=self.word_weights,
+                                         k=self.rng.randint(min_words, max_words))).capitalize() + '.'
+
+    def random_time(self, after=None):
+        """Date aléatoire, plus dense vers le présent (l'activité croît avec le temps)."""
+        oldest = self.now - timedelta(days=self.days)
+        start = max(after, oldest) if after is not None else oldest
+        span = (self.now - start).total_seconds()
+        return start + timedelta(seconds=span * self.rng.random() ** 0.5)
+
+    def insert(self, model, objects, label):
+        """Insère un itérable d'objets par lots et retourne les identifiants créés."""
+        ids = array('q')
+        batch = []
+        for obj in objects:
+            batch.append(obj)
+            if len(batch) >= self.batch_size:
+                ids.extend(o.pk for o in self._flush(model, batch))
+                batch = []
+                self.stdout.write(f'{label} : {len(ids)}', ending='\r')
+        if batch:
+            ids.extend(o.pk for o in self._flush(model, batch))
+        self.stdout.write(f'{label} : {len(ids)}')
+        return ids
+
+    def _flush(self, model, batch):
+        with transaction.atomic():
+            if model in (Ticket, Review, Comment):  # Dates choisies : time_created est en auto_now_add
+                transfer._raw_insert(batch, self.batch_size)
+                return batch
+            return model.objects.bulk_create(batch)
+
+    def create_users(self, count):
+        User = get_user_model()
+        password = make_password('litrevu')  # Un seul hachage, partagé par tous les comptes générés
+        prefix = f'seed{int(self.now.timestamp())}'
+        return self.insert(User, (
+            User(username=f'{prefix}_{i}', username_lower=username_key(f'{prefix}_{i}'),  # bulk_create n'appelle pas save()
+                 email=f'{prefix}_{i}@example.com', password=password)
+            for i in range(count)
+        ), 'Utilisateurs')
+
+    def create_follows(self, user_ids, per_user):
+        """Chaque utilisateur suit un nombre variable de comptes, choisis selon leur popularité."""
+        popularity = PowerLaw(len(user_ids), 1.1, self.rng)
+
+        def follows():
+            for follower in user_ids:
+                wanted = min(len(user_ids) - 1, int(self.rng.paretovariate(1.5) * per_user / 3))
+                followed = set()
+                for _ in range(wanted * 3):  # Tentatives bornées : les comptes populaires sont souvent retirés
+                    if len(followed) >= wanted:
+                        break
+                    candidate = user_ids[popularity.sample()]
+                    if candidate != follower:
+                        followed.add(candidate)
+                for followed_id in followed:
+                    yield UserFollows(user_id=follower, followed_user_id=followed_id)
+
+        self.insert(UserFollows, follows(), 'Abonnements')
+
+    def activity_order(self, user_ids):
+        """Ordre d'activité des utilisateurs, indépendant de leur popularité dans le graphe d'abonnements."""
+        order = list(user_ids)
+        self.rng.shuffle(order)
+        return order
+
+    def create_tickets(self, user_ids, count):
+        authors = self.activity_order(user_ids)
+        activity = PowerLaw(len(user_ids), 0.8, self.rng)
+        times = [self.random_time() for _ in range(count)]
+        ids = self.insert(Ticket, (
+            Ticket(pk=self.offsets[transfer.TICKET] + i + 1, user_id=authors[activity.sample()],
+                   title=self.text(2, 6)[:128], description=self.text(10, 60), time_created=times[i], updated_at=times[i])
+            for i in range(count)
+        ), 'Billets')
+        return ids, times
+
+    def create_replies(self, model, user_ids, ticket_ids, ticket_times, count):
+        """Crée des critiques ou des commentaires, postés après le billet auquel ils répondent."""
+        if not ticket_ids:
+            return
+        authors = self.activity_order(user_ids)
+        activity = PowerLaw(len(user_ids), 0.8, self.rng)
+        ticket_popularity = PowerLaw(len(ticket_ids), 0.5, self.rng)
+        offset = self.offsets[transfer.REVIEW if model is Review else transfer.COMMENT]
+
+        def replies():
+            for i in range(count):
+                index = ticket_popularity.sample()
+                time_created = self.random_time(after=ticket_times[index])
+                fields = {
+                    'pk': offset + i + 1,
+                    'user_id': authors[activity.sample()],
+                    'ticket_id': ticket_ids[index],
+                    'time_created': time_created,
+                    'updated_at': time_created,
+                }
+                if model is Review:
+                    fields.update(headline=self.text(2, 8)[:128], body=self.text(30, 150),
+                                  rating=self.rng.choices(range(6), RATING_WEIGHTS)[0])
+                else:
+                    fields.update(body=self.text(5, 30))
+                yield model(**fields)
+
+        self.insert(model, replies(), model._meta.verbose_name_plural.capitalize())
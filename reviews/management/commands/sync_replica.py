@@ -0,0 +1,27 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from reviews.db_routing import REPLICA_ALIAS, replica_configured, sync_replica
+
+
+class Command(BaseCommand):
+    help = ("Copie la base principale dans la réplique de lecture (LITREVU_DB_REPLICA). "
+            "Avec --interval, la copie est répétée en boucle.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=None,
+                            help="Secondes entre deux copies (à garder sous REPLICA_STICKY_SECONDS).")
+
+    def handle(self, *args, **options):
+        if not replica_configured():
+            raise CommandError("Aucune réplique configurée : définissez la variable d'environnement LITREVU_DB_REPLICA.")
+        primary = settings.DATABASES['default']['NAME']
+        replica = settings.DATABASES[REPLICA_ALIAS]['NAME']
+        while True:
+            elapsed = sync_replica(primary, replica)
+            self.stdout.write(f'Réplique synchronisée en {elapsed:.2f} s.')
+            if options['interval'] is None:
+                return
+            time.sleep(max(0.0, options['interval'] - elapsed))
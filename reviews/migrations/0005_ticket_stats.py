@@ -0,0 +1,52 @@
+# Generated by Django 5.1.1 on 2026-10-18 16:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def compute_stats(apps, schema_editor):
+    """Calcule les agrégats des billets existants."""
+    Ticket = apps.get_model('reviews', 'Ticket')
+    Review = apps.get_model('reviews', 'Review')
+    Comment = apps.get_model('reviews', 'Comment')
+    TicketStats = apps.get_model('reviews', 'TicketStats')
+
+    def aggregate(model, expression):
+        return Coalesce(Subquery(
+            model.objects.filter(ticket=OuterRef('pk')).order_by().values('ticket')
+            .annotate(value=expression).values('value'),
+            output_field=IntegerField(),
+        ), Value(0))
+
+    tickets = Ticket.objects.annotate(
+        review_count=aggregate(Review, Count('pk')),
+        rating_sum=aggregate(Review, Sum('rating')),
+        comment_count=aggregate(Comment, Count('pk')),
+    ).values_list('pk', 'review_count', 'rating_sum', 'comment_count')
+    TicketStats.objects.bulk_create(
+        (TicketStats(ticket_id=pk, review_count=reviews, rating_sum=ratings, comment_count=comments)
+         for pk, reviews, ratings, comments in tickets.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0004_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TicketStats',
+            fields=[
+                ('ticket', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='reviews.ticket')),
+                ('review_count', models.PositiveIntegerField(default=0)),
+                ('rating_sum', models.PositiveIntegerField(default=0)),
+                ('comment_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(compute_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+from django.db import migrations
+
+SEARCH_TABLE = 'reviews_search'
+
+# rowid = id * 4 + type (1 billet, 2 critique, 3 commentaire), voir reviews.search
+SOURCES = (
+    (1, 'reviews_ticket', 'title', 'description'),
+    (2, 'reviews_review', 'headline', 'body'),
+    (3, 'reviews_comment', "''", 'body'),
+)
+
+
+def create_search_index(apps, schema_editor):
+    """Crée la table FTS5 et y indexe les posts existants (SQLite uniquement)."""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5("
+        f"author_id UNINDEXED, title, body, tokenize = 'unicode61 remove_diacritics 2')"
+    )
+    for code, table, title, body in SOURCES:
+        schema_editor.execute(
+            f'INSERT INTO {SEARCH_TABLE} (rowid, author_id, title, body) '
+            f'SELECT id * 4 + {code}, user_id, {title}, {body} FROM {table}'
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0005_ticket_stats'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.1.1 on 2026-10-18 21:05
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F
+
+
+def copy_time_created(apps, schema_editor):
+    """Les posts existants n'ont pas été modifiés depuis leur création."""
+    for model_name in ('Ticket', 'Review', 'Comment'):
+        apps.get_model('reviews', model_name).objects.update(updated_at=F('time_created'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0006_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(copy_time_created, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.1.1 on 2026-10-18 17:49
+
+import unicodedata
+
+from django.db import migrations, models
+
+
+def username_key(username):
+    """Copie figée de reviews.models.username_key à la date de la migration : NFKC, sans espaces autour, casefold."""
+    return unicodedata.normalize('NFKC', username).strip().casefold()
+
+
+def fill_username_lower(apps, schema_editor):
+    """Normalisation en Python (NFKC, casefold) : LOWER() de SQLite ne traite que l'ASCII."""
+    User = apps.get_model('reviews', 'CustomUser')
+    batch = []
+    for user in User.objects.only('pk', 'username').iterator(chunk_size=2000):
+        user.username_lower = username_key(user.username)
+        batch.append(user)
+        if len(batch) >= 2000:
+            User.objects.bulk_update(batch, ['username_lower'])
+            batch = []
+    User.objects.bulk_update(batch, ['username_lower'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('reviews', '0009_soft_delete'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='username_lower',
+            field=models.CharField(default='', editable=False, max_length=150),
+        ),
+        migrations.RunPython(fill_username_lower, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['username_lower'], name='user_username_lower_idx'),
+        ),
+    ]
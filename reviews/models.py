@@ -1,7 +1,25 @@
+import unicodedata
+
 from django.core.validators import MinValueValidator, MaxValueValidator  # Importation des validateurs pour les champs
 from django.conf import settings  # Importation des paramètres de configuration de Django
 from django.db import models  # Importation du module pour définir des modèles Django
 from django.contrib.auth.models import AbstractUser  # Importation de la classe de base pour les utilisateurs
+from django.utils import timezone
+
+
+def username_key(username):
+    """Forme normalisée d'un nom d'utilisateur pour la recherche : Unicode NFKC, sans espaces autour, en minuscules."""
+    return unicodedata.normalize('NFKC', username).strip().casefold()
+
+
+class LiveManager(models.Manager):  # Gestionnaire par défaut : masque les posts supprimés en attente de purge (voir reviews.purge)
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
+def deleted_index(name):
+    """Index partiel des lignes supprimées logiquement : le purgeur les retrouve sans parcourir la table."""
+    return models.Index(fields=['deleted_at'], condition=models.Q(deleted_at__isnull=False), name=name)
 
 
 class CustomUser(AbstractUser):  # Définition d'un modèle utilisateur personnalisé en étendant AbstractUser
@@ -13,6 +31,21 @@ class CustomUser(AbstractUser):  # Définition d'un modèle utilisateur personna
     ('O', 'Other'),
     )
     gender = models.CharField(max_length=1, choices=GENDER_CHOICES, null=True, blank=True)
+    deleted_at = models.DateTimeField(null=True, blank=True)  # Suppression demandée : compte désactivé, purgé en arrière-plan
+    username_lower = models.CharField(max_length=150, editable=False, default='')  # username_key(username), renseigné par save()
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            deleted_index('user_deleted_idx'),
+            models.Index(fields=['username_lower'], name='user_username_lower_idx'),  # Recherche exacte et par préfixe (autocomplétion)
+        ]
+
+    def save(self, *args, **kwargs):
+        self.username_lower = username_key(self.username)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'username' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'username_lower'}
+        super().save(*args, **kwargs)
 
     def __str__(self):  # Méthode pour définir la représentation en chaîne de l'utilisateur
         return self.username  # Retourne le nom d'utilisateur
@@ -23,11 +56,39 @@ class Ticket(models.Model):  # Définition du modèle Ticket
     description = models.TextField(max_length=2048, blank=True)  # Champ optionnel pour la description du ticket
     user = models.ForeignKey(to=settings.AUTH_USER_MODEL, on_delete=models.CASCADE)  # Relation avec le modèle utilisateur
     time_created = models.DateTimeField(auto_now_add=True)  # Date de création du ticket, ajoutée automatiquement
+    updated_at = models.DateTimeField(auto_now=True)  # Date de dernière modification, clé du fragment HTML en cache
+    deleted_at = models.DateTimeField(null=True, blank=True)  # Suppression logique : masqué partout, purgé en arrière-plan
+
+    objects = LiveManager()  # Billets visibles
+    all_objects = models.Manager()  # Tous les billets, y compris ceux en attente de purge
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'time_created'], name='ticket_user_time_idx'),  # Billets d'un auteur par date
+            models.Index(fields=['time_created'], name='ticket_time_idx'),  # Tri et hiérarchie de dates de l'administration
+            deleted_index('ticket_deleted_idx'),
+        ]
 
     def __str__(self):  # Méthode pour définir la représentation en chaîne du ticket
         return self.title  # Retourne le titre du ticket
 
 
+class TicketStats(models.Model):  # Agrégats d'un billet, maintenus à chaque écriture (voir reviews.ticket_stats)
+    ticket = models.OneToOneField(to=Ticket, on_delete=models.CASCADE, primary_key=True, related_name='stats')  # Billet concerné
+    review_count = models.PositiveIntegerField(default=0)  # Nombre de critiques du billet
+    rating_sum = models.PositiveIntegerField(default=0)  # Somme des notes, pour calculer la moyenne sans relire les critiques
+    comment_count = models.PositiveIntegerField(default=0)  # Nombre de commentaires du billet
+
+    @property
+    def average_rating(self):  # Note moyenne du billet, None s'il n'a pas de critique
+        if not self.review_count:
+            return None
+        return self.rating_sum / self.review_count
+
+    def __str__(self):
+        return f'Statistiques de {self.ticket_id}'
+
+
 class Review(models.Model):  # Définition du modèle Review
     ticket = models.ForeignKey(to=Ticket, on_delete=models.CASCADE)  # Relation avec le modèle Ticket
     rating = models.PositiveSmallIntegerField(  # Champ pour la note, un entier positif
@@ -37,6 +98,19 @@ class Review(models.Model):  # Définition du modèle Review
     body = models.CharField(max_length=8192, blank=True)  # Champ optionnel pour le corps de la critique
     user = models.ForeignKey(to=settings.AUTH_USER_MODEL, on_delete=models.CASCADE)  # Relation avec le modèle utilisateur
     time_created = models.DateTimeField(auto_now_add=True)  # Date de création de la critique, ajoutée automatiquement
+    updated_at = models.DateTimeField(auto_now=True)  # Date de dernière modification, clé du fragment HTML en cache
+    deleted_at = models.DateTimeField(null=True, blank=True)  # Suppression logique : masquée partout, purgée en arrière-plan
+
+    objects = LiveManager()  # Critiques visibles
+    all_objects = models.Manager()  # Toutes les critiques, y compris celles en attente de purge
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'time_created'], name='review_user_time_idx'),  # Critiques d'un auteur par date
+            models.Index(fields=['ticket', 'time_created'], name='review_ticket_time_idx'),  # Critiques d'un billet par date
+            models.Index(fields=['time_created'], name='review_time_idx'),  # Tri et hiérarchie de dates de l'administration
+            deleted_index('review_deleted_idx'),
+        ]
 
 
 class UserFollows(models.Model):  # Définition du modèle UserFollows pour gérer les suivis
@@ -47,6 +121,10 @@ class UserFollows(models.Model):  # Définition du modèle UserFollows pour gér
         # Assure qu'il n'y a pas de doublons dans les instances UserFollows
         # pour des paires utilisateur-utilisateur suivis uniques
         unique_together = ('user', 'followed_user', )  # Définir la contrainte d'unicité
+        indexes = [
+            # Index inverse pour retrouver les abonnés d'un utilisateur
+            models.Index(fields=['followed_user', 'user'], name='userfollows_followed_idx'),
+        ]
 
 
 class Comment(models.Model):
@@ -54,6 +132,200 @@ class Comment(models.Model):
     user = models.ForeignKey(to=settings.AUTH_USER_MODEL, on_delete=models.CASCADE)  # Relation avec le modèle utilisateur, supprime le commentaire si l'utilisateur est supprimé
     ticket = models.ForeignKey(to=Ticket, on_delete=models.CASCADE)  # Relation avec le modèle Ticket, supprime le commentaire si le ticket est supprimé
     time_created = models.DateTimeField(auto_now_add=True)  # Date de création du commentaire, ajoutée automatiquement
+    updated_at = models.DateTimeField(auto_now=True)  # Date de dernière modification, clé du fragment HTML en cache
+    deleted_at = models.DateTimeField(null=True, blank=True)  # Suppression logique : masqué partout, purgé en arrière-plan
+
+    objects = LiveManager()  # Commentaires visibles
+    all_objects = models.Manager()  # Tous les commentaires, y compris ceux en attente de purge
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'time_created'], name='comment_user_time_idx'),  # Commentaires d'un auteur par date
+            models.Index(fields=['ticket', 'time_created'], name='comment_ticket_time_idx'),  # Commentaires d'un billet par date
+            models.Index(fields=['time_created'], name='comment_time_idx'),  # Tri et hiérarchie de dates de l'administration
+            deleted_index('comment_deleted_idx'),
+        ]
 
     def __str__(self):  # Méthode pour définir la représentation en chaîne du commentaire
         return f'Comment by {self.user} on {self.ticket}'  # Retourne une description du commentaire
+
+
+class FeedEntry(models.Model):  # Entrée du flux matérialisé (fan-out à l'écriture)
+    TICKET = 'TICKET'
+    REVIEW = 'REVIEW'
+    KIND_CHOICES = (
+        (TICKET, 'Billet'),
+        (REVIEW, 'Critique'),
+    )
+
+    owner = models.ForeignKey(to=settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='feed_entries')  # Propriétaire du flux
+    author = models.ForeignKey(to=settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')  # Auteur du post, pour élaguer le flux lors d'un désabonnement
+    kind = models.CharField(max_length=6, choices=KIND_CHOICES)  # Type du post (billet ou critique)
+    object_id = models.PositiveBigIntegerField()  # Identifiant du billet ou de la critique
+    time_created = models.DateTimeField()  # Date de création du post, copiée depuis l'objet
+
+    class Meta:
+        constraints = [
+            # Un post n'apparaît qu'une fois dans un flux donné
+            models.UniqueConstraint(fields=['owner', 'kind', 'object_id'], name='unique_feed_entry'),
+        ]
+        indexes = [
+            # Lecture d'une page du flux : un seul parcours d'index dans l'ordre de pagination
+            models.Index(fields=['owner', '-time_created', '-kind', '-object_id'], name='feedentry_timeline_idx'),
+            models.Index(fields=['owner', 'author'], name='feedentry_owner_author_idx'),
+            models.Index(fields=['kind', 'object_id'], name='feedentry_object_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.kind} {self.object_id} dans le flux de {self.owner_id}'
+
+
+class Task(models.Model):  # Tâche d'arrière-plan dans la file durable (voir reviews.tasks)
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, 'En attente'),
+        (RUNNING, 'En cours'),
+        (DONE, 'Terminée'),
+        (FAILED, 'Échouée'),
+    )
+
+    name = models.CharField(max_length=200)  # Chemin de la fonction à exécuter (module.fonction)
+    args = models.JSONField(default=list)  # Arguments de la fonction (identifiants, pas d'objets)
+    status = models.CharField(max_length=7, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)  # Nombre d'exécutions commencées
+    max_attempts = models.PositiveSmallIntegerField(default=3)  # Au-delà, la tâche reste en échec
+    run_after = models.DateTimeField(default=timezone.now)  # Pas d'exécution avant cette date (délai entre deux essais)
+    created_at = models.DateTimeField(default=timezone.now)  # Date de mise en file, pour mesurer la latence
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)  # Trace de la dernière erreur
+
+    class Meta:
+        indexes = [
+            # Prochaines tâches à exécuter, et profondeur de la file par statut
+            models.Index(fields=['status', 'run_after'], name='task_status_run_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.name}{tuple(self.args)} ({self.status})'
+
+
+class FollowSuggestion(models.Model):  # Suggestion d'abonnement précalculée (voir reviews.recommendations)
+    user = models.ForeignKey(to=settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='follow_suggestions')  # Destinataire
+    suggested = models.ForeignKey(to=settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')  # Compte suggéré
+    rank = models.PositiveSmallIntegerField()  # Position dans la liste, 0 pour la meilleure suggestion
+    score = models.FloatField()  # Abonnements en commun pondérés par l'activité récente
+    mutual_count = models.PositiveIntegerField()  # Comptes suivis par l'utilisateur qui suivent le compte suggéré
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'rank'], name='unique_follow_suggestion_rank'),
+        ]
+        # La contrainte d'unicité sert aussi d'index : suggestions d'un utilisateur dans l'ordre, en un parcours
+
+    def __str__(self):
+        return f'{self.suggested_id} suggéré à {self.user_id} ({self.score:.2f})'
+
+
+class StaleSuggestions(models.Model):  # Utilisateur dont les abonnements ont changé depuis le dernier calcul des suggestions
+    user = models.OneToOneField(to=settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name='+')
+    changed_at = models.DateTimeField(default=timezone.now)
+
+
+class RatingSnapshot(models.Model):  # Distribution des notes et activité d'un utilisateur ou d'un billet (voir reviews.analytics)
+    USER = 'user'
+    TICKET = 'ticket'
+    KIND_CHOICES = (
+        (USER, 'Utilisateur'),  # Critiques écrites par l'utilisateur
+        (TICKET, 'Billet'),  # Critiques reçues par le billet
+    )
+
+    kind = models.CharField(max_length=6, choices=KIND_CHOICES)
+    object_id = models.PositiveBigIntegerField()  # Identifiant de l'utilisateur ou du billet
+    ratings = models.JSONField(default=list)  # Nombre de critiques par note, de 0 à 5
+    activity = models.JSONField(default=dict)  # Nombre de critiques par mois : {'2025-07': 3}
+    review_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    computed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='unique_rating_snapshot'),
+        ]
+
+    @property
+    def average_rating(self):  # Note moyenne, None sans critique
+        if not self.review_count:
+            return None
+        return self.rating_sum / self.review_count
+
+    def __str__(self):
+        return f'Statistiques {self.kind} {self.object_id}'
+
+
+class AnalyticsWatermark(models.Model):  # Dernière critique prise en compte par un calcul incrémental
+    name = models.CharField(max_length=50, primary_key=True)
+    time_created = models.DateTimeField()  # Date de création de la dernière critique traitée
+    last_id = models.PositiveBigIntegerField()  # Son identifiant, pour départager les critiques de même date
+
+
+class ArchivedTicket(models.Model):  # Billet archivé avec tout son fil (voir reviews.archive), en lecture seule
+    id = models.BigIntegerField(primary_key=True)  # Identifiant du billet d'origine, conservé : les liens restent valides
+    title = models.CharField(max_length=128)
+    description = models.TextField(max_length=2048, blank=True)
+    user = models.ForeignKey(to=settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    time_created = models.DateTimeField()  # Dates d'origine, copiées sans auto_now
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(default=timezone.now)
+    review_count = models.PositiveIntegerField(default=0)  # Agrégats de TicketStats, figés à l'archivage
+    rating_sum = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'time_created'], name='archticket_user_time_idx'),  # Page « posts archivés »
+        ]
+
+    @property
+    def average_rating(self):  # Note moyenne du billet, None s'il n'a pas de critique
+        if not self.review_count:
+            return None
+        return self.rating_sum / self.review_count
+
+    def __str__(self):
+        return self.title
+
+
+class ArchivedReview(models.Model):  # Critique archivée avec son billet
+    id = models.BigIntegerField(primary_key=True)
+    ticket = models.ForeignKey(to=ArchivedTicket, on_delete=models.CASCADE, related_name='reviews')
+    rating = models.PositiveSmallIntegerField(validators=[MinValueValidator(0), MaxValueValidator(5)])
+    headline = models.CharField(max_length=128)
+    body = models.CharField(max_length=8192, blank=True)
+    user = models.ForeignKey(to=settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    time_created = models.DateTimeField()
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'time_created'], name='archreview_user_time_idx'),
+            models.Index(fields=['ticket', 'time_created'], name='archreview_ticket_time_idx'),
+        ]
+
+
+class ArchivedComment(models.Model):  # Commentaire archivé avec son billet
+    id = models.BigIntegerField(primary_key=True)
+    body = models.TextField(max_length=2048)
+    user = models.ForeignKey(to=settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    ticket = models.ForeignKey(to=ArchivedTicket, on_delete=models.CASCADE, related_name='comments')
+    time_created = models.DateTimeField()
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['ticket', 'time_created'], name='archcomment_ticket_time_idx'),
+            models.Index(fields=['user'], name='archcomment_user_idx'),  # Purge des comptes
+        ]
@@ -0,0 +1,255 @@
+"""Profilage des requêtes : temps SQL, rendu des templates, vue et mémoire.
+
+ProfilingMiddleware mesure chaque requête et ajoute un en-tête Server-Timing,
+lisible dans l'onglet réseau du navigateur :
+
+    Server-Timing: sql;dur=4.2;desc="3 requêtes", tpl;dur=11.8, view;dur=19.5
+
+Les requêtes plus lentes que PROFILING_SLOW_MS sont écrites, avec leurs requêtes
+SQL les plus lentes, dans le journal JSONL PROFILING_SLOW_LOG. Les mesures des
+dernières requêtes sont gardées dans un tampon circulaire en mémoire, agrégé par
+vue (percentiles) sur la page d'administration /admin/profiling/.
+
+Le middleware est placé en dernier dans MIDDLEWARE : « view » couvre la résolution
+de l'URL et la vue (requêtes de session et d'utilisateur comprises, chargées à la
+demande), pas les autres middlewares. Pour une réponse diffusée par morceaux,
+seules les mesures faites avant le début de la diffusion sont rapportées.
+
+Le middleware accepte les chaînes synchrones et asynchrones : sous ASGI, il ne
+force pas les vues asynchrones à repasser par un thread. Les requêtes SQL d'une
+vue asynchrone s'exécutent dans les threads de sync_to_async, parfois partagés
+par plusieurs requêtes ; chaque connexion reçoit donc à son ouverture un wrapper
+permanent (install_sql_wrapper, enregistré par ReviewsConfig.ready) qui compte
+la requête dans le profil de la requête HTTP courante, lu dans une ContextVar.
+"""
+import contextvars
+import json
+import random
+import threading
+import time
+import tracemalloc
+from collections import defaultdict, deque
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.template.backends.django import DjangoTemplates
+from django.utils import timezone
+
+from .stats_utils import percentile
+
+SLOW_MS = getattr(settings, 'PROFILING_SLOW_MS', 500)  # Seuil du journal des requêtes lentes
+SLOW_LOG = getattr(settings, 'PROFILING_SLOW_LOG', None)  # Chemin du journal JSONL (None : pas de journal)
+MEMORY_SAMPLE_RATE = getattr(settings, 'PROFILING_MEMORY_SAMPLE_RATE', 0.01)  # Part des requêtes dont on trace la mémoire
+BUFFER_SIZE = getattr(settings, 'PROFILING_BUFFER_SIZE', 5000)  # Nombre de requêtes gardées pour les percentiles
+SLOWEST_SQL = 5  # Requêtes SQL gardées par requête lente
+
+_current = contextvars.ContextVar('request_profile', default=None)
+_buffer = deque(maxlen=BUFFER_SIZE)
+_buffer_lock = threading.Lock()
+_log_lock = threading.Lock()
+_memory_lock = threading.Lock()  # tracemalloc est global au processus : une seule requête tracée à la fois
+
+
+class RequestProfile:
+    """Mesures d'une requête, alimentées par le wrapper SQL et le backend de templates."""
+
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.statements = []  # (durée, SQL) des requêtes les plus lentes, du plus lent au plus rapide
+        self.memory = None  # (allocation nette, pic) en octets si la requête est échantillonnée
+
+    def __call__(self, execute, sql, params, many, context):
+        """Wrapper d'exécution des connexions : chronomètre chaque requête SQL."""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.sql_count += 1
+            self.sql_time += elapsed
+            if len(self.statements) < SLOWEST_SQL or elapsed > self.statements[-1][0]:
+                self.statements.append((elapsed, sql))
+                self.statements.sort(key=lambda statement: statement[0], reverse=True)
+                del self.statements[SLOWEST_SQL:]
+
+
+def _profile_sql(execute, sql, params, many, context):
+    """Wrapper permanent des connexions : chronomètre la requête SQL dans le profil de la requête HTTP en cours."""
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    return profile(execute, sql, params, many, context)
+
+
+def install_sql_wrapper(sender=None, connection=None, **kwargs):
+    """Récepteur de connection_created : ajoute _profile_sql aux wrappers d'exécution de la connexion.
+
+    En tête de liste : connection.execute_wrapper() retire le dernier wrapper à la sortie de son bloc.
+    """
+    if _profile_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _profile_sql)
+
+
+class ProfiledTemplate:
+    """Template du backend Django dont le rendu est chronométré."""
+
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        profile = _current.get()
+        if profile is None:
+            return self.template.render(context, request)
+        start = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            profile.template_time += time.perf_counter() - start
+
+
+class ProfiledDjangoTemplates(DjangoTemplates):
+    """Backend de templates Django qui mesure le temps de rendu des templates (inclusions comprises)."""
+
+    def from_string(self, template_code):
+        return ProfiledTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return ProfiledTemplate(super().get_template(template_name))
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else None
+
+
+def server_timing(profile, view_time):
+    """Valeur de l'en-tête Server-Timing (durées en millisecondes)."""
+    metrics = [
+        f'sql;dur={profile.sql_time * 1000:.1f};desc="{profile.sql_count} requêtes"',
+        f'tpl;dur={profile.template_time * 1000:.1f}',
+        f'view;dur={view_time * 1000:.1f}',
+    ]
+    if profile.memory is not None:
+        allocated, peak = profile.memory
+        metrics.append(f'mem;desc="alloc {allocated // 1024} Kio, pic {peak // 1024} Kio"')
+    return ', '.join(metrics)
+
+
+def record(view_name, profile, view_time):
+    """Ajoute les mesures d'une requête au tampon circulaire."""
+    with _buffer_lock:
+        _buffer.append((view_name, view_time, profile.sql_count, profile.sql_time, profile.template_time))
+
+
+def view_stats():
+    """Agrège le tampon par vue : nombre de requêtes et percentiles, les vues les plus lentes (p95) d'abord."""
+    with _buffer_lock:
+        samples = list(_buffer)
+    by_view = defaultdict(list)
+    for view_name, *measures in samples:
+        by_view[view_name].append(measures)
+    stats = []
+    for view_name, measures in by_view.items():
+        view_ms = [view_time * 1000 for view_time, _, _, _ in measures]
+        stats.append({
+            'view': view_name,
+            'requests': len(measures),
+            'p50_ms': percentile(view_ms, 50),
+            'p95_ms': percentile(view_ms, 95),
+            'p99_ms': percentile(view_ms, 99),
+            'sql_count_p95': percentile([sql_count for _, sql_count, _, _ in measures], 95),
+            'sql_p95_ms': percentile([sql_time * 1000 for _, _, sql_time, _ in measures], 95),
+            'template_p95_ms': percentile([template_time * 1000 for _, _, _, template_time in measures], 95),
+        })
+    return sorted(stats, key=lambda stat: stat['p95_ms'], reverse=True)
+
+
+def clear():
+    with _buffer_lock:
+        _buffer.clear()
+
+
+def log_slow_request(request, response, profile, view_time):
+    """Écrit une requête lente dans le journal JSONL, avec ses requêtes SQL les plus lentes."""
+    entry = {
+        'time': timezone.now().isoformat(),
+        'method': request.method,
+        'path': request.path,
+        'view': _view_name(request),
+        'status': response.status_code,
+        'view_ms': round(view_time * 1000, 1),
+        'sql_count': profile.sql_count,
+        'sql_ms': round(profile.sql_time * 1000, 1),
+        'template_ms': round(profile.template_time * 1000, 1),
+        'slowest_sql': [{'ms': round(elapsed * 1000, 1), 'sql': sql} for elapsed, sql in profile.statements],
+    }
+    if profile.memory is not None:
+        entry['memory_allocated'], entry['memory_peak'] = profile.memory
+    with _log_lock, open(SLOW_LOG, 'a', encoding='utf-8') as log:
+        log.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+
+class ProfilingMiddleware:
+    """Mesure chaque requête : en-tête Server-Timing, tampon des percentiles et journal des requêtes lentes."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        profile, token, sample_memory = self.start()
+        try:
+            start = time.perf_counter()
+            response = self.get_response(request)
+            view_time = time.perf_counter() - start
+        finally:
+            self.stop(profile, token, sample_memory)
+        return self.finish(request, response, profile, view_time)
+
+    async def __acall__(self, request):
+        profile, token, sample_memory = self.start()
+        try:
+            start = time.perf_counter()
+            response = await self.get_response(request)
+            view_time = time.perf_counter() - start
+        finally:
+            self.stop(profile, token, sample_memory)
+        return self.finish(request, response, profile, view_time)
+
+    def start(self):
+        profile = RequestProfile()
+        token = _current.set(profile)
+        # Échantillonnage de la mémoire, si aucune autre requête n'est tracée et tracemalloc n'est pas déjà utilisé.
+        # Sous ASGI, les requêtes concurrentes de la boucle d'événements sont comptées avec elle.
+        sample_memory = (random.random() < MEMORY_SAMPLE_RATE and not tracemalloc.is_tracing()
+                         and _memory_lock.acquire(blocking=False))
+        if sample_memory:
+            tracemalloc.start()
+        return profile, token, sample_memory
+
+    def stop(self, profile, token, sample_memory):
+        if sample_memory:
+            profile.memory = tracemalloc.get_traced_memory()  # (allocation nette, pic)
+            tracemalloc.stop()
+            _memory_lock.release()
+        _current.reset(token)
+
+    def finish(self, request, response, profile, view_time):
+        response['Server-Timing'] = server_timing(profile, view_time)
+        view_name = _view_name(request)
+        if view_name is not None:
+            record(view_name, profile, view_time)
+        if SLOW_LOG and view_time * 1000 >= SLOW_MS:
+            log_slow_request(request, response, profile, view_time)
+        return response
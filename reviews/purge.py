@@ -0,0 +1,187 @@
+"""Suppression logique des billets et des comptes, puis purge en arrière-plan.
+
+Supprimer un billet ou un compte avec Model.delete() fait charger en Python,
+par le collecteur de Django, tout ce qui en dépend (critiques, commentaires,
+abonnements...) : plusieurs minutes pour un utilisateur prolifique. Ici, la
+requête se contente d'UPDATE ensemblistes qui renseignent `deleted_at` :
+
+- le gestionnaire par défaut (LiveManager) masque aussitôt ces lignes dans le
+  flux, la recherche, les fils de commentaires et l'administration ;
+- un compte supprimé est désactivé (is_active=False), ses abonnements sont retirés
+  et ses posts quittent les flux de ses abonnés (un DELETE ensembliste).
+
+La tâche purge_deleted supprime ensuite les lignes par lots de PURGE_CHUNK_SIZE,
+avec des DELETE ensemblistes sans collecteur ni signaux, une transaction par lot.
+Les lignes qui dépendent d'un lot (critiques d'un billet, posts et flux d'un
+compte) sont supprimées avant lui, elles aussi par lots d'une transaction chacun.
+L'index de recherche et les agrégats sont supprimés avec les lignes, dans la
+même transaction ; les entrées du flux, nombreuses, juste avant, par lots.
+"""
+import logging
+
+from django.conf import settings
+from django.contrib.admin.models import LogEntry
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import auth_cache, feed_cache, follow_graph, recommendations, search, tasks, ticket_stats
+from .models import (ArchivedComment, ArchivedReview, ArchivedTicket, Comment, FeedEntry, FollowSuggestion,
+                     RatingSnapshot, Review, StaleSuggestions, Ticket, TicketStats, UserFollows)
+
+logger = logging.getLogger(__name__)
+
+PURGE_CHUNK_SIZE = getattr(settings, 'PURGE_CHUNK_SIZE', 1000)  # Lignes supprimées par transaction
+
+
+def _raw_delete(queryset):
+    """DELETE ensembliste : ni chargement des objets, ni cascade, ni signaux. Retourne le nombre de lignes."""
+    return queryset._raw_delete(queryset.db)
+
+
+def soft_delete_ticket(ticket):
+    """Masque un billet, ses critiques et ses commentaires, retire-les des flux et planifie leur purge."""
+    readers = feed_cache.post_readers(FeedEntry.TICKET, ticket.pk)  # Avant le retrait des entrées du flux
+    now = timezone.now()
+    with transaction.atomic():
+        reviews = Review.all_objects.filter(ticket=ticket).values('pk')
+        _raw_delete(FeedEntry.objects.filter(Q(kind=FeedEntry.TICKET, object_id=ticket.pk)
+                                             | Q(kind=FeedEntry.REVIEW, object_id__in=reviews)))
+        Ticket.all_objects.filter(pk=ticket.pk).update(deleted_at=now)
+        Review.objects.filter(ticket=ticket).update(deleted_at=now)
+        Comment.objects.filter(ticket=ticket).update(deleted_at=now)
+        tasks.enqueue(purge_deleted)
+    feed_cache.invalidate(readers)
+
+
+def soft_delete_user(user):
+    """Désactive un compte, masque tous ses posts et les posts sur ses billets, et planifie leur purge.
+
+    Les entrées de ces posts sont retirées des flux tout de suite : une page du flux n'en perd aucune ligne.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        get_user_model().objects.filter(pk=user.pk).update(deleted_at=now, is_active=False)
+        tickets = Ticket.all_objects.filter(user=user).values('pk')
+        _raw_delete(FeedEntry.objects.filter(
+            Q(author_id=user.pk)
+            | Q(kind=FeedEntry.REVIEW, object_id__in=Review.all_objects.filter(ticket_id__in=tickets).values('pk'))))
+        # Billets des autres dont les agrégats perdent les critiques et commentaires de l'utilisateur
+        touched = (set(Review.objects.filter(user=user).exclude(ticket__user=user).values_list('ticket_id', flat=True))
+                   | set(Comment.objects.filter(user=user).exclude(ticket__user=user).values_list('ticket_id', flat=True)))
+        Ticket.objects.filter(user=user).update(deleted_at=now)
+        Review.objects.filter(Q(user=user) | Q(ticket_id__in=tickets)).update(deleted_at=now)
+        Comment.objects.filter(Q(user=user) | Q(ticket_id__in=tickets)).update(deleted_at=now)
+        ticket_stats.refresh(touched)
+
+        follows = UserFollows.objects.filter(Q(user=user) | Q(followed_user=user))
+        pairs = list(follows.values_list('user_id', 'followed_user_id'))
+        _raw_delete(follows)  # Sans signaux : les posts de l'utilisateur sont déjà retirés des flux
+        recommendations.mark_stale({follower_id for follower_id, followed_id in pairs if follower_id != user.pk})
+        tasks.enqueue(purge_deleted)
+    auth_cache.invalidate([user.pk])  # Mise à jour sans signal : ses sessions sont déconnectées tout de suite
+    for follower_id, followed_id in pairs:
+        follow_graph.invalidate(follower_id, followed_id)
+    feed_cache.invalidate({user.pk, *(follower_id for follower_id, _ in pairs),
+                           *Ticket.objects.filter(pk__in=touched).values_list('user_id', flat=True)})
+
+
+def _chunks(queryset, chunk_size):
+    """Identifiants du queryset par lots ; chaque lot doit être supprimé avant de demander le suivant."""
+    while ids := list(queryset.values_list('pk', flat=True)[:chunk_size]):
+        yield ids
+
+
+def _delete_in_batches(queryset, chunk_size):
+    """Supprime les lignes du queryset par lots de chunk_size, une transaction par lot. Retourne le nombre de lignes."""
+    deleted = 0
+    for ids in _chunks(queryset, chunk_size):
+        with transaction.atomic():
+            deleted += _raw_delete(queryset.model._base_manager.filter(pk__in=ids))
+    return deleted
+
+
+def _purge_comments(ids):
+    with transaction.atomic():
+        search.unindex_ids(Comment, ids)
+        return _raw_delete(Comment.all_objects.filter(pk__in=ids))
+
+
+def _purge_reviews(ids, chunk_size):
+    _delete_in_batches(FeedEntry.objects.filter(kind=FeedEntry.REVIEW, object_id__in=ids), chunk_size)
+    with transaction.atomic():
+        search.unindex_ids(Review, ids)
+        return _raw_delete(Review.all_objects.filter(pk__in=ids))
+
+
+def _purge_tickets(ids, chunk_size):
+    # Critiques et commentaires restants (ajoutés pendant la suppression, donc non marqués)
+    for comment_ids in _chunks(Comment.all_objects.filter(ticket_id__in=ids), chunk_size):
+        _purge_comments(comment_ids)
+    for review_ids in _chunks(Review.all_objects.filter(ticket_id__in=ids), chunk_size):
+        _purge_reviews(review_ids, chunk_size)
+    _delete_in_batches(FeedEntry.objects.filter(kind=FeedEntry.TICKET, object_id__in=ids), chunk_size)
+    with transaction.atomic():
+        _raw_delete(TicketStats.objects.filter(ticket_id__in=ids))
+        _raw_delete(RatingSnapshot.objects.filter(kind=RatingSnapshot.TICKET, object_id__in=ids))
+        search.unindex_ids(Ticket, ids)
+        return _raw_delete(Ticket.all_objects.filter(pk__in=ids))
+
+
+def _purge_users(ids, chunk_size):
+    User = get_user_model()
+    # Posts restants (écrits pendant la suppression), puis flux des comptes et entrées de leurs posts
+    for comment_ids in _chunks(Comment.all_objects.filter(user_id__in=ids), chunk_size):
+        _purge_comments(comment_ids)
+    for review_ids in _chunks(Review.all_objects.filter(user_id__in=ids), chunk_size):
+        _purge_reviews(review_ids, chunk_size)
+    for ticket_ids in _chunks(Ticket.all_objects.filter(user_id__in=ids), chunk_size):
+        _purge_tickets(ticket_ids, chunk_size)
+    # Fils archivés (voir reviews.archive) : posts des comptes et posts des autres sur leurs billets
+    archived_tickets = ArchivedTicket.objects.filter(user_id__in=ids).values('pk')
+    _delete_in_batches(ArchivedComment.objects.filter(Q(user_id__in=ids) | Q(ticket_id__in=archived_tickets)),
+                       chunk_size)
+    _delete_in_batches(ArchivedReview.objects.filter(Q(user_id__in=ids) | Q(ticket_id__in=archived_tickets)),
+                       chunk_size)
+    _delete_in_batches(ArchivedTicket.objects.filter(user_id__in=ids), chunk_size)
+    _delete_in_batches(FeedEntry.objects.filter(Q(owner_id__in=ids) | Q(author_id__in=ids)), chunk_size)
+    _delete_in_batches(UserFollows.objects.filter(Q(user_id__in=ids) | Q(followed_user_id__in=ids)), chunk_size)
+    _delete_in_batches(FollowSuggestion.objects.filter(Q(user_id__in=ids) | Q(suggested_id__in=ids)), chunk_size)
+    _delete_in_batches(LogEntry.objects.filter(user_id__in=ids), chunk_size)
+    with transaction.atomic():  # Les comptes en dernier : une purge interrompue les reprend avec ce qui reste
+        _raw_delete(StaleSuggestions.objects.filter(user_id__in=ids))
+        _raw_delete(RatingSnapshot.objects.filter(kind=RatingSnapshot.USER, object_id__in=ids))
+        _raw_delete(User.groups.through.objects.filter(customuser_id__in=ids))
+        _raw_delete(User.user_permissions.through.objects.filter(customuser_id__in=ids))
+        return _raw_delete(User.objects.filter(pk__in=ids))
+
+
+@tasks.task
+def purge_deleted(chunk_size=PURGE_CHUNK_SIZE, progress=None):
+    """Supprime définitivement les lignes marquées, des dépendances vers les comptes, un lot par transaction.
+
+    Les lignes qui dépendent d'un lot (entrées du flux, fils d'un billet, posts et flux d'un compte) sont
+    supprimées avant lui, par lots de chunk_size validés chacun dans sa propre transaction : aucune
+    transaction ne garde le verrou d'écriture de SQLite plus de quelques lots. Le lot lui-même est
+    supprimé en dernier ; une purge interrompue le retrouve et reprend ses dépendances restantes.
+
+    `progress(étape, total supprimé)` est appelée après chaque lot. Retourne {étape: lignes supprimées}.
+    """
+    stages = (
+        ('commentaires', Comment.all_objects.filter(deleted_at__isnull=False), _purge_comments),
+        ('critiques', Review.all_objects.filter(deleted_at__isnull=False), lambda ids: _purge_reviews(ids, chunk_size)),
+        ('billets', Ticket.all_objects.filter(deleted_at__isnull=False), lambda ids: _purge_tickets(ids, chunk_size)),
+        ('comptes', get_user_model().objects.filter(deleted_at__isnull=False),
+         lambda ids: _purge_users(ids, chunk_size)),
+    )
+    totals = {}
+    for stage, queryset, purge in stages:
+        totals[stage] = 0
+        for ids in _chunks(queryset, chunk_size):
+            totals[stage] += purge(ids)  # Transactions ouvertes par chaque fonction de purge
+            if progress is not None:
+                progress(stage, totals[stage])
+        if totals[stage]:
+            logger.info('Purge : %s %s supprimé(e)s', totals[stage], stage)
+    return totals
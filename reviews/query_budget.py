@@ -0,0 +1,74 @@
+"""Budget de requêtes SQL par vue, pour détecter les problèmes N+1."""
+import logging
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+view_query_counts = {}  # Dernier nombre de requêtes observé par vue : {nom de la vue: nombre}
+_paused = ContextVar('query_budget_paused', default=False)  # Vrai dans un bloc uncounted()
+
+
+class QueryBudgetExceeded(Exception):
+    """Levée quand une vue dépasse son budget et que QUERY_BUDGET_STRICT est activé."""
+
+
+class QueryCounter:
+    """Wrapper d'exécution qui compte les requêtes passant par la connexion."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        if not _paused.get():
+            self.count += 1
+        return execute(sql, params, many, context)
+
+
+@contextmanager
+def count_queries():
+    """Compte les requêtes exécutées dans le bloc : `with count_queries() as counter: ...`.
+
+    Toutes les bases configurées sont comptées (base principale et réplique de lecture).
+    """
+    counter = QueryCounter()
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(counter))
+        yield counter
+
+
+@contextmanager
+def uncounted():
+    """Exclut des compteurs les requêtes du bloc : tâches d'arrière-plan exécutées dans la requête (TASKS_EAGER)."""
+    token = _paused.set(True)
+    try:
+        yield
+    finally:
+        _paused.reset(token)
+
+
+def query_budget(max_queries):
+    """Décorateur de vue : enregistre le nombre de requêtes de la vue et signale tout dépassement.
+
+    Les requêtes des middlewares (session, utilisateur) et des tâches exécutées sur place
+    (TASKS_EAGER) ne sont pas comptées : le budget est celui de la vue en production.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            with count_queries() as counter:
+                response = view(request, *args, **kwargs)
+            view_query_counts[view.__name__] = counter.count
+            if counter.count > max_queries:
+                message = f'{view.__name__} : {counter.count} requêtes (budget : {max_queries})'
+                if getattr(settings, 'QUERY_BUDGET_STRICT', False):
+                    raise QueryBudgetExceeded(message)
+                logger.warning(message)
+            return response
+        return wrapper
+    return decorator
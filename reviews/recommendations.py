@@ -0,0 +1,201 @@
+"""Suggestions d'abonnement (« qui suivre ») précalculées depuis le graphe des abonnements.
+
+Calculer les amis d'amis à la volée est une double auto-jointure sur UserFollows,
+trop coûteuse au-delà de quelques milliers de comptes. Un calcul par lots charge
+le graphe en deux tableaux d'entiers au format CSR : les comptes suivis par
+l'utilisateur u sont targets[offsets[u]:offsets[u + 1]]. Pour chaque utilisateur,
+les comptes suivis par ses abonnements sont comptés (abonnements « en commun »),
+puis pondérés par l'activité récente du compte (billets et critiques des
+SUGGESTION_ACTIVITY_DAYS derniers jours) :
+
+    score = en commun × (1 + SUGGESTION_ACTIVITY_WEIGHT × log(1 + posts récents))
+
+Les SUGGESTION_COUNT meilleures suggestions sont stockées dans FollowSuggestion ;
+la page des abonnements les lit en une requête sur l'index (user, rank).
+
+Le calcul est incrémental : un abonnement ou un désabonnement marque son auteur
+(StaleSuggestions). Ses suggestions changent, ainsi que celles de ses abonnés
+(il est leur deuxième niveau) ; refresh() ne recalcule que ceux-là, sur le
+sous-graphe qui les concerne. Un calcul complet (refresh(full=True), quotidien)
+prend en compte l'évolution de l'activité.
+
+NumPy est utilisé s'il est installé ; sinon, les tableaux du module array et un Counter.
+"""
+import heapq
+import math
+from array import array
+from collections import Counter
+from datetime import timedelta
+from itertools import accumulate
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+
+from .models import FollowSuggestion, Review, StaleSuggestions, Ticket, UserFollows
+
+try:
+    import numpy as np
+except ImportError:  # Dépendance facultative : calcul en Python pur
+    np = None
+
+SUGGESTION_COUNT = getattr(settings, 'SUGGESTION_COUNT', 10)  # Suggestions stockées par utilisateur
+SUGGESTION_ACTIVITY_DAYS = getattr(settings, 'SUGGESTION_ACTIVITY_DAYS', 30)  # Fenêtre de l'activité récente
+SUGGESTION_ACTIVITY_WEIGHT = getattr(settings, 'SUGGESTION_ACTIVITY_WEIGHT', 0.5)  # Poids de l'activité dans le score
+SUGGESTION_BATCH_SIZE = getattr(settings, 'SUGGESTION_BATCH_SIZE', 500)  # Utilisateurs écrits par transaction
+IN_CHUNK = 500  # Identifiants par clause IN (limite de variables de SQLite)
+
+
+class FollowGraph:
+    """Graphe des abonnements au format CSR, indexé par identifiant d'utilisateur."""
+
+    def __init__(self, edges, size):
+        """`edges` : couples (abonné, suivi) triés par abonné ; `size` : plus grand identifiant + 1."""
+        counts = array('q', bytes(8 * (size + 1)))
+        targets = array('q')
+        for user_id, followed_id in edges:
+            counts[user_id + 1] += 1
+            targets.append(followed_id)
+        offsets = array('q', accumulate(counts))
+        self.size = size
+        if np is not None:  # Vues NumPy sur les mêmes tampons, sans copie
+            offsets, targets = np.asarray(offsets, dtype=np.int64), np.asarray(targets, dtype=np.int64)
+        self.offsets, self.targets = offsets, targets
+
+    @classmethod
+    def load(cls, user_ids=None):
+        """Graphe complet, ou sous-graphe des abonnements de `user_ids` et de leurs comptes suivis (deux niveaux)."""
+        size = (get_user_model().objects.aggregate(Max('pk'))['pk__max'] or 0) + 1
+        if user_ids is None:
+            edges = UserFollows.objects.order_by('user_id', 'followed_user_id').values_list('user_id', 'followed_user_id')
+            return cls(edges.iterator(chunk_size=10000), size)
+        first = _edges_of(user_ids)
+        second = _edges_of({followed_id for _, followed_id in first} - set(user_ids))
+        return cls(sorted(first + second), size)
+
+    def followed(self, user_id):
+        return self.targets[self.offsets[user_id]:self.offsets[user_id + 1]]
+
+
+def _chunks(ids, size=IN_CHUNK):
+    ids = list(ids)
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def _edges_of(user_ids):
+    edges = []
+    for chunk in _chunks(user_ids):
+        edges.extend(UserFollows.objects.filter(user_id__in=chunk).values_list('user_id', 'followed_user_id'))
+    return edges
+
+
+def recent_activity(days=SUGGESTION_ACTIVITY_DAYS):
+    """{identifiant: nombre de billets et de critiques publiés pendant les `days` derniers jours}."""
+    since = timezone.now() - timedelta(days=days)
+    activity = Counter()
+    for model in (Ticket, Review):
+        activity.update(dict(model.objects.filter(time_created__gte=since).order_by()
+                             .values_list('user_id').annotate(Count('pk'))))
+    return activity
+
+
+def _excluded_accounts():
+    """Comptes à ne jamais suggérer : désactivés ou en attente de purge."""
+    return set(get_user_model().objects.filter(Q(is_active=False) | Q(deleted_at__isnull=False)).values_list('pk', flat=True))
+
+
+def boosts(activity, excluded, size):
+    """Multiplicateur du score de chaque compte : 1 + poids × log(1 + posts récents), 0 pour un compte exclu."""
+    boost = array('d', [1.0]) * size
+    for user_id, count in activity.items():
+        if user_id < size:  # Compte créé pendant le calcul : absent du graphe
+            boost[user_id] = 1 + SUGGESTION_ACTIVITY_WEIGHT * math.log1p(count)
+    for user_id in excluded:
+        if user_id < size:
+            boost[user_id] = 0.0
+    return np.asarray(boost) if np is not None else boost
+
+
+def suggest(graph, user_id, boost, limit=SUGGESTION_COUNT):
+    """Calcule les meilleures suggestions d'un utilisateur (objets FollowSuggestion non enregistrés).
+
+    Tri par score, puis par nombre d'abonnements en commun, puis par identifiant.
+    """
+    followed = graph.followed(user_id)
+    if not len(followed):
+        return []
+    if np is not None:
+        starts, lengths = graph.offsets[followed], graph.offsets[followed + 1] - graph.offsets[followed]
+        # Concaténation des listes des comptes suivis, en un seul accès indexé : start de chaque liste + rang dans la liste
+        positions = np.arange(lengths.sum()) + np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        candidates, mutual = np.unique(graph.targets[positions], return_counts=True)
+        scores = mutual * boost[candidates]
+        scores[np.isin(candidates, followed) | (candidates == user_id)] = 0  # Déjà suivis, ou l'utilisateur lui-même
+        kept = np.flatnonzero(scores)
+        best = kept[np.lexsort((candidates[kept], -mutual[kept], -scores[kept]))[:limit]]
+        rows = zip(scores[best].tolist(), mutual[best].tolist(), candidates[best].tolist())
+    else:
+        counts = Counter()
+        for followed_id in followed:
+            counts.update(graph.followed(followed_id))
+        for ignored in (*followed, user_id):
+            counts.pop(ignored, None)
+        rows = heapq.nsmallest(limit, ((count * boost[candidate], count, candidate)
+                                       for candidate, count in counts.items() if boost[candidate]),
+                               key=lambda row: (-row[0], -row[1], row[2]))
+    return [FollowSuggestion(user_id=user_id, suggested_id=candidate, rank=rank, score=score, mutual_count=count)
+            for rank, (score, count, candidate) in enumerate(rows)]
+
+
+def affected_users(user_ids):
+    """Utilisateurs dont les suggestions dépendent des abonnements de `user_ids` : eux-mêmes et leurs abonnés."""
+    affected = set(user_ids)
+    for chunk in _chunks(user_ids):
+        affected.update(UserFollows.objects.filter(followed_user_id__in=chunk).values_list('user_id', flat=True))
+    return affected
+
+
+def mark_stale(user_ids):
+    """Signale que les abonnements de ces utilisateurs ont changé (suggestions à recalculer au prochain refresh())."""
+    now = timezone.now()
+    StaleSuggestions.objects.bulk_create([StaleSuggestions(user_id=user_id, changed_at=now) for user_id in user_ids],
+                                         update_conflicts=True, unique_fields=['user'], update_fields=['changed_at'])
+
+
+def refresh(full=False, batch_size=SUGGESTION_BATCH_SIZE, progress=None):
+    """Recalcule les suggestions des utilisateurs marqués et de leurs abonnés (tous avec `full`).
+
+    `progress(utilisateurs traités)` est appelée après chaque lot. Retourne le nombre d'utilisateurs recalculés.
+    """
+    started = timezone.now()
+    stale = list(StaleSuggestions.objects.filter(changed_at__lte=started).values_list('user_id', flat=True))
+    excluded = _excluded_accounts()
+    if full:
+        user_ids = set(get_user_model().objects.values_list('pk', flat=True)) - excluded
+        graph = FollowGraph.load()
+    else:
+        user_ids = affected_users(stale) - excluded
+        graph = FollowGraph.load(user_ids)
+    boost = boosts(recent_activity(), excluded, graph.size)
+    done = 0
+    for batch in _chunks(sorted(user_ids), batch_size):
+        suggestions = [suggestion for user_id in batch for suggestion in suggest(graph, user_id, boost)]
+        with transaction.atomic():
+            FollowSuggestion.objects.filter(user_id__in=batch).delete()
+            FollowSuggestion.objects.bulk_create(suggestions)
+        done += len(batch)
+        if progress is not None:
+            progress(done)
+    for chunk in _chunks(stale):  # Marques posées pendant le calcul : gardées pour le prochain
+        StaleSuggestions.objects.filter(user_id__in=chunk, changed_at__lte=started).delete()
+    return done
+
+
+def suggestions_for(user, exclude=()):
+    """Suggestions précalculées d'un utilisateur, en une requête, sans les comptes `exclude` (suivis depuis le calcul)."""
+    suggestions = (FollowSuggestion.objects.filter(user=user, suggested__is_active=True, suggested__deleted_at__isnull=True)
+                   .select_related('suggested').order_by('rank'))
+    return [suggestion for suggestion in suggestions if suggestion.suggested_id not in exclude]
@@ -0,0 +1,263 @@
+"""Recherche plein texte dans les billets, critiques et commentaires.
+
+Sous SQLite, le texte est indexé dans une table virtuelle FTS5 (reviews_search),
+tenue à jour par les signaux à chaque enregistrement ou suppression. Chaque post y
+a pour rowid `id * 4 + code du type`, ce qui permet de le retrouver ou de le
+supprimer sans colonne indexée supplémentaire. Les résultats sont classés par
+pertinence (bm25) et limités aux posts de l'utilisateur et des comptes qu'il suit.
+Les extraits surlignés sont calculés en Python à partir des objets chargés.
+
+Sur un autre moteur, search() se replie sur like_search() (LIKE '%mot%').
+"""
+import re
+import unicodedata
+
+from django.conf import settings
+from django.db import connection, connections, router, transaction
+from django.db.models import CharField, F, Q, Value
+from django.utils.html import escape, format_html
+from django.utils.safestring import mark_safe
+
+from . import follow_graph
+from .models import Comment, Review, Ticket
+
+SEARCH_TABLE = 'reviews_search'
+SEARCH_PAGE_SIZE = 20  # Nombre de résultats par page
+SEARCH_MAX_CANDIDATES = getattr(settings, 'SEARCH_MAX_CANDIDATES', 2000)  # Résultats classés par pertinence, par type
+SNIPPET_WORDS = 24  # Longueur des extraits affichés
+
+TICKET = 'TICKET'
+REVIEW = 'REVIEW'
+COMMENT = 'COMMENT'
+KIND_CODES = {TICKET: 1, REVIEW: 2, COMMENT: 3}
+KINDS = {code: kind for kind, code in KIND_CODES.items()}
+
+# Colonnes indexées de chaque modèle : (type, titre, corps)
+INDEXED_FIELDS = {
+    Ticket: (TICKET, 'title', 'description'),
+    Review: (REVIEW, 'headline', 'body'),
+    Comment: (COMMENT, None, 'body'),
+}
+
+WORD_RE = re.compile(r'\w+')
+
+
+def is_available():
+    """FTS5 n'existe que sous SQLite."""
+    return connection.vendor == 'sqlite'
+
+
+def rowid(kind, object_id):
+    return object_id * 4 + KIND_CODES[kind]
+
+
+def index(obj):
+    """Indexe (ou réindexe) un billet, une critique ou un commentaire."""
+    if not is_available():
+        return
+    kind, title_field, body_field = INDEXED_FIELDS[type(obj)]
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', [rowid(kind, obj.pk)])
+        cursor.execute(
+            f'INSERT INTO {SEARCH_TABLE} (rowid, author_id, title, body) VALUES (%s, %s, %s, %s)',
+            [rowid(kind, obj.pk), obj.user_id, getattr(obj, title_field) if title_field else '',
+             getattr(obj, body_field)],
+        )
+
+
+def unindex(obj):
+    """Retire un post supprimé de l'index."""
+    if not is_available():
+        return
+    kind = INDEXED_FIELDS[type(obj)][0]
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', [rowid(kind, obj.pk)])
+
+
+def unindex_ids(model, ids):
+    """Retire de l'index une liste de posts d'un même type (purge en masse)."""
+    if not is_available() or not ids:
+        return
+    kind = INDEXED_FIELDS[model][0]
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({", ".join(["%s"] * len(ids))})',
+                       [rowid(kind, pk) for pk in ids])
+
+
+def rebuild():
+    """Reconstruit entièrement l'index à partir des tables sources (requêtes ensemblistes).
+
+    Seuls les posts vivants sont indexés : les posts supprimés en attente de purge
+    (voir reviews.purge) restent hors de l'index. Retourne le nombre de posts indexés. La reconstruction est atomique : les
+    recherches concurrentes ne voient jamais un index vide.
+    """
+    if not is_available():
+        return None
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+        for model, (kind, title_field, body_field) in INDEXED_FIELDS.items():
+            title = model._meta.get_field(title_field).column if title_field else "''"
+            body = model._meta.get_field(body_field).column
+            deleted_at = model._meta.get_field('deleted_at').column
+            cursor.execute(
+                f'INSERT INTO {SEARCH_TABLE} (rowid, author_id, title, body) '
+                f'SELECT id * 4 + {KIND_CODES[kind]}, user_id, {title}, {body} FROM {model._meta.db_table} '
+                f'WHERE {deleted_at} IS NULL'
+            )
+        cursor.execute(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('optimize')")  # Fusionne les segments
+        cursor.execute(f'SELECT count(*) FROM {SEARCH_TABLE}')
+        return cursor.fetchone()[0]
+
+
+def build_match(query):
+    """Transforme la saisie de l'utilisateur en requête FTS5 sûre : tous les mots, le dernier en préfixe.
+
+    La syntaxe FTS5 (guillemets, opérateurs, colonnes) n'est jamais transmise telle quelle.
+    """
+    words = WORD_RE.findall(query)
+    if not words:
+        return None
+    return ' '.join(f'"{word}"' for word in words) + '*'
+
+
+def _visible_authors(user):
+    return [user.pk, *follow_graph.followed_ids(user.pk)]
+
+
+def fts_search(user, query, page=1, page_size=SEARCH_PAGE_SIZE):
+    """Résultats FTS5 classés par pertinence : lignes {'kind', 'object_id'} (une de plus que la page).
+
+    Pour chaque type (billets, critiques, commentaires), seuls les SEARCH_MAX_CANDIDATES
+    résultats visibles d'identifiant le plus élevé, donc les plus récemment créés, sont
+    classés par bm25 : FTS5 parcourt les rowid en ordre décroissant et s'arrête dès qu'il
+    en a assez. Les trois types ont des séquences d'identifiants indépendantes : une seule
+    fenêtre serait remplie par le type le plus nombreux. Sans cette borne, un mot très
+    courant ferait calculer le score de centaines de milliers de documents à chaque recherche.
+    """
+    match = build_match(query)
+    if match is None:
+        return []
+    authors = _visible_authors(user)
+    window = (f"SELECT * FROM (SELECT rowid, rank FROM {SEARCH_TABLE} "
+              f"WHERE {SEARCH_TABLE} MATCH %s AND rowid %% 4 = %s "
+              f"AND author_id IN ({', '.join(['%s'] * len(authors))}) ORDER BY rowid DESC LIMIT %s)")
+    params = []
+    for code in KINDS:
+        params += [match, code, *authors, SEARCH_MAX_CANDIDATES]
+    with connections[router.db_for_read(Ticket)].cursor() as cursor:  # La réplique, si la vue la lit
+        cursor.execute(
+            f"SELECT rowid FROM ({' UNION ALL '.join([window] * len(KINDS))}) ORDER BY rank LIMIT %s OFFSET %s",
+            [*params, page_size + 1, (page - 1) * page_size],
+        )
+        return [{'kind': KINDS[row_id % 4], 'object_id': row_id // 4} for row_id, in cursor.fetchall()]
+
+
+def ids_matching(model, query, limit=SEARCH_MAX_CANDIDATES):
+    """Identifiants des `limit` posts d'un type les plus récents qui correspondent à la requête, tous auteurs confondus.
+
+    Recherche de l'administration : None si FTS5 n'est pas disponible.
+    """
+    if not is_available():
+        return None
+    match = build_match(query)
+    if match is None:
+        return []
+    code = KIND_CODES[INDEXED_FIELDS[model][0]]
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s AND rowid %% 4 = %s '
+                       f'ORDER BY rowid DESC LIMIT %s', [match, code, limit])
+        return [row_id // 4 for row_id, in cursor.fetchall()]
+
+
+def like_search(user, query, page=1, page_size=SEARCH_PAGE_SIZE):
+    """Recherche naïve LIKE '%mot%' sur les tables sources, du plus récent au plus ancien.
+
+    Chaque mot doit apparaître dans le titre ou le corps. Sert de repli hors SQLite
+    et de référence pour le benchmark : chaque requête parcourt les tables entières.
+    """
+    words = WORD_RE.findall(query)
+    if not words:
+        return []
+    authors = Q(user_id__in=_visible_authors(user))
+    branches = []
+    for model, (kind, title_field, body_field) in INDEXED_FIELDS.items():
+        fields = [field for field in (title_field, body_field) if field]
+        condition = Q()
+        for word in words:
+            any_field = Q()
+            for field in fields:
+                any_field |= Q(**{f'{field}__icontains': word})
+            condition &= any_field
+        branches.append(model.objects.filter(authors, condition).values(
+            'time_created', kind=Value(kind, CharField()), object_id=F('id')))
+    rows = branches[0].union(*branches[1:], all=True).order_by('-time_created', '-object_id')
+    offset = (page - 1) * page_size
+    return list(rows[offset:offset + page_size + 1])
+
+
+def search(user, query, page=1, page_size=SEARCH_PAGE_SIZE):
+    """Retourne (résultats, has_next) pour une page de recherche.
+
+    Chaque résultat est le billet, la critique ou le commentaire trouvé, avec les
+    attributs `search_kind` et `snippet` (extrait surligné, HTML sûr).
+    """
+    rows = (fts_search if is_available() else like_search)(user, query, page, page_size)
+    has_next = len(rows) > page_size
+    return _hydrate(rows[:page_size], WORD_RE.findall(query)), has_next
+
+
+def _fold(word):
+    """Minuscules sans accents, comme le tokenizer unicode61 (remove_diacritics)."""
+    return ''.join(char for char in unicodedata.normalize('NFKD', word.casefold()) if not unicodedata.combining(char))
+
+
+def highlight(text, words, size=SNIPPET_WORDS):
+    """Extrait de `size` mots autour du premier mot trouvé, avec les mots trouvés entre balises <mark>.
+
+    Le texte est échappé ; le dernier mot de la requête est cherché en préfixe,
+    comme dans build_match(). Retourne None si aucun mot n'apparaît dans le texte.
+    L'extrait est calculé en Python sur le texte déjà chargé : snippet() de FTS5
+    coûterait un parcours de la liste des documents du mot pour chaque résultat.
+    """
+    terms = [_fold(word) for word in words]
+    if not terms:
+        return None
+    tokens = list(WORD_RE.finditer(text))
+    hits = {i for i, token in enumerate(tokens)
+            if _fold(token.group()) in terms[:-1] or _fold(token.group()).startswith(terms[-1])}
+    if not hits:
+        return None
+    start = max(0, min(hits) - size // 4)
+    end = min(len(tokens), start + size)
+    parts = ['…'] if start else []
+    position = tokens[start].start()
+    for i in range(start, end):
+        token = tokens[i]
+        parts.append(escape(text[position:token.start()]))
+        parts.append(format_html('<mark>{}</mark>', token.group()) if i in hits else escape(token.group()))
+        position = token.end()
+    parts.append('…' if end < len(tokens) else escape(text[position:]))
+    return mark_safe(''.join(parts))
+
+
+def _hydrate(rows, words):
+    """Charge en bloc les objets trouvés (une requête par type) en conservant l'ordre des résultats."""
+    querysets = {
+        TICKET: Ticket.objects.select_related('user'),
+        REVIEW: Review.objects.select_related('user', 'ticket'),
+        COMMENT: Comment.objects.select_related('user', 'ticket'),
+    }
+    objects = {}
+    for kind, queryset in querysets.items():
+        ids = [row['object_id'] for row in rows if row['kind'] == kind]
+        objects[kind] = queryset.in_bulk(ids) if ids else {}
+    results = []
+    for row in rows:
+        obj = objects[row['kind']].get(row['object_id'])
+        if obj is not None:  # Le post a pu être supprimé entre les deux requêtes
+            _, title_field, body_field = INDEXED_FIELDS[type(obj)]
+            obj.search_kind = row['kind']
+            obj.snippet = highlight(getattr(obj, body_field), words) or (
+                highlight(getattr(obj, title_field), words) if title_field else None)
+            results.append(obj)
+    return results
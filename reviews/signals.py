@@ -0,0 +1,193 @@
+"""Récepteurs de signaux qui maintiennent le flux matérialisé, son cache, les agrégats des billets, l'index de recherche et le cache des utilisateurs connectés à jour.
+
+Dans la requête, seul ce que l'auteur doit voir tout de suite est fait : agrégats,
+entrée dans son propre flux, invalidation de son cache, suppressions. Le fan-out
+vers les abonnés, l'historique d'un nouvel abonnement, l'élagage après un
+désabonnement et l'index de recherche passent par des tâches d'arrière-plan
+(reviews.tasks), exécutées après la validation de l'écriture.
+"""
+from django.apps import apps
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import auth_cache, feed_cache, follow_graph, recommendations, search, tasks, ticket_stats, timeline
+from .models import Comment, CustomUser, FeedEntry, Review, Ticket, UserFollows
+
+
+@tasks.task
+def fan_out(kind, object_id):
+    """Pousse un nouveau post dans le flux de tous ses lecteurs et invalide leur cache."""
+    model, push = {FeedEntry.TICKET: (Ticket, timeline.push_ticket), FeedEntry.REVIEW: (Review, timeline.push_review)}[kind]
+    post = model.objects.filter(pk=object_id).first()
+    if post is None:  # Supprimé avant l'exécution de la tâche
+        return
+    push(post)  # L'entrée de l'auteur existe déjà : ignorée
+    readers = feed_cache.post_readers(kind, object_id)
+    if kind == FeedEntry.REVIEW:
+        readers |= feed_cache.post_readers(FeedEntry.TICKET, post.ticket_id)  # Les agrégats du billet ont changé
+    feed_cache.invalidate(readers)
+
+
+@tasks.task
+def backfill_follow(user_id, followed_user_id):
+    """Ajoute l'historique de l'utilisateur suivi au flux de son nouvel abonné."""
+    timeline.backfill(user_id, followed_user_id)
+    feed_cache.invalidate([user_id])
+
+
+@tasks.task
+def prune_follow(user_id, followed_user_id):
+    """Retire du flux de l'ancien abonné les posts de l'utilisateur qu'il ne suit plus."""
+    if followed_user_id in follow_graph.followed_ids(user_id):  # Réabonné entre-temps
+        return
+    timeline.prune(user_id, followed_user_id)
+    feed_cache.invalidate([user_id])
+
+
+@tasks.task
+def author_renamed(user_id):
+    """Invalide les flux qui affichent le nom d'un utilisateur renommé : ses posts et les critiques de ses billets."""
+    reviews_on_tickets = Review.objects.filter(ticket__user_id=user_id).values('pk')
+    feed_cache.invalidate(FeedEntry.objects.filter(
+        Q(author_id=user_id) | Q(kind=FeedEntry.REVIEW, object_id__in=reviews_on_tickets)
+    ).values_list('owner_id', flat=True).distinct())
+
+
+@tasks.task
+def index_post(model_name, object_id):
+    """(Ré)indexe un post pour la recherche plein texte, s'il existe encore."""
+    post = apps.get_model('reviews', model_name).objects.filter(pk=object_id).first()
+    if post is not None:
+        search.index(post)
+
+
+@receiver(post_init, sender=CustomUser)
+def user_loaded(sender, instance, **kwargs):
+    # Nom d'origine, pour repérer un changement de nom (None si le champ n'est pas chargé : pas de requête)
+    instance._username_original = instance.__dict__.get('username')
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def user_changed(sender, instance, created=False, **kwargs):
+    """Profil, mot de passe, droits ou dernière connexion modifiés : l'utilisateur en cache est périmé.
+
+    Un changement de nom périme aussi les pages du flux qui l'affichent (les fragments changent de clé).
+    """
+    auth_cache.invalidate([instance.pk])
+    original = getattr(instance, '_username_original', None)
+    if not created and original is not None and original != instance.__dict__.get('username', original):
+        tasks.enqueue(author_renamed, instance.pk)
+    instance._username_original = instance.__dict__.get('username')
+
+
+@receiver(post_save, sender=Ticket)
+def ticket_saved(sender, instance, created, **kwargs):
+    """Pousse un nouveau billet dans le flux de son auteur et de ses abonnés."""
+    if created:
+        ticket_stats.ticket_created(instance)
+        timeline.push_ticket(instance, readers={instance.user_id})  # L'auteur voit son billet tout de suite
+        feed_cache.invalidate([instance.user_id])
+        tasks.enqueue(fan_out, FeedEntry.TICKET, instance.pk)
+    else:
+        feed_cache.invalidate(feed_cache.post_readers(FeedEntry.TICKET, instance.pk))
+
+
+@receiver(post_init, sender=Review)
+def review_loaded(sender, instance, **kwargs):
+    # Valeurs d'origine, pour appliquer aux agrégats la différence lors d'une modification
+    instance._stats_original = (instance.ticket_id, instance.rating)
+
+
+@receiver(post_save, sender=Review)
+def review_saved(sender, instance, created, **kwargs):
+    """Pousse une nouvelle critique dans le flux de ses lecteurs et met à jour les agrégats du billet."""
+    ticket_stats.review_saved(instance, created)
+    instance._stats_original = (instance.ticket_id, instance.rating)
+    if created:
+        timeline.push_review(instance, readers={instance.user_id})  # L'auteur voit sa critique tout de suite
+        feed_cache.invalidate([instance.user_id])
+        tasks.enqueue(fan_out, FeedEntry.REVIEW, instance.pk)
+    else:
+        # Les lecteurs du billet voient aussi ses agrégats changer
+        feed_cache.invalidate(feed_cache.post_readers(FeedEntry.REVIEW, instance.pk)
+                              | feed_cache.post_readers(FeedEntry.TICKET, instance.ticket_id))
+
+
+@receiver(pre_delete, sender=Ticket)
+def ticket_deleting(sender, instance, **kwargs):
+    # Les lecteurs sont relevés avant la suppression des entrées du flux
+    instance._feed_readers = feed_cache.post_readers(FeedEntry.TICKET, instance.pk)
+
+
+@receiver(pre_delete, sender=Review)
+def review_deleting(sender, instance, **kwargs):
+    instance._feed_readers = (feed_cache.post_readers(FeedEntry.REVIEW, instance.pk)
+                              | feed_cache.post_readers(FeedEntry.TICKET, instance.ticket_id))
+
+
+@receiver(post_delete, sender=Ticket)
+def ticket_deleted(sender, instance, **kwargs):
+    timeline.remove_post(FeedEntry.TICKET, instance.pk)
+    feed_cache.invalidate(getattr(instance, '_feed_readers', ()))
+
+
+@receiver(post_delete, sender=Review)
+def review_deleted(sender, instance, **kwargs):
+    ticket_stats.review_deleted(instance)
+    timeline.remove_post(FeedEntry.REVIEW, instance.pk)
+    feed_cache.invalidate(getattr(instance, '_feed_readers', ()))
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    """Compte le nouveau commentaire et invalide le flux des lecteurs du billet commenté."""
+    if created:
+        ticket_stats.comment_added(instance)
+    feed_cache.invalidate(feed_cache.post_readers(FeedEntry.TICKET, instance.ticket_id))
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    ticket_stats.comment_deleted(instance)
+    feed_cache.invalidate(feed_cache.post_readers(FeedEntry.TICKET, instance.ticket_id))
+
+
+def follow_added(user_id, followed_user_id):
+    """Met à jour les abonnements en cache, marque les suggestions à recalculer et met en file l'ajout de l'historique de l'utilisateur suivi.
+
+    Appelée par le signal post_save, et directement par les insertions en masse qui ne l'envoient pas.
+    """
+    follow_graph.invalidate(user_id, followed_user_id)
+    recommendations.mark_stale([user_id])  # Suggestions recalculées au prochain passage de compute_suggestions
+    tasks.enqueue(backfill_follow, user_id, followed_user_id)
+
+
+@receiver(post_save, sender=UserFollows)
+def follow_saved(sender, instance, created, **kwargs):
+    if created:
+        follow_added(instance.user_id, instance.followed_user_id)
+
+
+@receiver(post_delete, sender=UserFollows)
+def follow_deleted(sender, instance, **kwargs):
+    """Met à jour les abonnements en cache et met en file l'élagage du flux de l'ancien abonné."""
+    follow_graph.invalidate(instance.user_id, instance.followed_user_id)
+    recommendations.mark_stale([instance.user_id])
+    tasks.enqueue(prune_follow, instance.user_id, instance.followed_user_id)
+
+
+@receiver(post_save, sender=Ticket)
+@receiver(post_save, sender=Review)
+@receiver(post_save, sender=Comment)
+def post_indexed(sender, instance, **kwargs):
+    """Tient l'index de recherche plein texte à jour après chaque création ou modification."""
+    tasks.enqueue(index_post, sender.__name__, instance.pk)
+
+
+@receiver(post_delete, sender=Ticket)
+@receiver(post_delete, sender=Review)
+@receiver(post_delete, sender=Comment)
+def post_unindexed(sender, instance, **kwargs):
+    search.unindex(instance)
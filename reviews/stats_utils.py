@@ -0,0 +1,11 @@
+"""Statistiques descriptives partagées par le profilage, la file de tâches et les benchmarks."""
+import math
+
+
+def percentile(values, pct):
+    """Retourne le percentile `pct` (0-100) d'une liste de valeurs, par la méthode du rang le plus proche."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
@@ -0,0 +1,231 @@
+"""Tâches d'arrière-plan : file durable en base et pool de threads.
+
+Les effets de bord coûteux d'une écriture (fan-out du flux, index de recherche...)
+sont mis en file par enqueue() au lieu d'être exécutés dans la requête. La tâche
+est une ligne de la table Task, insérée dans la même transaction que l'écriture :
+elle n'existe que si l'écriture est validée, et survit à un redémarrage. Le pool
+de threads du processus est réveillé par transaction.on_commit(), une fois la
+transaction validée ; des workers séparés peuvent aussi traiter la file
+(commande run_tasks).
+
+Une tâche est une fonction décorée par @task, appelée avec des arguments JSON
+(des identifiants : l'objet a pu changer ou disparaître avant l'exécution). Une
+tâche qui lève une exception est réessayée avec un délai croissant, jusqu'à
+TASK_MAX_ATTEMPTS essais. Avec TASKS_EAGER (tests), les tâches s'exécutent
+immédiatement, dans la requête, hors du budget de requêtes de la vue.
+"""
+import logging
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from importlib import import_module
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Count, F, Min
+from django.utils import timezone
+
+from .models import Task
+from .query_budget import uncounted
+from .stats_utils import percentile
+
+logger = logging.getLogger(__name__)
+
+TASK_WORKERS = getattr(settings, 'TASK_WORKERS', 2)  # Threads du pool de chaque processus web (0 : workers séparés seulement)
+TASK_MAX_ATTEMPTS = getattr(settings, 'TASK_MAX_ATTEMPTS', 3)
+TASK_RETRY_DELAY = getattr(settings, 'TASK_RETRY_DELAY', 5)  # Délai avant le deuxième essai (secondes), doublé ensuite
+TASK_TIMEOUT = getattr(settings, 'TASK_TIMEOUT', 600)  # Une tâche en cours depuis plus longtemps est remise en file
+POLL_INTERVAL = 1  # Secondes entre deux lectures de la file quand aucun réveil n'arrive
+
+
+def task(func):
+    """Déclare une fonction comme tâche d'arrière-plan, exécutable par son chemin module.fonction."""
+    func.task_name = f'{func.__module__}.{func.__qualname__}'
+    return func
+
+
+def resolve(name):
+    """Retrouve la fonction d'une tâche à partir de son nom ; seules les fonctions décorées par @task sont acceptées."""
+    module, _, attribute = name.rpartition('.')
+    func = getattr(import_module(module), attribute, None)
+    if not hasattr(func, 'task_name'):
+        raise LookupError(f"Tâche inconnue : {name}")
+    return func
+
+
+def enqueue(func, *args, max_attempts=TASK_MAX_ATTEMPTS):
+    """Met en file `func(*args)` ; le pool est réveillé à la validation de la transaction en cours."""
+    if getattr(settings, 'TASKS_EAGER', False):
+        with uncounted():  # Hors du budget de la vue : en production, la tâche s'exécute ailleurs
+            func(*args)
+        return None
+    queued = Task.objects.create(name=func.task_name, args=list(args), max_attempts=max_attempts)
+    transaction.on_commit(wake)
+    return queued
+
+
+def claim(limit):
+    """Réserve jusqu'à `limit` tâches exécutables et les passe « en cours ».
+
+    Sous SQLite, la transaction IMMEDIATE sérialise les réservations entre workers ;
+    ailleurs, SELECT ... FOR UPDATE SKIP LOCKED les répartit sans attente.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(Task.objects.select_for_update(skip_locked=True)
+                   .filter(status=Task.PENDING, run_after__lte=now)
+                   .order_by('run_after').values_list('pk', flat=True)[:limit])
+        if not ids:
+            return []
+        Task.objects.filter(pk__in=ids).update(status=Task.RUNNING, started_at=now, attempts=F('attempts') + 1)
+    return list(Task.objects.filter(pk__in=ids).order_by('run_after'))
+
+
+def release(batch):
+    """Remet en file des tâches réservées mais pas lancées, sans compter d'essai."""
+    Task.objects.filter(pk__in=[queued.pk for queued in batch], status=Task.RUNNING).update(
+        status=Task.PENDING, attempts=F('attempts') - 1)
+
+
+def requeue_stale():
+    """Remet en file les tâches « en cours » d'un worker arrêté brutalement. Retourne leur nombre."""
+    cutoff = timezone.now() - timedelta(seconds=TASK_TIMEOUT)
+    return Task.objects.filter(status=Task.RUNNING, started_at__lt=cutoff).update(status=Task.PENDING)
+
+
+def execute(queued):
+    """Exécute une tâche réservée et enregistre son résultat (terminée, réessai différé ou échec)."""
+    try:
+        resolve(queued.name)(*queued.args)
+    except Exception:
+        error = traceback.format_exc()
+        if queued.attempts >= queued.max_attempts:
+            logger.error('Tâche %s en échec après %s essais\n%s', queued, queued.attempts, error)
+            Task.objects.filter(pk=queued.pk).update(status=Task.FAILED, finished_at=timezone.now(), last_error=error)
+        else:
+            delay = TASK_RETRY_DELAY * 2 ** (queued.attempts - 1)
+            logger.warning('Tâche %s : essai %s échoué, nouvel essai dans %s s', queued, queued.attempts, delay)
+            Task.objects.filter(pk=queued.pk).update(
+                status=Task.PENDING, run_after=timezone.now() + timedelta(seconds=delay), last_error=error)
+    else:
+        Task.objects.filter(pk=queued.pk).update(status=Task.DONE, finished_at=timezone.now())
+
+
+def run_pending(limit=100):
+    """Exécute les tâches en attente dans le thread courant, jusqu'à vider la file ; retourne leur nombre."""
+    count = 0
+    while batch := claim(limit):
+        for queued in batch:
+            execute(queued)
+        count += len(batch)
+    return count
+
+
+class Worker:
+    """Pool de threads alimenté par la file : un thread de distribution réserve les tâches, le pool les exécute."""
+
+    def __init__(self, threads):
+        self.threads = threads
+        self.executor = ThreadPoolExecutor(threads, thread_name_prefix='litrevu-task')
+        self.wakeup = threading.Event()
+        self.stopping = threading.Event()
+        self.running = 0
+        self.lock = threading.Lock()
+
+    def start(self):
+        threading.Thread(target=self.loop, name='litrevu-task-dispatch', daemon=True).start()
+        return self
+
+    def stop(self, wait=True):
+        self.stopping.set()
+        self.wakeup.set()
+        self.executor.shutdown(wait=wait)
+
+    def idle(self):
+        with self.lock:
+            return self.running == 0
+
+    def loop(self, burst=False):
+        """Distribue les tâches ; avec `burst`, s'arrête quand la file est vide et les tâches terminées."""
+        next_requeue = timezone.now()
+        try:
+            while not self.stopping.is_set():
+                if timezone.now() >= next_requeue:
+                    requeue_stale()
+                    next_requeue = timezone.now() + timedelta(seconds=60)
+                with self.lock:
+                    free = self.threads - self.running
+                batch = claim(free) if free else []
+                for position, queued in enumerate(batch):
+                    with self.lock:
+                        self.running += 1
+                    try:
+                        self.executor.submit(self._run, queued)
+                    except RuntimeError:  # Pool arrêté (fin du processus) : le reste du lot retourne dans la file
+                        with self.lock:
+                            self.running -= 1
+                        release(batch[position:])
+                        return
+                if not batch:
+                    if burst and self.idle():
+                        break
+                    self.wakeup.wait(POLL_INTERVAL)
+                    self.wakeup.clear()
+        except Exception:
+            logger.exception('Arrêt du distributeur de tâches')
+            raise
+        finally:
+            close_old_connections()
+
+    def _run(self, queued):
+        try:
+            execute(queued)
+        except Exception:
+            logger.exception('Impossible d\'enregistrer le résultat de la tâche %s', queued)  # Elle sera remise en file
+        finally:
+            close_old_connections()  # Chaque thread du pool a sa propre connexion
+            with self.lock:
+                self.running -= 1
+            self.wakeup.set()  # Un thread est libre : réserver la suite
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def wake():
+    """Réveille le pool du processus (créé au premier appel) pour traiter les tâches nouvellement validées."""
+    global _worker
+    if TASK_WORKERS <= 0:
+        return
+    with _worker_lock:
+        if _worker is None:
+            _worker = Worker(TASK_WORKERS).start()
+    _worker.wakeup.set()
+
+
+def metrics(window=timedelta(hours=1)):
+    """Profondeur de la file par statut, âge de la plus ancienne tâche en attente et latence récente.
+
+    La latence va de la mise en file à la fin de l'exécution, sur les tâches terminées pendant `window`.
+    """
+    now = timezone.now()
+    depth = dict(Task.objects.order_by().values_list('status').annotate(Count('pk')))
+    oldest = Task.objects.filter(status=Task.PENDING).aggregate(oldest=Min('created_at'))['oldest']
+    finished = Task.objects.filter(status=Task.DONE, finished_at__gte=now - window).values_list('created_at', 'finished_at')
+    latencies = [(end - start).total_seconds() * 1000 for start, end in finished.iterator()]
+    return {
+        **{status: depth.get(status, 0) for status, _ in Task.STATUS_CHOICES},
+        'oldest_pending_s': (now - oldest).total_seconds() if oldest else 0.0,
+        'done_in_window': len(latencies),
+        'latency_p50_ms': percentile(latencies, 50),
+        'latency_p95_ms': percentile(latencies, 95),
+        'latency_p99_ms': percentile(latencies, 99),
+    }
+
+
+def purge(older_than=timedelta(days=1)):
+    """Supprime les tâches terminées depuis plus de `older_than` ; retourne leur nombre."""
+    deleted, _ = Task.objects.filter(status=Task.DONE, finished_at__lt=timezone.now() - older_than).delete()
+    return deleted
@@ -1,3 +1,1560 @@
-from django.test import TestCase
+import json
+import re
+import sqlite3
+import tempfile
+import time
+from collections import Counter
+from contextlib import closing, contextmanager
+from datetime import datetime, timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import iscoroutinefunction
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection, models, router, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from litrevu.database import sqlite_database
+
+from . import admin as litrevu_admin
+from . import (analytics, archive, auth_cache, comments, db_routing, feed_cache, follow_graph, fragments, profiling, purge, recommendations,
+               search, tasks, throttling, ticket_stats, timeline, transfer, user_search)
+from .feed import REVIEW, TICKET, decode_cursor, encode_cursor, get_feed_page, get_live_feed_page
+from .query_budget import QueryBudgetExceeded, count_queries, query_budget, view_query_counts
+from .models import (ArchivedComment, ArchivedReview, ArchivedTicket, Comment, CustomUser, FeedEntry, FollowSuggestion, RatingSnapshot, Review, StaleSuggestions, Task,
+                     Ticket, TicketStats, UserFollows)
+from .views import get_users_viewable_reviews, get_users_viewable_tickets
+
+
+def make_user(username):
+    """Crée un utilisateur de test avec un email unique."""
+    return CustomUser.objects.create_user(username=username, email=f'{username}@example.com')
+
+
+def make_ticket(user, title='Billet', when=None):
+    """Crée un billet ; `when` force la date de création (auto_now_add l'écrase sinon)."""
+    ticket = Ticket.objects.create(user=user, title=title)
+    if when is not None:
+        Ticket.objects.filter(pk=ticket.pk).update(time_created=when)
+        ticket.time_created = when
+    return ticket
+
+
+def make_review(user, ticket, headline='Critique', when=None):
+    """Crée une critique ; `when` force la date de création."""
+    review = Review.objects.create(user=user, ticket=ticket, rating=3, headline=headline)
+    if when is not None:
+        Review.objects.filter(pk=review.pk).update(time_created=when)
+        review.time_created = when
+    return review
+
+
+# Tâches d'arrière-plan exécutées dans la requête (voir TaskTests), hors du budget des vues ; tout dépassement échoue
+@override_settings(TASKS_EAGER=True, QUERY_BUDGET_STRICT=True)
+class LitRevuTestCase(TestCase):
+    """Vide le cache entre les tests : les identifiants sont réutilisés après chaque rollback."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+
+class FeedPaginationTests(LitRevuTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = make_user('alice')
+        self.bob = make_user('bob')
+        self.carol = make_user('carol')
+        UserFollows.objects.create(user=self.alice, followed_user=self.bob)
+        self.now = timezone.now()
+
+    def test_merges_tickets_and_reviews_newest_first(self):
+        own = make_ticket(self.alice, when=self.now - timedelta(minutes=3))
+        followed = make_ticket(self.bob, when=self.now - timedelta(minutes=2))
+        review = make_review(self.bob, followed, when=self.now - timedelta(minutes=1))
+        make_ticket(self.carol, when=self.now)  # Auteur non suivi : invisible
+        timeline.rebuild(self.alice.pk)  # Les dates ont été forcées après le fan-out
+
+        posts, next_cursor = get_feed_page(self.alice)
+
+        self.assertEqual([(p.content_type, p.pk) for p in posts],
+                         [(REVIEW, review.pk), (TICKET, followed.pk), (TICKET, own.pk)])
+        self.assertIsNone(next_cursor)
+
+    def test_review_on_own_ticket_by_followed_user_appears_once(self):
+        ticket = make_ticket(self.alice)
+        review = make_review(self.bob, ticket)
+        make_review(self.carol, ticket)  # Critique d'un inconnu sur un billet d'alice : visible
+
+        posts, _ = get_feed_page(self.alice)
+
+        review_ids = [p.pk for p in posts if p.content_type == REVIEW]
+        self.assertEqual(len(review_ids), 2)
+        self.assertEqual(review_ids.count(review.pk), 1)
+
+    def test_cursor_walks_all_pages_without_gaps_or_duplicates(self):
+        same_time = self.now - timedelta(hours=1)
+        expected = set()
+        for i in range(7):
+            ticket = make_ticket(self.bob, title=f'T{i}', when=same_time if i % 2 else self.now - timedelta(minutes=i))
+            expected.add((TICKET, ticket.pk))
+            review = make_review(self.bob, ticket, when=same_time)
+            expected.add((REVIEW, review.pk))
+
+        timeline.rebuild(self.alice.pk)
+        seen, cursor = [], None
+        while True:
+            posts, cursor = get_feed_page(self.alice, cursor, page_size=3)
+            seen.extend((p.content_type, p.pk) for p in posts)
+            if cursor is None:
+                break
+
+        self.assertEqual(len(seen), len(expected))
+        self.assertEqual(set(seen), expected)
+        keys = [(p_time, kind, pk) for (kind, pk), p_time in zip(seen, self._times(seen))]
+        self.assertEqual(keys, sorted(keys, reverse=True))
+
+    def _times(self, seen):
+        tickets = dict(Ticket.objects.values_list('pk', 'time_created'))
+        reviews = dict(Review.objects.values_list('pk', 'time_created'))
+        return [(tickets if kind == TICKET else reviews)[pk] for kind, pk in seen]
+
+    def test_cursor_round_trip(self):
+        cursor = encode_cursor(self.now, TICKET, 42)
+        self.assertEqual(decode_cursor(cursor), (self.now, TICKET, 42))
+
+    def test_feed_view_rejects_invalid_cursor(self):
+        self.client.force_login(self.alice)
+        response = self.client.get(reverse('feed'), {'cursor': 'pas-un-curseur'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_feed_view_renders_page(self):
+        for i in range(3):
+            make_ticket(self.bob, title=f'T{i}')
+        self.client.force_login(self.alice)
+        response = self.client.get(reverse('feed'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['posts']), 3)
+        self.assertIsNone(response.context['next_cursor'])
+
+    def test_live_feed_matches_timeline(self):
+        ticket = make_ticket(self.alice)
+        make_review(self.bob, ticket)
+        make_ticket(self.bob)
+        make_review(self.carol, ticket)
+
+        timeline_posts, _ = get_feed_page(self.alice)
+        live_posts, _ = get_live_feed_page(self.alice)
+
+        self.assertEqual([(p.content_type, p.pk) for p in timeline_posts],
+                         [(p.content_type, p.pk) for p in live_posts])
+
+
+class TimelineTests(LitRevuTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = make_user('alice')
+        self.bob = make_user('bob')
+        self.carol = make_user('carol')
+
+    def entries(self, user):
+        return set(FeedEntry.objects.filter(owner=user).values_list('kind', 'object_id'))
+
+    def assertConsistent(self, *users):
+        for user in users:
+            self.assertEqual(timeline.check(user), (set(), set()))
+
+    def test_new_posts_fan_out_to_followers_and_ticket_owner(self):
+        UserFollows.objects.create(user=self.alice, followed_user=self.bob)
+        ticket = make_ticket(self.bob)
+        review = make_review(self.carol, ticket)
+
+        self.assertEqual(self.entries(self.alice), {(TICKET, ticket.pk)})
+        self.assertEqual(self.entries(self.bob), {(TICKET, ticket.pk), (REVIEW, review.pk)})
+        self.assertEqual(self.entries(self.carol), {(REVIEW, review.pk)})
+        self.assertConsistent(self.alice, self.bob, self.carol)
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        own_ticket = make_ticket(self.alice)
+        review_on_own = make_review(self.bob, own_ticket)
+        bob_ticket = make_ticket(self.bob)
+
+        follow = UserFollows.objects.create(user=self.alice, followed_user=self.bob)
+        self.assertIn((TICKET, bob_ticket.pk), self.entries(self.alice))
+        self.assertConsistent(self.alice)
+
+        follow.delete()
+        self.assertEqual(self.entries(self.alice), {(TICKET, own_ticket.pk), (REVIEW, review_on_own.pk)})
+        self.assertConsistent(self.alice)
+
+    def test_deleting_ticket_removes_it_and_its_reviews(self):
+        ticket = make_ticket(self.alice)
+        make_review(self.bob, ticket)
+        ticket.delete()
+        self.assertFalse(FeedEntry.objects.exists())
+
+    def test_rebuild_and_check_commands(self):
+        UserFollows.objects.create(user=self.alice, followed_user=self.bob)
+        make_ticket(self.bob)
+        FeedEntry.objects.all().delete()
+
+        with self.assertRaises(CommandError):
+            call_command('check_feed', stdout=StringIO())
+        call_command('rebuild_feed', stdout=StringIO())
+        call_command('check_feed', stdout=StringIO())
+        self.assertConsistent(self.alice, self.bob)
+
+
+class QueryPlanTests(LitRevuTestCase):
+    """Vérifie par EXPLAIN QUERY PLAN que les requêtes des vues utilisent les index."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = make_user('alice')
+        cls.bob = make_user('bob')
+        cls.carol = make_user('carol')
+        UserFollows.objects.create(user=cls.alice, followed_user=cls.bob)
+        UserFollows.objects.create(user=cls.carol, followed_user=cls.alice)
+        for i in range(20):
+            ticket = make_ticket(cls.bob if i % 2 else cls.alice, title=f'T{i}')
+            make_review(cls.carol, ticket)
+            cls.comment = Comment.objects.create(user=cls.alice, ticket=ticket, body='Commentaire')
+        cls.ticket = ticket
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            return [row[3] for row in cursor.fetchall()]
+
+    def assertIndexedQueries(self, queries):
+        checked = 0
+        for query in queries:
+            sql = query['sql']
+            if not sql.startswith(('SELECT', 'UPDATE', 'DELETE')) or 'django_session' in sql:
+                continue
+            checked += 1
+            for detail in self.explain(sql):
+                with self.subTest(sql=sql, detail=detail):
+                    # Table virtuelle FTS5 : « INDEX n:xxx » est un accès contraint (rowid, MATCH), « INDEX n: » un parcours
+                    virtual_lookup = re.search(r'VIRTUAL TABLE INDEX \d+:.+', detail)
+                    # Sous-requête d'un filtre sur fonction de fenêtre : parcours du résultat déjà filtré par index
+                    derived = re.fullmatch(r'SCAN (\(subquery-\d+\)|qualify)', detail)
+                    self.assertFalse(detail.startswith('SCAN ') and detail != 'SCAN CONSTANT ROW'
+                                     and not virtual_lookup and not derived, 'Parcours complet de table')
+                    self.assertNotIn('TEMP B-TREE FOR ORDER BY', detail, 'Tri sans index')
+        self.assertGreater(checked, 0)
+
+    def capture(self, func):
+        with CaptureQueriesContext(connection) as ctx:
+            func()
+        return ctx.captured_queries
+
+    def test_read_views(self):
+        self.client.force_login(self.alice)
+        next_cursor = self.client.get(reverse('feed')).context['next_cursor']
+        self.assertIsNotNone(next_cursor)
+        self.assertIndexedQueries(self.capture(lambda: [
+            self.client.get(reverse('feed')),
+            self.client.get(reverse('feed'), {'cursor': next_cursor}),
+            self.client.get(reverse('list_followed_users')),
+            self.client.get(reverse('edit_ticket', args=[self.ticket.pk - 1])),
+            self.client.get(reverse('delete_ticket', args=[self.ticket.pk - 1])),
+            self.client.get(reverse('edit_comment', args=[self.comment.pk])),
+            self.client.get(reverse('comment_thread', args=[self.ticket.pk])),
+            self.client.get(reverse('user_search'), {'q': 'B'}),
+        ]))
+
+    def test_write_views(self):
+        self.client.force_login(self.alice)
+        follow = UserFollows.objects.get(user=self.carol, followed_user=self.alice)
+        self.assertIndexedQueries(self.capture(lambda: [
+            self.client.post(reverse('add_ticket'), {'title': 'Nouveau', 'description': ''}),
+            self.client.post(reverse('add_follow'), {'username': 'carol'}),
+            self.client.post(reverse('delete_ticket', args=[self.ticket.pk - 1])),
+        ]))
+        self.client.force_login(self.carol)
+        self.assertIndexedQueries(self.capture(
+            lambda: self.client.post(reverse('remove_follow', args=[follow.pk]))))
+
+    def test_viewability_helpers_and_timeline_check(self):
+        self.assertIndexedQueries(self.capture(lambda: [
+            list(get_users_viewable_tickets(self.alice)),
+            list(get_users_viewable_reviews(self.alice)),
+            timeline.check(self.alice),
+        ]))
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class QueryBudgetTests(LitRevuTestCase):
+    """Le nombre de requêtes des vues ne doit pas dépendre du nombre de lignes affichées."""
+
+    def setUp(self):
+        super().setUp()
+        self.alice = make_user('alice')
+        self.client.force_login(self.alice)
+        self.authors = [make_user(f'auteur{i}') for i in range(10)]
+
+    def add_content(self, count):
+        for author in self.authors[:count]:
+            UserFollows.objects.get_or_create(user=self.alice, followed_user=author)
+            ticket = make_ticket(author)
+            make_review(self.authors[-1 - self.authors.index(author)], ticket)  # Auteur de billet différent
+            make_review(author, make_ticket(self.alice))  # Critique sur un billet d'alice
+            Comment.objects.create(user=self.alice, ticket=ticket, body='Commentaire')
+
+    def view_queries(self, name, *args):
+        response = self.client.get(reverse(name, args=args))
+        self.assertEqual(response.status_code, 200)
+        return view_query_counts[name]
+
+    def test_feed_and_follow_list_are_constant(self):
+        self.add_content(2)
+        small = self.view_queries('feed'), self.view_queries('list_followed_users')
+        self.add_content(10)
+        large = self.view_queries('feed'), self.view_queries('list_followed_users')
+        self.assertEqual(small, large)
+
+    def test_edit_views_are_constant(self):
+        ticket = make_ticket(self.alice)
+        comment = Comment.objects.create(user=self.alice, ticket=ticket, body='Commentaire')
+        small = self.view_queries('edit_ticket', ticket.pk), self.view_queries('edit_comment', comment.pk)
+        self.add_content(10)
+        for _ in range(5):
+            make_review(self.authors[0], ticket)
+            Comment.objects.create(user=self.authors[0], ticket=ticket, body='Commentaire')
+        large = self.view_queries('edit_ticket', ticket.pk), self.view_queries('edit_comment', comment.pk)
+        self.assertEqual(small, large)
+
+    @override_settings(TASKS_EAGER=False, QUERY_BUDGET_STRICT=True)
+    def test_write_budgets_with_queued_tasks(self):
+        ticket = make_ticket(self.alice)
+        comment = Comment.objects.create(user=self.alice, ticket=ticket, body='Commentaire')
+        self.add_content(3)  # Lecteurs à invalider
+        queued = Task.objects.count()
+        for _ in range(2):  # Budget dépassé : QueryBudgetExceeded
+            self.client.post(reverse('edit_ticket', args=[ticket.pk]), {'title': 'Modifié', 'description': ''})
+            self.client.post(reverse('edit_comment', args=[comment.pk]), {'body': 'Modifié'})
+        self.client.post(reverse('add_follow'), {'username': 'auteur9'})
+        # Dans un TestCase, les BEGIN des blocs atomiques ne sont pas émis : add_follow en compte 2 de moins
+        self.assertEqual([view_query_counts[name] for name in ('edit_ticket', 'edit_comment', 'add_follow')], [5, 5, 5])
+        self.assertEqual(Task.objects.count() - queued, 5)  # Réindexations (4) et historique du nouvel abonnement
+
+    def test_eager_tasks_are_not_counted(self):
+        ticket = make_ticket(self.alice)
+        self.add_content(3)
+        self.client.post(reverse('edit_ticket', args=[ticket.pk]), {'title': 'Modifié', 'description': ''})
+        self.assertEqual(view_query_counts['edit_ticket'], 4)  # La réindexation, exécutée sur place, n'est pas comptée
+        self.assertEqual(search.ids_matching(Ticket, 'modifié'), [ticket.pk])
+
+    def test_budget_is_enforced(self):
+        @query_budget(0)
+        def greedy_view(request):
+            return list(Ticket.objects.all())
+
+        with self.assertRaises(QueryBudgetExceeded):
+            greedy_view(None)
+
+    def test_count_queries(self):
+        with count_queries() as counter:
+            list(Ticket.objects.all())
+            list(Review.objects.all())
+        self.assertEqual(counter.count, 2)
+
+
+class FeedCacheTests(LitRevuTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = make_user('alice')
+        self.bob = make_user('bob')
+        self.carol = make_user('carol')
+        UserFollows.objects.create(user=self.alice, followed_user=self.bob)
+        self.client.force_login(self.alice)
+
+    def feed_titles(self):
+        response = self.client.get(reverse('feed'))
+        return [getattr(post, 'title', None) or post.headline for post in response.context['posts']]
+
+    def test_repeated_load_is_served_from_cache(self):
+        make_ticket(self.bob, title='Premier')
+        self.feed_titles()
+        before = feed_cache.stats()
+        with self.assertNumQueries(0):  # Session et utilisateur en cache eux aussi
+            self.assertEqual(self.feed_titles(), ['Premier'])
+        self.assertEqual(feed_cache.stats()['hits'], before['hits'] + 1)
+
+    def test_writes_invalidate_readers(self):
+        ticket = make_ticket(self.bob, title='Avant')
+        self.assertEqual(self.feed_titles(), ['Avant'])
+
+        ticket.title = 'Après'
+        ticket.save()
+        self.assertEqual(self.feed_titles(), ['Après'])
+
+        review = make_review(self.carol, ticket, headline='Critique')  # carol n'est pas suivie par alice : critique invisible
+        self.assertEqual(self.feed_titles(), ['Après'])
+        make_review(self.bob, ticket, headline='Avis de bob')
+        self.assertEqual(self.feed_titles(), ['Avis de bob', 'Après'])
+
+        review.delete()
+        ticket.delete()
+        self.assertEqual(self.feed_titles(), [])
+        self.assertGreater(feed_cache.stats()['invalidations'], 0)
+
+    def test_follow_changes_invalidate_follower(self):
+        make_ticket(self.carol, title='De carol')
+        self.assertEqual(self.feed_titles(), [])
+        follow = UserFollows.objects.create(user=self.alice, followed_user=self.carol)
+        self.assertEqual(self.feed_titles(), ['De carol'])
+        follow.delete()
+        self.assertEqual(self.feed_titles(), [])
+
+
+class FollowGraphTests(LitRevuTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = make_user('alice')
+        self.bob = make_user('bob')
+        self.carol = make_user('carol')
+
+    def test_sets_are_cached_and_invalidated(self):
+        UserFollows.objects.create(user=self.alice, followed_user=self.bob)
+        self.assertEqual(follow_graph.followed_ids(self.alice.pk), {self.bob.pk})
+        with self.assertNumQueries(0):
+            self.assertEqual(follow_graph.followed_ids(self.alice.pk), {self.bob.pk})
+
+        UserFollows.objects.create(user=self.carol, followed_user=self.bob)
+        self.assertEqual(follow_graph.follower_ids(self.bob.pk), {self.alice.pk, self.carol.pk})
+
+        UserFollows.objects.filter(user=self.alice).delete()
+        self.assertEqual(follow_graph.followed_ids(self.alice.pk), set())
+        self.assertEqual(follow_graph.follower_ids(self.bob.pk), {self.carol.pk})
+
+    def test_add_follow_is_a_single_insert(self):
+        make_ticket(self.bob, title='De bob')
+        self.client.force_login(self.alice)
+        follow_graph.followed_ids(self.alice.pk)  # Ensemble déjà en cache
+
+        response = self.client.post(reverse('aadd_follow'), {'username': 'bob'}, follow=True)
+        self.assertContains(response, 'Vous suivez maintenant bob.')
+        self.assertTrue(UserFollows.objects.filter(user=self.alice, followed_user=self.bob).exists())
+        self.assertIn((TICKET, Ticket.objects.get().pk), set(
+            FeedEntry.objects.filter(owner=self.alice).values_list('kind', 'object_id')))
+
+        response = self.client.post(reverse('aadd_follow'), {'username': 'bob'}, follow=True)
+        self.assertContains(response, 'Vous suivez déjà cet utilisateur.')
+        self.assertEqual(UserFollows.objects.count(), 1)
+
+
+class TicketStatsTests(LitRevuTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = make_user('alice')
+        self.bob = make_user('bob')
+        self.ticket = make_ticket(self.alice)
+
+    def stats(self):
+        stats = TicketStats.objects.get(ticket=self.ticket)
+        return stats.review_count, stats.rating_sum, stats.comment_count
+
+    def test_reviews_and_comments_update_aggregates(self):
+        review = make_review(self.bob, self.ticket)  # Note 3
+        Review.objects.create(user=self.alice, ticket=self.ticket, rating=5, headline='Top')
+        comment = Comment.objects.create(user=self.bob, ticket=self.ticket, body='Commentaire')
+        self.assertEqual(self.stats(), (2, 8, 1))
+        self.assertEqual(TicketStats.objects.get(ticket=self.ticket).average_rating, 4)
+
+        review = Review.objects.get(pk=review.pk)
+        review.rating = 1
+        review.save()
+        self.assertEqual(self.stats(), (2, 6, 1))
+
+        review.delete()
+        comment.delete()
+        self.assertEqual(self.stats(), (1, 5, 0))
+
+    def test_missing_row_is_rebuilt_on_write(self):
+        make_review(self.bob, self.ticket)  # Note 3
+        TicketStats.objects.filter(ticket=self.ticket).delete()
+        with self.assertLogs('reviews.ticket_stats', 'WARNING'):
+            Comment.objects.create(user=self.bob, ticket=self.ticket, body='Commentaire')
+        self.assertEqual(self.stats(), (1, 3, 1))  # La critique antérieure est comptée
+
+    def test_edit_ticket_does_not_overwrite_counters(self):
+        make_review(self.bob, self.ticket)
+        self.client.force_login(self.alice)
+        self.client.post(reverse('edit_ticket', args=[self.ticket.pk]), {'title': 'Nouveau titre', 'description': ''})
+        self.assertEqual(self.stats(), (1, 3, 0))
+
+    def test_recompute_command_reports_and_fixes_drift(self):
+        make_review(self.bob, self.ticket)
+        TicketStats.objects.filter(ticket=self.ticket).update(review_count=7)
+        other = make_ticket(self.bob)
+        TicketStats.objects.filter(ticket=other).delete()
+
+        out = StringIO()
+        call_command('recompute_ticket_stats', stdout=out)
+
+        self.assertIn('2 écart(s)', out.getvalue())
+        self.assertEqual(self.stats(), (1, 3, 0))
+        self.assertTrue(TicketStats.objects.filter(ticket=other).exists())
+
+
+class AsyncViewTests(LitRevuTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = make_user('alice')
+        self.bob = make_user('bob')
+        make_ticket(self.bob, title='De bob')
+        self.async_client.force_login(self.alice)
+
+    async def test_follow_feed_and_unfollow(self):
+        response = await self.async_client.post(reverse('aadd_follow'), {'username': 'bob'})
+        self.assertRedirects(response, reverse('alist_followed_users'), fetch_redirect_response=False)
+
+        response = await self.async_client.get(reverse('afeed'))
+        self.assertContains(response, 'De bob')
+
+        response = await self.async_client.get(reverse('alist_followed_users'))
+        follow = response.context['followed_users'][0]
+        self.assertEqual(follow.followed_user.username, 'bob')
+
+        await self.async_client.post(reverse('aremove_follow', args=[follow.pk]))
+        response = await self.async_client.get(reverse('afeed'))
+        self.assertNotContains(response, 'De bob')
+
+    async def test_unknown_user(self):
+        response = await self.async_client.post(reverse('aadd_follow'), {'username': 'personne'})
+        self.assertContains(response, "Cet utilisateur n&#x27;existe pas.")
+
+
+class SeedAndBenchmarkTests(LitRevuTestCase):
+    def seed(self):
+        call_command('seed_litrevu', users=30, tickets=60, reviews=90, comments=40, follows_per_user=5,
+                     seed=1, batch_size=25, stdout=StringIO())
+
+    def test_seed_creates_consistent_data(self):
+        self.seed()
+        self.assertEqual(CustomUser.objects.count(), 30)
+        self.assertFalse(CustomUser.objects.filter(username_lower='').exists())  # Colonne de recherche renseignée
+        self.assertEqual((Ticket.objects.count(), Review.objects.count(), Comment.objects.count()), (60, 90, 40))
+        self.assertTrue(UserFollows.objects.exists())
+        self.assertFalse(Review.objects.filter(time_created__lt=models.F('ticket__time_created')).exists())
+        call_command('check_feed', stdout=StringIO())  # Lève CommandError si un flux est incohérent
+        self.assertEqual(ticket_stats.recompute(), [])
+
+    def test_bench_feed_writes_json_and_rolls_back(self):
+        self.seed()
+        counts = Ticket.objects.count(), UserFollows.objects.count()
+        with tempfile.TemporaryDirectory() as directory:
+            output = Path(directory) / 'bench.json'
+            call_command('bench_feed', iterations=5, output=str(output), stdout=StringIO())
+            results = json.loads(output.read_text())['results']
+
+        self.assertIn('feed', results)
+        self.assertIn('delete_ticket', results)
+        self.assertLessEqual({'p50_ms', 'p95_ms', 'p99_ms', 'queries_per_request', 'peak_memory_kb'},
+                             set(results['feed']))
+        self.assertEqual((Ticket.objects.count(), UserFollows.objects.count()), counts)
+
+
+class TransferTests(LitRevuTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = make_user('alice')
+        self.bob = make_user('bob')
+        UserFollows.objects.create(user=self.alice, followed_user=self.bob)
+        self.ticket = make_ticket(self.bob, 'Dune', when=timezone.now() - timedelta(days=3))
+        make_review(self.alice, self.ticket)
+        Comment.objects.create(user=self.alice, ticket=self.ticket, body='Bien vu')
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = Path(self.directory.name) / 'export.jsonl'
+
+    def export(self):
+        call_command('export_litrevu', str(self.path), chunk_size=2, stderr=StringIO())
+        return [json.loads(line) for line in self.path.read_text().splitlines()]
+
+    def import_(self, **options):
+        stderr = StringIO()
+        call_command('import_litrevu', str(self.path), stdout=StringIO(), stderr=stderr, **options)
+        return stderr.getvalue()
+
+    def test_export_streams_sections_in_dependency_order(self):
+        records = self.export()
+        self.assertEqual([r['model'] for r in records], ['user', 'user', 'ticket', 'review', 'comment', 'follow'])
+        self.assertEqual(records[2]['user'], 'bob')
+        self.assertEqual(records[5], {'model': 'follow', 'user': 'alice', 'followed_user': 'bob'})
+        self.assertNotIn('is_superuser', records[0])
+
+    def test_round_trip_into_new_ids_with_validation(self):
+        records = self.export()
+        records.append({'model': 'user', 'username': 'carol', 'email': 'carol@example.com'})
+        records.append({'model': 'ticket', 'id': 99, 'user': 'carol', 'title': 'Neuf'})
+        records.append({'model': 'review', 'id': 50, 'ticket': self.ticket.pk, 'user': 'carol',
+                        'rating': 9, 'headline': 'Trop'})  # Note hors de l'intervalle 0-5
+        records.append({'model': 'comment', 'id': 50, 'ticket': 12345, 'user': 'carol', 'body': 'Perdu'})
+        self.path.write_text('\n'.join(json.dumps(r) for r in records) + '\n{pas du json\n')
+
+        errors = self.import_()
+
+        self.assertIn('Ligne 9', errors)  # Note invalide
+        self.assertIn('Ligne 10 : billet inconnu', errors)
+        self.assertIn('Ligne 11 : JSON invalide', errors)
+        self.assertEqual(CustomUser.objects.count(), 3)  # alice et bob sont réutilisés
+        self.assertEqual(Ticket.objects.count(), 3)
+        copy = Ticket.objects.exclude(pk=self.ticket.pk).get(title='Dune')
+        self.assertEqual((copy.user, copy.time_created), (self.bob, self.ticket.time_created))
+        self.assertEqual(Review.objects.filter(ticket=copy, user=self.alice).count(), 1)
+        self.assertEqual(UserFollows.objects.count(), 1)  # Abonnement déjà présent
+        self.assertFalse(CustomUser.objects.get(username='carol').has_usable_password())
+        call_command('check_feed', stdout=StringIO())
+        self.assertEqual(ticket_stats.recompute(), [])
+
+    def test_import_resumes_from_checkpoint(self):
+        self.export()
+        checkpoint = Path(f'{self.path}.checkpoint')
+        original = transfer.Importer.import_chunk
+        calls = []
+
+        def crash_on_third_chunk(importer, records):
+            calls.append(records)
+            if len(calls) == 3:
+                raise RuntimeError('crash')
+            return original(importer, records)
+
+        with mock.patch.object(transfer.Importer, 'import_chunk', crash_on_third_chunk):
+            with self.assertRaises(RuntimeError):
+                self.import_(chunk_size=2)
+        self.assertEqual(json.loads(checkpoint.read_text())['line'], 4)
+        self.assertEqual(Ticket.objects.count(), 2)
+
+        self.import_(chunk_size=2)
+        self.assertFalse(checkpoint.exists())
+        self.assertEqual((Ticket.objects.count(), Review.objects.count(), Comment.objects.count()), (2, 2, 2))
+
+
+    def test_live_writes_during_import_keep_out_of_reserved_ids(self):
+        records = self.export()
+        original = transfer.Importer.import_chunk
+
+        def with_live_write(importer, chunk):
+            make_ticket(self.alice, title='Pendant')  # Écriture concurrente, entre deux lots
+            return original(importer, chunk)
+
+        with mock.patch.object(transfer.Importer, 'import_chunk', with_live_write):
+            self.import_(chunk_size=2)
+        copy = Ticket.objects.exclude(pk=self.ticket.pk).get(title='Dune')
+        self.assertEqual(copy.time_created, self.ticket.time_created)  # Date d'origine, sans modifier le champ
+        self.assertEqual(Review.objects.filter(ticket=copy).count(), 1)
+        self.assertEqual(Comment.objects.filter(ticket=copy).count(), 1)
+        self.assertEqual(Ticket.objects.filter(title='Pendant').count(), 3)
+
+        importer = transfer.Importer(transfer.reserve_offsets(transfer.max_source_ids(json.dumps(r) for r in records)))
+        lines = list(enumerate(records, 1))
+        self.assertEqual(importer.import_chunk(lines)[0], {'user': 0, 'ticket': 1, 'review': 1, 'comment': 1, 'follow': 0})
+        self.assertEqual(importer.import_chunk(lines)[0], {'user': 0, 'ticket': 0, 'review': 0, 'comment': 0, 'follow': 0})  # Lot rejoué
+
+    def test_archived_threads_round_trip(self):
+        archive.archive_old_posts(days=0)
+        records = self.export()
+        self.assertEqual([r['model'] for r in records],
+                         ['user', 'user', 'archived_ticket', 'archived_review', 'archived_comment', 'follow'])
+        self.assertEqual((records[2]['id'], records[2]['review_count']), (self.ticket.pk, 1))
+
+        make_ticket(self.alice, 'Vivant')  # Même plage d'identifiants que les billets archivés
+        self.import_()
+        copy = ArchivedTicket.objects.exclude(pk=self.ticket.pk).get()
+        self.assertGreater(copy.pk, Ticket.objects.get(title='Vivant').pk)
+        self.assertEqual((copy.title, copy.user, copy.time_created, copy.comment_count),
+                         ('Dune', self.bob, self.ticket.time_created, 1))
+        self.assertEqual(ArchivedReview.objects.filter(ticket=copy, user=self.alice).count(), 1)
+        self.assertEqual(ArchivedComment.objects.get(ticket=copy).body, 'Bien vu')
+        self.assertFalse(Ticket.objects.filter(title='Dune').exists())
+
+
+class FeedApiTests(LitRevuTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = make_user('alice')
+        self.bob = make_user('bob')
+        UserFollows.objects.create(user=self.alice, followed_user=self.bob)
+        now = timezone.now()
+        self.tickets = [make_ticket(self.bob, f'Billet {i}', when=now - timedelta(minutes=i)) for i in range(5)]
+        self.review = make_review(self.alice, self.tickets[0], when=now + timedelta(minutes=1))
+        timeline.rebuild(self.alice.pk)  # Les dates ont été forcées après le fan-out
+        self.client.force_login(self.alice)
+        self.url = reverse('feed_json')
+
+    def get(self, **params):
+        response = self.client.get(self.url, params)
+        body = b''.join(response.streaming_content) if response.status_code == 200 else b''
+        return response, json.loads(body) if body else None
+
+    def test_streams_feed_pages(self):
+        response, data = self.get(limit=4)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual([post['type'] for post in data['posts']], ['review', 'ticket', 'ticket', 'ticket'])
+        self.assertEqual(data['posts'][0]['ticket'], {'id': self.tickets[0].pk, 'title': 'Billet 0', 'user': 'bob'})
+        self.assertEqual(data['posts'][1]['review_count'], 1)
+
+        _, data = self.get(limit=4, cursor=data['next_cursor'])
+        self.assertEqual([post['id'] for post in data['posts']], [t.pk for t in self.tickets[3:]])
+        self.assertIsNone(data['next_cursor'])
+        self.assertEqual(self.client.get(self.url, {'limit': 0}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'cursor': 'xx'}).status_code, 400)
+
+    def test_conditional_get_returns_304_without_loading_posts(self):
+        response, _ = self.get()
+        etag = response['ETag']
+        self.assertIn('Last-Modified', response)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse([q for q in queries if 'reviews_ticket' in q['sql'] or 'reviews_review' in q['sql']])
+
+        self.tickets[4].title = 'Modifié'
+        self.tickets[4].save()  # Une modification change l'ETag, même sans nouveau post
+        response, _ = self.get()
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+
+class SearchTests(LitRevuTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = make_user('alice')
+        self.bob = make_user('bob')
+        self.carol = make_user('carol')
+        UserFollows.objects.create(user=self.alice, followed_user=self.bob)
+        self.ticket = Ticket.objects.create(user=self.bob, title='Dune', description='Un roman de science-fiction')
+        self.review = Review.objects.create(user=self.bob, ticket=self.ticket, rating=5, headline='Épique',
+                                            body='Une épopée <b>désertique</b> inoubliable')
+        self.hidden = Ticket.objects.create(user=self.carol, title='Désert', description='Roman caché')
+
+    def found(self, query, user=None):
+        results, _ = search.search(user or self.alice, query)
+        return [(result.search_kind, result.pk) for result in results]
+
+    def test_index_follows_writes_and_visibility(self):
+        self.assertEqual(self.found('roman'), [('TICKET', self.ticket.pk)])  # Le billet de carol n'est pas visible
+        self.assertEqual(self.found('desertique'), [('REVIEW', self.review.pk)])  # Accents ignorés
+        self.assertEqual(self.found('épo'), [('REVIEW', self.review.pk)])  # Dernier mot en préfixe
+        comment = Comment.objects.create(user=self.alice, ticket=self.ticket, body='Quel roman !')
+        self.assertEqual(len(self.found('roman')), 2)
+
+        self.ticket.description = 'Space opera'
+        self.ticket.save()
+        self.assertEqual(self.found('roman'), [('COMMENT', comment.pk)])
+        self.ticket.delete()  # Supprime aussi critique et commentaire
+        self.assertEqual(self.found('roman'), [])
+        self.assertEqual(self.found('"roman" OR NEAR('), [])  # Syntaxe FTS5 neutralisée
+
+    def test_candidate_window_is_per_kind(self):
+        comments = [Comment.objects.create(user=self.alice, ticket=self.ticket, body=f'Roman {i}') for i in range(3)]
+        with mock.patch.object(search, 'SEARCH_MAX_CANDIDATES', 2):
+            found = self.found('roman')
+        # Les commentaires, plus nombreux, n'évincent pas le billet : deux candidats par type
+        self.assertEqual(sorted(found), sorted([('TICKET', self.ticket.pk), *(('COMMENT', c.pk) for c in comments[1:])]))
+
+    def test_snippet_is_escaped_and_highlighted(self):
+        [result], _ = search.search(self.alice, 'désertique')
+        self.assertIn('&lt;b&gt;<mark>désertique</mark>&lt;/b&gt;', result.snippet)
+
+    def test_view_paginates_and_like_fallback_agrees(self):
+        for i in range(search.SEARCH_PAGE_SIZE):
+            Ticket.objects.create(user=self.alice, title=f'Roman {i}')
+        self.client.force_login(self.alice)
+        response = self.client.get(reverse('search'), {'q': 'roman'})
+        self.assertEqual(len(response.context['results']), search.SEARCH_PAGE_SIZE)
+        self.assertTrue(response.context['has_next'])
+        response = self.client.get(reverse('search'), {'q': 'roman', 'page': 2})
+        self.assertEqual(len(response.context['results']), 1)
+        self.assertFalse(response.context['has_next'])
+        fts = {(row['kind'], row['object_id']) for row in search.fts_search(self.alice, 'roman')}
+        like = {(row['kind'], row['object_id']) for row in search.like_search(self.alice, 'roman')}
+        self.assertEqual(fts, like)
+
+    def test_rebuild_command(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {search.SEARCH_TABLE}')
+        self.assertEqual(self.found('roman'), [])
+        call_command('rebuild_search', stdout=StringIO())
+        self.assertEqual(self.found('roman'), [('TICKET', self.ticket.pk)])
+
+        deleted = Ticket.objects.create(user=self.bob, title='Roman supprimé')
+        Ticket.objects.filter(pk=deleted.pk).update(deleted_at=timezone.now())  # En attente de purge
+        self.assertEqual(search.rebuild(), 3)  # Le billet supprimé n'est pas réindexé
+        self.assertEqual(self.found('roman'), [('TICKET', self.ticket.pk)])
+
+
+class DatabaseRoutingTests(LitRevuTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = make_user('alice')
+        self.factory = RequestFactory()
+
+    def test_production_options(self):
+        options = sqlite_database('db.sqlite3')['OPTIONS']
+        self.assertEqual(options['transaction_mode'], 'IMMEDIATE')
+        self.assertIn('PRAGMA journal_mode = WAL', options['init_command'])
+        self.assertNotIn('query_only', options['init_command'])
+        self.assertIn('PRAGMA query_only = ON', sqlite_database('replica.sqlite3', read_only=True)['OPTIONS']['init_command'])
+
+    def test_reads_go_to_replica_unless_sticky(self):
+        @db_routing.read_from_replica
+        def view(request):
+            return HttpResponse(router.db_for_read(Ticket) or 'default')
+
+        router_ = db_routing.PrimaryReplicaRouter()
+        self.assertIsNone(router_.db_for_read(Ticket))  # Hors des vues décorées : base principale
+        self.assertEqual(view(self.factory.get('/')).content, b'default')  # Pas de réplique configurée
+        with mock.patch.object(db_routing, 'replica_configured', return_value=True):
+            self.assertEqual(view(self.factory.get('/')).content, b'replica')
+            request = self.factory.get('/')
+            request.COOKIES[db_routing.STICKY_COOKIE] = str(time.time() + 60)
+            self.assertEqual(view(request).content, b'default')
+        self.assertEqual(router_.db_for_write(Ticket), 'default')
+        self.assertFalse(router_.allow_migrate('replica', 'reviews'))
+
+    def test_post_sets_sticky_cookie(self):
+        self.client.force_login(self.alice)
+        response = self.client.post(reverse('add_ticket'), {'title': 'Dune', 'description': ''})
+        self.assertNotIn(db_routing.STICKY_COOKIE, response.cookies)
+        with mock.patch.object(db_routing, 'replica_configured', return_value=True):
+            response = self.client.post(reverse('add_ticket'), {'title': 'Dune', 'description': ''})
+            request = self.factory.get('/')
+            request.COOKIES[db_routing.STICKY_COOKIE] = response.cookies[db_routing.STICKY_COOKIE].value
+            self.assertTrue(db_routing.is_sticky(request))
+
+    def test_cached_pages_are_built_on_primary(self):
+        @db_routing.read_from_replica
+        def view(request):
+            built = feed_cache.get_or_build_page(self.alice, None, lambda: router.db_for_read(Ticket) or 'default')
+            return HttpResponse(f'{router.db_for_read(Ticket)} {built}')
+
+        with mock.patch.object(db_routing, 'replica_configured', return_value=True):
+            self.assertEqual(view(self.factory.get('/')).content, b'replica default')  # Page du cache : base principale
+
+    async def test_stickiness_middleware_is_async_capable(self):
+        async def get_response(request):
+            return HttpResponse()
+        middleware = db_routing.ReplicaStickinessMiddleware(get_response)
+        self.assertTrue(iscoroutinefunction(middleware))
+        with mock.patch.object(db_routing, 'replica_configured', return_value=True):
+            response = await middleware(self.factory.post('/'))
+        self.assertIn(db_routing.STICKY_COOKIE, response.cookies)
+
+    def test_sync_replica_copies_database(self):
+        with tempfile.TemporaryDirectory() as directory:
+            primary, replica = Path(directory) / 'primary.sqlite3', Path(directory) / 'replica.sqlite3'
+            with closing(sqlite3.connect(primary)) as db:
+                db.execute('CREATE TABLE t (x)')
+                db.execute('INSERT INTO t VALUES (1)')
+                db.commit()
+            db_routing.sync_replica(primary, replica)
+            with closing(sqlite3.connect(replica)) as db:
+                self.assertEqual(db.execute('SELECT x FROM t').fetchall(), [(1,)])
+
+
+class ProfilingTests(LitRevuTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = make_user('alice')
+        self.client.force_login(self.alice)
+        profiling.clear()
+
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('feed'))
+        timing = response['Server-Timing']
+        self.assertRegex(timing, r'sql;dur=[\d.]+;desc="\d+ requêtes"')
+        self.assertRegex(timing, r'tpl;dur=[\d.]+')
+        self.assertRegex(timing, r'view;dur=[\d.]+')
+        self.assertNotIn('mem;', timing)
+        with mock.patch.object(profiling, 'MEMORY_SAMPLE_RATE', 1):
+            self.assertIn('mem;desc="alloc', self.client.get(reverse('feed'))['Server-Timing'])
+
+    async def test_async_chain_is_not_adapted(self):
+        async def get_response(request):
+            return HttpResponse()
+        self.assertTrue(iscoroutinefunction(profiling.ProfilingMiddleware(get_response)))  # Pas de passage par un thread
+
+        await self.async_client.aforce_login(self.alice)
+        response = await self.async_client.get(reverse('afeed'))
+        sql_count = int(re.search(r'desc="(\d+) requêtes"', response['Server-Timing']).group(1))
+        self.assertGreater(sql_count, 0)  # Requêtes exécutées dans les threads de sync_to_async
+
+    def test_slow_requests_are_logged(self):
+        with tempfile.TemporaryDirectory() as directory:
+            log = Path(directory) / 'slow.jsonl'
+            with mock.patch.object(profiling, 'SLOW_LOG', log), mock.patch.object(profiling, 'SLOW_MS', 0):
+                self.client.get(reverse('list_followed_users'))
+            [entry] = [json.loads(line) for line in log.read_text().splitlines()]
+        self.assertEqual(entry['view'], 'list_followed_users')
+        self.assertEqual(entry['status'], 200)
+        self.assertEqual(len(entry['slowest_sql']), min(entry['sql_count'], profiling.SLOWEST_SQL))
+        self.assertIn('SELECT', entry['slowest_sql'][0]['sql'])
+
+    def test_report_is_staff_only(self):
+        for _ in range(3):
+            self.client.get(reverse('feed'))
+        self.assertEqual(self.client.get(reverse('profiling_report')).status_code, 302)
+        self.alice.is_staff = True
+        self.alice.save()
+        response = self.client.get(reverse('profiling_report'))
+        [stat] = [stat for stat in response.context['stats'] if stat['view'] == 'feed']
+        self.assertEqual(stat['requests'], 3)
+        self.assertGreater(stat['p95_ms'], 0)
+
+
+class FragmentCacheTests(LitRevuTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = make_user('alice')
+        self.ticket = make_ticket(self.alice, title='Dune')
+        self.review = make_review(self.alice, self.ticket, headline='Épique')
+        self.client.force_login(self.alice)
+
+    def get_feed(self):
+        with mock.patch.object(fragments, 'render_post', wraps=fragments.render_post) as render_post:
+            response = self.client.get(reverse('feed'))
+        return response, render_post.call_count
+
+    def test_fragments_are_rendered_once(self):
+        response, rendered = self.get_feed()
+        self.assertEqual(rendered, 2)
+        self.assertContains(response, 'Épique')
+        response, rendered = self.get_feed()
+        self.assertEqual(rendered, 0)
+        self.assertContains(response, 'Épique')
+
+    def test_edit_changes_key(self):
+        self.get_feed()
+        self.client.post(reverse('edit_ticket', args=[self.ticket.pk]), {'title': 'Dune II', 'description': ''})
+        response, rendered = self.get_feed()
+        self.assertEqual(rendered, 2)  # La critique affiche le titre du billet : son fragment change aussi
+        self.assertContains(response, 'Dune II', count=2)
+
+    def test_rename_changes_key(self):
+        bob = make_user('bob')
+        UserFollows.objects.create(user=bob, followed_user=self.alice)
+        self.client.force_login(bob)
+        self.get_feed()
+        self.alice.username = 'alicia'
+        self.alice.save()
+        response, rendered = self.get_feed()
+        self.assertEqual(rendered, 2)  # Billet et critique affichent le nom de l'auteur
+        self.assertContains(response, 'Posté par : alicia', count=2)
+        self.assertNotContains(response, 'Posté par : alice<')
+
+    def test_stats_stay_outside_fragment(self):
+        self.get_feed()
+        make_review(make_user('bob'), self.ticket)
+        response, rendered = self.get_feed()
+        self.assertEqual(rendered, 1)  # Seule la nouvelle critique (réponse au billet d'alice) est rendue
+        self.assertContains(response, '2 critiques')
+
+
+class CommentThreadTests(LitRevuTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = make_user('alice')
+        self.bob = make_user('bob')
+        self.ticket = make_ticket(self.alice, title='Dune')
+        self.other = make_ticket(self.alice, title='Solaris')
+        start = timezone.now() - timedelta(hours=1)
+        self.comments = []
+        for i in range(7):
+            comment = Comment.objects.create(user=self.bob if i % 2 else self.alice, ticket=self.ticket, body=f'C{i}')
+            Comment.objects.filter(pk=comment.pk).update(time_created=start + timedelta(minutes=i // 2))  # Ex aequo
+            self.comments.append(comment)
+        self.client.force_login(self.alice)
+
+    def test_thread_pages_cover_all_comments_once(self):
+        bodies, cursor = [], None
+        while True:
+            thread, cursor = comments.get_thread_page(self.ticket.pk, cursor and comments.decode_cursor(cursor), 3)
+            bodies += [comment.body for comment in thread]
+            if cursor is None:
+                break
+        self.assertEqual(bodies, ['C6', 'C5', 'C4', 'C3', 'C2', 'C1', 'C0'])  # Du plus récent au plus ancien, puis par id
+
+    def test_previews_in_one_query(self):
+        with self.assertNumQueries(1):
+            previews = comments.get_previews([self.ticket.pk, self.other.pk], size=2)
+            names = [comment.user.username for comment in previews[self.ticket.pk]]  # Auteurs déjà chargés
+        self.assertEqual([comment.body for comment in previews[self.ticket.pk]], ['C6', 'C5'])
+        self.assertEqual(names, ['alice', 'bob'])
+        self.assertEqual(previews[self.other.pk], [])
+
+    def test_views(self):
+        response = self.client.get(reverse('feed'))
+        [ticket] = [post for post in response.context['posts'] if post.pk == self.ticket.pk]
+        self.assertEqual(len(ticket.comment_preview), comments.COMMENT_PREVIEW_SIZE)
+        self.assertContains(response, reverse('comment_thread', args=[self.ticket.pk]))
+
+        response = self.client.get(reverse('comment_thread', args=[self.ticket.pk]), {'partial': 1})
+        self.assertTemplateNotUsed(response, 'base.html')
+        self.assertEqual(len(response.context['comments']), 7)
+        self.assertEqual(self.client.get(reverse('comment_thread', args=[self.ticket.pk]), {'cursor': '!'}).status_code, 400)
+
+        self.client.post(reverse('add_comment', args=[self.other.pk]), {'body': 'Premier'})
+        self.assertEqual(Comment.objects.get(ticket=self.other).body, 'Premier')
+
+
+calls = []
+
+
+@tasks.task
+def flaky_task(failures):
+    """Tâche de test : échoue `failures` fois puis réussit."""
+    calls.append(failures)
+    if len(calls) <= failures:
+        raise RuntimeError('échec volontaire')
+
+
+@override_settings(TASKS_EAGER=False)
+class TaskTests(LitRevuTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = make_user('alice')
+        self.bob = make_user('bob')
+        UserFollows.objects.create(user=self.alice, followed_user=self.bob)
+        tasks.run_pending()  # Historique de l'abonnement
+        calls.clear()
+
+    def make_due(self):
+        Task.objects.filter(status=Task.PENDING).update(run_after=timezone.now())
+
+    def test_fan_out_runs_in_background(self):
+        self.client.force_login(self.bob)
+        self.client.post(reverse('add_ticket'), {'title': 'Dune', 'description': ''})
+        ticket = Ticket.objects.get(title='Dune')
+        entries = FeedEntry.objects.filter(kind=FeedEntry.TICKET, object_id=ticket.pk)
+        self.assertEqual(set(entries.values_list('owner_id', flat=True)), {self.bob.pk})  # Seul l'auteur, dans la requête
+        self.assertEqual(Task.objects.filter(status=Task.PENDING).count(), 2)  # Fan-out et index de recherche
+        self.assertEqual(tasks.run_pending(), 2)
+        self.assertEqual(set(entries.values_list('owner_id', flat=True)), {self.alice.pk, self.bob.pk})
+        self.assertEqual(search.search(self.alice, 'dune')[0][0].pk, ticket.pk)
+
+    def test_retries_then_fails(self):
+        tasks.enqueue(flaky_task, 1)
+        tasks.run_pending()
+        queued = Task.objects.get(name=flaky_task.task_name)
+        self.assertEqual((queued.status, queued.attempts), (Task.PENDING, 1))
+        self.assertGreater(queued.run_after, timezone.now())  # Nouvel essai différé
+        self.assertIn('échec volontaire', queued.last_error)
+        self.make_due()
+        tasks.run_pending()
+        self.assertEqual(Task.objects.get(pk=queued.pk).status, Task.DONE)
+
+        tasks.enqueue(flaky_task, 10, max_attempts=2)
+        for _ in range(3):
+            self.make_due()
+            tasks.run_pending()
+        self.assertEqual(Task.objects.filter(status=Task.FAILED).count(), 1)
+        with self.assertRaises(LookupError):
+            tasks.resolve('reviews.tests.make_user')  # Seules les fonctions @task sont exécutables
+
+    def test_metrics_and_command(self):
+        tasks.enqueue(flaky_task, 0)
+        out = StringIO()
+        call_command('run_tasks', '--stats', stdout=out)
+        self.assertIn('1 en attente', out.getvalue())
+        tasks.run_pending()  # Le worker de run_tasks exécute les tâches dans d'autres threads, hors de la transaction du test
+        stats = tasks.metrics()
+        self.assertEqual((stats['pending'], stats['done']), (0, Task.objects.filter(status=Task.DONE).count()))
+        self.assertEqual(stats['done_in_window'], stats['done'])
+
+
+@override_settings(TASKS_EAGER=False)
+class SoftDeleteTests(LitRevuTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = make_user('alice')
+        self.bob = make_user('bob')
+        UserFollows.objects.create(user=self.alice, followed_user=self.bob)
+        self.ticket = Ticket.objects.create(user=self.bob, title='Dune')
+        self.review = Review.objects.create(user=self.alice, ticket=self.ticket, rating=4, headline='Épique')
+        Comment.objects.create(user=self.alice, ticket=self.ticket, body='Quel roman !')
+        self.own = Ticket.objects.create(user=self.alice, title='Fondation')
+        Review.objects.create(user=self.bob, ticket=self.own, rating=2, headline='Bof')
+        tasks.run_pending()  # Fan-out et index de recherche
+
+    def posts(self, user):
+        return [(post.content_type, post.pk) for post in get_feed_page(user)[0]]
+
+    def test_deleted_ticket_is_hidden_then_purged(self):
+        self.client.force_login(self.bob)
+        self.client.post(reverse('delete_ticket', args=[self.ticket.pk]))
+        self.assertNotIn((TICKET, self.ticket.pk), self.posts(self.alice))
+        self.assertNotIn((REVIEW, self.review.pk), self.posts(self.alice))
+        self.assertEqual(search.search(self.alice, 'dune')[0], [])
+        self.assertNotIn(self.ticket, get_users_viewable_tickets(self.alice))
+        self.assertTrue(Ticket.all_objects.filter(pk=self.ticket.pk).exists())  # En attente de purge
+        self.assertEqual(self.client.post(reverse('delete_ticket', args=[self.ticket.pk])).status_code, 404)
+
+        tasks.run_pending()
+        self.assertFalse(Ticket.all_objects.filter(pk=self.ticket.pk).exists())
+        self.assertFalse(Review.all_objects.filter(ticket_id=self.ticket.pk).exists())
+        self.assertFalse(Comment.all_objects.filter(ticket_id=self.ticket.pk).exists())
+        self.assertFalse(TicketStats.objects.filter(ticket_id=self.ticket.pk).exists())
+        self.assertFalse(FeedEntry.objects.filter(object_id__in=[self.ticket.pk, self.review.pk]).exists())
+
+    def test_deleted_user_is_hidden_and_stats_refreshed(self):
+        purge.soft_delete_user(self.bob)
+        self.bob.refresh_from_db()
+        self.assertFalse(self.bob.is_active)
+        self.assertEqual(self.posts(self.alice), [(TICKET, self.own.pk)])  # Plus de billet de bob, ni sa critique
+        # Entrées retirées sans attendre la purge : ni les posts de bob, ni la critique d'alice sur son billet
+        self.assertFalse(FeedEntry.objects.filter(author=self.bob).exists())
+        self.assertFalse(FeedEntry.objects.filter(kind=FeedEntry.REVIEW, object_id=self.review.pk).exists())
+        self.assertEqual(TicketStats.objects.get(ticket=self.own).review_count, 0)
+        self.assertFalse(UserFollows.objects.exists())
+        self.client.force_login(self.alice)
+        response = self.client.post(reverse('aadd_follow'), {'username': 'bob'}, follow=True)
+        self.assertContains(response, "Cet utilisateur n&#x27;existe pas.")
+
+    def test_purge_command_in_chunks(self):
+        purge.soft_delete_user(self.bob)
+        out = StringIO()
+        call_command('purge_deleted', '--chunk-size', '1', stdout=out)
+        self.assertIn('commentaires : 1', out.getvalue())  # Progression après chaque lot
+        self.assertIn('critiques : 2', out.getvalue())
+        self.assertIn('Purge terminée : 1 commentaires, 2 critiques, 1 billets, 1 comptes', out.getvalue())
+        self.assertFalse(CustomUser.objects.filter(username='bob').exists())
+        self.assertEqual(list(Review.all_objects.all()), [])
+        self.assertEqual(set(FeedEntry.objects.values_list('author_id', flat=True)), {self.alice.pk})
+
+    def test_purge_reads_dependent_rows_in_chunks(self):
+        purge.soft_delete_user(self.bob)
+        for body in ('Pendant', 'la', 'suppression'):  # Ajoutés après le marquage : purgés avec le billet
+            Comment.all_objects.create(user=self.alice, ticket=self.ticket, body=body)
+        with mock.patch.object(purge, '_purge_comments', wraps=purge._purge_comments) as purge_comments:
+            purge.purge_deleted(chunk_size=1)
+        self.assertTrue(all(len(ids) == 1 for (ids,), _ in purge_comments.call_args_list))
+        self.assertEqual(purge_comments.call_count, 4)
+        self.assertFalse(Comment.all_objects.exists())
+
+    def test_purge_commits_dependent_batches_separately(self):
+        UserFollows.objects.create(user=self.bob, followed_user=self.alice)
+        for i in range(5):
+            Ticket.objects.create(user=self.alice, title=f'Billet {i}')
+        tasks.run_pending()  # Flux de bob : 6 billets d'alice et sa critique, plus que chunk_size
+        entries = FeedEntry.objects.filter(owner=self.bob).count()
+        self.assertGreater(entries, 2)
+        purge.soft_delete_user(self.bob)
+        blocks = []  # Lignes supprimées par transaction
+        atomic, raw_delete = transaction.atomic, purge._raw_delete
+
+        @contextmanager
+        def counted_atomic(*args, **kwargs):
+            blocks.append(0)
+            with atomic(*args, **kwargs):
+                yield
+
+        def counted_delete(queryset):
+            deleted = raw_delete(queryset)
+            blocks[-1] += deleted
+            return deleted
+
+        with mock.patch.object(purge.transaction, 'atomic', counted_atomic), \
+                mock.patch.object(purge, '_raw_delete', counted_delete):
+            purge.purge_deleted(chunk_size=2)
+        self.assertFalse(CustomUser.objects.filter(username='bob').exists())
+        self.assertFalse(FeedEntry.objects.filter(owner_id=self.bob.pk).exists())
+        self.assertLessEqual(max(blocks), 2)  # Au plus chunk_size lignes par transaction
+        self.assertGreaterEqual(len(blocks), entries // 2 + 1)  # Flux de bob en plusieurs lots, puis le compte
+
+    def test_admin_delete_is_soft(self):
+        self.client.force_login(CustomUser.objects.create_superuser('admin', 'admin@example.com', 'secret'))
+        url = reverse('admin:reviews_ticket_delete', args=[self.ticket.pk])
+        self.assertContains(self.client.get(url), 'Dune')
+        self.client.post(url, {'post': 'yes'})
+        self.assertIsNotNone(Ticket.all_objects.get(pk=self.ticket.pk).deleted_at)
+
+
+class UserSearchTests(LitRevuTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = make_user('alice')
+        self.bob = make_user('Bob')
+        self.bobby = make_user('bobby')
+        make_user('bp')  # Juste après le préfixe « bo » : hors de l'intervalle parcouru
+        UserFollows.objects.create(user=self.alice, followed_user=self.bobby)
+        self.client.force_login(self.alice)
+
+    def test_add_follow_ignores_case_and_reports_unknown_users(self):
+        response = self.client.post(reverse('add_follow'), {'username': 'bobb'}, follow=True)  # Faute de frappe
+        self.assertContains(response, "Cet utilisateur n&#x27;existe pas.")
+        self.client.post(reverse('add_follow'), {'username': ' BOB '})
+        self.assertTrue(UserFollows.objects.filter(user=self.alice, followed_user=self.bob).exists())
+        make_user('bob')  # Même nom à la casse près : la casse exacte départage
+        self.assertEqual(user_search.find_user('Bob'), self.bob)
+        self.assertIsNone(user_search.find_user('BOB'))
+
+    def test_suggestions_exclude_self_and_followed_users(self):
+        response = self.client.get(reverse('user_search'), {'q': 'BO'})
+        self.assertEqual(response.json(), {'results': ['Bob']})
+        self.assertEqual(user_search.suggest(self.bob, 'b'), ['bobby', 'bp'])
+        self.assertEqual(user_search.suggest(self.alice, ''), [])
+        self.bob.username = 'Robert'
+        self.bob.save(update_fields=['username'])
+        self.assertEqual(CustomUser.objects.get(pk=self.bob.pk).username_lower, 'robert')
+
+    def test_candidates_cached_and_completed_from_index(self):
+        with self.assertNumQueries(2):  # Abonnements et candidats du préfixe
+            user_search.suggest(self.alice, 'b')
+        with self.assertNumQueries(0):
+            self.assertEqual(user_search.suggest(self.alice, 'b'), ['Bob', 'bp'])
+        with mock.patch.object(user_search, 'USER_SEARCH_CANDIDATES', 1):
+            cache.clear()
+            self.assertEqual(user_search.suggest(self.alice, 'bob'), ['Bob'])  # Candidat non suivi trouvé en cache
+            self.assertEqual(user_search.suggest(self.bob, 'bo'), ['bobby'])  # Seul candidat exclu : suite lue dans l'index
+
+
+class RecommendationTests(LitRevuTestCase):
+    def setUp(self):
+        super().setUp()
+        self.users = {name: make_user(name) for name in ('alice', 'bob', 'carol', 'dave', 'eve', 'frank')}
+        for user, followed in [('alice', 'bob'), ('alice', 'carol'), ('bob', 'carol'), ('bob', 'dave'), ('bob', 'eve'),
+                               ('bob', 'frank'), ('carol', 'dave'), ('carol', 'alice')]:
+            UserFollows.objects.create(user=self.users[user], followed_user=self.users[followed])
+        make_ticket(self.users['eve'])  # Activité récente
+        CustomUser.objects.filter(username='frank').update(is_active=False)
+
+    def suggested(self, name):
+        return [(suggestion.suggested.username, suggestion.mutual_count)
+                for suggestion in FollowSuggestion.objects.filter(user=self.users[name]).order_by('rank')]
+
+    def test_full_refresh_scores_mutual_follows_and_activity(self):
+        self.assertEqual(recommendations.refresh(full=True), 5)  # Tous les comptes actifs
+        self.assertEqual(self.suggested('alice'), [('dave', 2), ('eve', 1)])  # Ni elle-même, ni suivis, ni inactifs
+        self.assertGreater(FollowSuggestion.objects.get(user=self.users['alice'], suggested=self.users['eve']).score, 1)
+        self.assertFalse(StaleSuggestions.objects.exists())
+        if recommendations.np is not None:  # Le calcul en Python pur donne les mêmes suggestions
+            expected = list(FollowSuggestion.objects.order_by('user_id', 'rank').values_list('user_id', 'suggested_id', 'score'))
+            with mock.patch.object(recommendations, 'np', None):
+                recommendations.refresh(full=True)
+            self.assertEqual(list(FollowSuggestion.objects.order_by('user_id', 'rank')
+                                  .values_list('user_id', 'suggested_id', 'score')), expected)
+
+    def test_incremental_refresh_covers_changed_users_and_their_followers(self):
+        recommendations.refresh(full=True)
+        UserFollows.objects.create(user=self.users['alice'], followed_user=self.users['dave'])
+        self.assertEqual(list(StaleSuggestions.objects.values_list('user_id', flat=True)), [self.users['alice'].pk])
+        with self.assertNumQueries(13):  # Indépendant du nombre de comptes : sous-graphe des deux niveaux
+            self.assertEqual(recommendations.refresh(), 2)  # alice et son abonnée carol
+        self.assertEqual(self.suggested('alice'), [('eve', 1)])
+        self.assertFalse(StaleSuggestions.objects.exists())
+
+    def test_followed_users_page_lists_suggestions(self):
+        call_command('compute_suggestions', '--full', stdout=StringIO())
+        self.client.force_login(self.users['alice'])
+        response = self.client.get(reverse('list_followed_users'))
+        self.assertEqual([s.suggested.username for s in response.context['suggestions']], ['dave', 'eve'])
+        self.client.post(reverse('add_follow'), {'username': 'dave'})
+        response = self.client.get(reverse('list_followed_users'))  # Suivi depuis le calcul : retiré de la liste
+        self.assertEqual([s.suggested.username for s in response.context['suggestions']], ['eve'])
+
+
+class AdminTests(LitRevuTestCase):
+    """Listes de l'administration sur un jeu de données généré : requêtes bornées, sans COUNT(*) complet."""
+
+    def setUp(self):
+        super().setUp()
+        call_command('seed_litrevu', users=30, tickets=60, reviews=90, comments=40, follows_per_user=5,
+                     seed=1, batch_size=25, stdout=StringIO())
+        self.admin = CustomUser.objects.create_superuser('admin', 'admin@example.com', 'secret')
+        self.client.force_login(self.admin)
+
+    def test_changelists_have_bounded_queries_and_estimated_counts(self):
+        for model in ('customuser', 'ticket', 'review', 'comment', 'userfollows'):
+            url = reverse(f'admin:reviews_{model}_changelist')
+            with self.subTest(model=model), CaptureQueriesContext(connection) as ctx:
+                started = time.perf_counter()
+                self.assertEqual(self.client.get(url).status_code, 200)
+                self.assertLess(time.perf_counter() - started, 2)
+                self.assertLessEqual(len(ctx.captured_queries), 12)  # Pas une requête par auteur ou par billet affiché
+                counts = [query['sql'] for query in ctx.captured_queries if 'COUNT(' in query['sql']]
+                self.assertTrue(all('LIMIT' in sql for sql in counts), counts)  # Compte borné, jamais toute la table
+        with mock.patch.object(litrevu_admin, 'ADMIN_COUNT_LIMIT', 10):
+            response = self.client.get(reverse('admin:reviews_ticket_changelist'))
+        self.assertEqual(response.context['cl'].result_count, 60)  # Estimé par l'écart des identifiants
+
+    def test_date_hierarchy_reads_periods_from_index(self):
+        Ticket.objects.update(time_created=timezone.make_aware(datetime(2025, 7, 14, 12)))
+        Ticket.objects.filter(pk=Ticket.objects.first().pk).update(
+            time_created=timezone.make_aware(datetime(2023, 3, 2, 8)))
+        request = RequestFactory().get('/')
+        request.user = self.admin
+        tickets = litrevu_admin.TicketAdmin(Ticket, litrevu_admin.admin.site).get_queryset(request)
+        with self.assertNumQueries(3):  # Deux bornes, puis un EXISTS par année dans une seule requête
+            self.assertEqual([year.year for year in tickets.datetimes('time_created', 'year')], [2023, 2025])
+        self.assertEqual([month.month for month in tickets.filter(time_created__year=2025).datetimes('time_created', 'month')],
+                         [7])
+        response = self.client.get(reverse('admin:reviews_ticket_changelist'))
+        self.assertContains(response, '?time_created__year=2023')
+
+    def test_foreign_keys_use_autocomplete(self):
+        response = self.client.get(reverse('admin:reviews_review_add'))
+        self.assertNotContains(response, CustomUser.objects.exclude(pk=self.admin.pk).first().username)  # Pas de liste des comptes
+        self.assertContains(response, 'admin-autocomplete')
+        Ticket.objects.create(user=self.admin, title='Dune')
+        autocomplete = reverse('admin:autocomplete')
+        results = self.client.get(autocomplete, {'app_label': 'reviews', 'model_name': 'review', 'field_name': 'ticket',
+                                                 'term': 'dun'}).json()['results']
+        self.assertEqual([result['text'] for result in results], ['Dune'])  # Index plein texte
+        results = self.client.get(autocomplete, {'app_label': 'reviews', 'model_name': 'review', 'field_name': 'user',
+                                                 'term': 'ADM'}).json()['results']
+        self.assertEqual([result['text'] for result in results], ['admin'])  # Préfixe de username_lower
+
+
+@mock.patch.object(analytics, 'ANALYTICS_SAFETY_LAG', 0)  # Les critiques créées par le test sont lues aussitôt
+class AnalyticsTests(LitRevuTestCase):
+    """Statistiques des notes précalculées : mêmes comptes que les agrégats SQL, calcul incrémental, page en 2 requêtes."""
+
+    def setUp(self):
+        super().setUp()
+        call_command('seed_litrevu', users=20, tickets=40, reviews=120, comments=0, follows_per_user=3,
+                     seed=2, batch_size=50, stdout=StringIO())
+
+    def snapshot_counts(self):
+        return {(snapshot.kind, snapshot.object_id): (snapshot.ratings, snapshot.activity, snapshot.rating_sum)
+                for snapshot in RatingSnapshot.objects.all()}
+
+    def test_full_refresh_matches_sql_aggregates(self):
+        self.assertEqual(analytics.refresh(full=True), Review.objects.count())
+        for kind, field in ((RatingSnapshot.USER, 'user_id'), (RatingSnapshot.TICKET, 'ticket_id')):
+            expected = {}
+            for subject, rating, total in Review.objects.order_by().values_list(field, 'rating').annotate(models.Count('pk')):
+                expected.setdefault(subject, [0] * 6)[rating] = total
+            snapshots = RatingSnapshot.objects.filter(kind=kind)
+            self.assertEqual({snapshot.object_id: snapshot.ratings for snapshot in snapshots}, expected)
+            months = Counter((subject, f'{when:%Y-%m}') for subject, when
+                             in Review.objects.values_list(field, 'time_created'))
+            self.assertEqual(sum(sum(snapshot.activity.values()) for snapshot in snapshots), sum(months.values()))
+            for snapshot in snapshots:
+                for month, total in snapshot.activity.items():
+                    self.assertEqual(months[snapshot.object_id, month], total)
+        if analytics.np is not None:  # Le calcul en Python pur donne les mêmes instantanés
+            expected = self.snapshot_counts()
+            with mock.patch.object(analytics, 'np', None):
+                analytics.refresh(full=True)
+            self.assertEqual(self.snapshot_counts(), expected)
+
+    def test_incremental_refresh_reads_only_new_reviews(self):
+        analytics.refresh(full=True)
+        ticket = Ticket.objects.order_by('pk').first()
+        user = make_user('nouveau')
+        before = RatingSnapshot.objects.get(kind=RatingSnapshot.TICKET, object_id=ticket.pk)
+        Review.objects.create(user=user, ticket=ticket, rating=5, headline='Nouvelle')
+        self.assertEqual(analytics.refresh(), 1)  # Depuis le point haut
+        after = RatingSnapshot.objects.get(kind=RatingSnapshot.TICKET, object_id=ticket.pk)
+        self.assertEqual(after.review_count, before.review_count + 1)
+        self.assertEqual(after.ratings[5], before.ratings[5] + 1)
+        self.assertEqual(RatingSnapshot.objects.get(kind=RatingSnapshot.USER, object_id=user.pk).ratings, [0, 0, 0, 0, 0, 1])
+        expected = self.snapshot_counts()
+        self.assertEqual(analytics.refresh(), 0)
+        analytics.refresh(full=True)
+        self.assertEqual(self.snapshot_counts(), expected)  # Incrémental et complet concordent
+
+    def test_stats_page_reads_snapshots(self):
+        call_command('refresh_analytics', '--full', stdout=StringIO())
+        user = Ticket.objects.values_list('user', flat=True).order_by('pk').first()
+        self.client.force_login(CustomUser.objects.get(pk=user))
+        with self.assertNumQueries(3):  # Utilisateur (session en cache depuis la connexion), billets et instantanés
+            response = self.client.get(reverse('stats'))
+        self.assertEqual(response.status_code, 200)
+        tickets = response.context['tickets']
+        self.assertTrue(tickets)
+        for ticket, snapshot, distribution in tickets:
+            self.assertEqual(sum(total for _, total, _ in distribution), Review.objects.filter(ticket=ticket).count())
+        self.assertEqual(len(response.context['activity']), 12)
+
+
+class ArchiveTests(LitRevuTestCase):
+    """Archivage des fils anciens : déplacés par lots, lisibles par la page des archives, purgés avec leur auteur."""
+
+    def setUp(self):
+        super().setUp()
+        self.alice = make_user('alice')
+        self.bob = make_user('bob')
+        UserFollows.objects.create(user=self.alice, followed_user=self.bob)
+        old = timezone.now() - timedelta(days=archive.ARCHIVE_AFTER_DAYS + 10)
+        self.cold = make_ticket(self.bob, 'Dune', when=old)
+        self.review = make_review(self.alice, self.cold, 'Épique', when=old + timedelta(days=1))
+        self.comment = Comment.objects.create(user=self.alice, ticket=self.cold, body='Quel roman !')
+        Comment.objects.filter(pk=self.comment.pk).update(time_created=old + timedelta(days=2))
+        self.warm = make_ticket(self.bob, 'Fondation', when=old)  # Billet ancien, critique récente : reste vivant
+        make_review(self.alice, self.warm, 'Relu')
+        self.recent = make_ticket(self.bob, 'Hypérion')
+        for user in (self.alice, self.bob):
+            timeline.rebuild(user.pk)  # Entrées du flux aux dates forcées
+
+    def test_archives_only_cold_threads_in_chunks(self):
+        progress = []
+        self.assertEqual(archive.archive_old_posts(chunk_size=1, progress=progress.append), 1)
+        self.assertEqual(progress, [1])
+        self.assertEqual(set(Ticket.objects.values_list('title', flat=True)), {'Fondation', 'Hypérion'})
+        self.assertFalse(Review.all_objects.filter(pk=self.review.pk).exists())
+        self.assertFalse(Comment.all_objects.filter(pk=self.comment.pk).exists())
+        self.assertFalse(FeedEntry.objects.filter(kind=FeedEntry.TICKET, object_id=self.cold.pk).exists())
+        self.assertFalse(FeedEntry.objects.filter(kind=FeedEntry.REVIEW, object_id=self.review.pk).exists())
+        self.assertFalse(TicketStats.objects.filter(ticket_id=self.cold.pk).exists())
+        archived = ArchivedTicket.objects.get(pk=self.cold.pk)  # Identifiants et dates d'origine conservés
+        self.assertEqual((archived.time_created, archived.review_count, archived.comment_count),
+                         (self.cold.time_created, 1, 1))
+        self.assertEqual(ArchivedReview.objects.get(pk=self.review.pk).ticket_id, self.cold.pk)
+        self.assertEqual(search.search(self.alice, 'dune')[0], [])
+        self.assertEqual(archive.archive_old_posts(), 0)  # Rien de plus à archiver
+        self.assertEqual(timeline.check(self.alice), (set(), set()))
+
+    def test_archive_page_and_old_links(self):
+        call_command('archive_posts', stdout=StringIO())
+        self.client.force_login(self.alice)
+        self.assertContains(self.client.get(reverse('feed')), reverse('archive_feed'))  # Fin du flux récent
+        with self.assertNumQueries(3):  # Page, billets, critiques (session, utilisateur et abonnements en cache)
+            response = self.client.get(reverse('archive_feed'))
+        self.assertEqual([(post.content_type, post.pk) for post in response.context['posts']],
+                         [(REVIEW, self.review.pk), (TICKET, self.cold.pk)])
+        page = archive.get_archive_page(self.alice, page_size=1)
+        self.assertEqual([post.pk for post in archive.get_archive_page(self.alice, page[1], page_size=1)[0]],
+                         [self.cold.pk])
+        response = self.client.get(reverse('comment_thread', args=[self.cold.pk]))
+        self.assertRedirects(response, reverse('archived_ticket', args=[self.cold.pk]))
+        response = self.client.get(reverse('archived_ticket', args=[self.cold.pk]))
+        self.assertContains(response, 'Quel roman !')
+        self.assertContains(response, 'Épique')
+        self.assertEqual(self.client.get(reverse('comment_thread', args=[9999])).status_code, 404)
+
+    @mock.patch.object(analytics, 'ANALYTICS_SAFETY_LAG', 0)
+    def test_archived_posts_count_in_stats_and_are_purged(self):
+        archive.archive_old_posts()
+        analytics.refresh(full=True)
+        self.assertEqual(RatingSnapshot.objects.get(kind=RatingSnapshot.USER, object_id=self.alice.pk).review_count, 2)
+        purge.soft_delete_user(self.bob)
+        purge.purge_deleted()
+        self.assertFalse(ArchivedTicket.objects.exists())
+        self.assertFalse(ArchivedReview.objects.exists())  # Critique d'alice sur le billet de bob
+        self.assertFalse(ArchivedComment.objects.exists())
+
+
+@mock.patch.object(throttling, 'THROTTLE_IP_RATE', (5, 60))
+@mock.patch.object(throttling, 'THROTTLE_RATES', {'ticket': (2, 60), 'comment': (2, 60), 'follow': (2, 60),
+                                                   'account': (2, 60)})
+class ThrottleTests(LitRevuTestCase):
+    """Seaux à jetons des écritures : rafale absorbée, puis 429 avec Retry-After, par utilisateur et par adresse IP."""
+
+    def setUp(self):
+        super().setUp()
+        self.alice = make_user('alice')
+        self.bob = make_user('bob')
+        self.ticket = make_ticket(self.bob)
+        self.now = 1000.0
+        clock = mock.patch.object(throttling, 'time', mock.Mock(time=lambda: self.now))
+        clock.start()
+        self.addCleanup(clock.stop)
+
+    def comment(self, user, client=None):
+        client = client or self.client
+        client.force_login(user)
+        return client.post(reverse('add_comment', args=[self.ticket.pk]), {'body': 'Spam'})
+
+    def test_user_bucket_absorbs_burst_then_refills(self):
+        self.assertEqual([self.comment(self.alice).status_code for _ in range(3)], [302, 302, 429])
+        response = self.comment(self.alice)
+        self.assertEqual(response['Retry-After'], '30')  # Un jeton toutes les 60 / 2 secondes
+        self.assertEqual(Comment.objects.count(), 2)
+        self.assertEqual(self.client.get(reverse('add_comment', args=[self.ticket.pk])).status_code, 200)  # Formulaire
+        self.client.force_login(self.alice)
+        self.assertEqual(self.client.post(reverse('add_ticket'), {'title': 'Autre type'}).status_code, 302)
+        self.now += 30
+        self.assertEqual(self.comment(self.alice).status_code, 302)
+        self.assertEqual(self.comment(self.alice).status_code, 429)
+
+    def test_ip_bucket_is_shared_and_anonymous_writes_are_limited(self):
+        self.client.logout()
+        self.assertRedirects(self.client.post(reverse('add_comment', args=[self.ticket.pk]), {'body': 'Anonyme'}),
+                             f"{reverse('login')}?next={reverse('add_comment', args=[self.ticket.pk])}",
+                             fetch_redirect_response=False)
+        self.assertEqual(self.client.get(reverse('delete_comment', args=[1])).status_code, 302)  # Connexion requise
+        logins = [self.client.post(reverse('login'), {'username': 'x', 'password': 'y'}).status_code for _ in range(3)]
+        self.assertEqual(logins, [200, 200, 429])  # Par adresse IP : 2 tentatives
+        self.now += 60
+        statuses = [self.comment(user, self.client_class()).status_code for user in (self.alice, self.bob) * 2]
+        carol = make_user('carol')
+        statuses += [self.comment(carol, self.client_class()).status_code for _ in range(2)]
+        self.assertEqual(statuses, [302] * 5 + [429])  # 5 jetons par minute pour l'adresse IP commune
+        other_ip = self.client_class(REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(self.comment(make_user('dave'), other_ip).status_code, 302)
+
+    async def test_cache_failure_falls_back_to_process_buckets(self):
+        broken = mock.Mock(get_many=mock.Mock(side_effect=ConnectionError('cache injoignable')))
+        throttling.local_buckets.clear()
+        await self.async_client.aforce_login(self.alice)
+        with mock.patch.object(throttling, '_cache', return_value=broken), self.assertLogs('reviews.throttling', 'WARNING'):
+            statuses = [(await self.async_client.post(reverse('aadd_follow'), {'username': 'bob'})).status_code
+                        for _ in range(3)]
+        self.assertEqual(statuses, [302, 302, 429])
+
+
+class AuthCacheTests(LitRevuTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = make_user('alice')
+        self.backend = auth_cache.CachedModelBackend()
+
+    def test_user_loaded_once_then_served_from_cache(self):
+        with self.assertNumQueries(1):
+            self.backend.get_user(self.alice.pk)
+        with self.assertNumQueries(0):
+            user = self.backend.get_user(self.alice.pk)
+        self.assertEqual(user, self.alice)
+
+        self.client.force_login(self.alice)
+        self.client.get(reverse('feed'))
+        with count_queries() as counter:
+            self.client.get(reverse('feed'))
+        self.assertEqual(counter.count, view_query_counts['feed'])  # Ni session ni utilisateur relus en base
+
+    def test_profile_and_password_changes_invalidate(self):
+        self.client.force_login(self.alice)
+        self.assertEqual(self.client.get(reverse('feed')).status_code, 200)
+
+        self.alice.email = 'alice@example.org'
+        self.alice.save()
+        self.assertEqual(self.backend.get_user(self.alice.pk).email, 'alice@example.org')
+
+        self.alice.set_password('nouveau-mot-de-passe')  # Depuis une autre session : celle-ci est déconnectée
+        self.alice.save()
+        self.assertRedirects(self.client.get(reverse('feed')), f"{reverse('login')}?next={reverse('feed')}")
+
+    def test_sessions_opened_with_model_backend_stay_valid(self):
+        self.client.force_login(self.alice, backend='django.contrib.auth.backends.ModelBackend')  # Avant le déploiement
+        self.assertEqual(self.client.get(reverse('feed')).status_code, 200)
+
+        self.client.logout()
+        response = self.client.post(reverse('register'), {
+            'username': 'bob', 'email': 'bob@example.com', 'password1': 'Un-mot-de-passe-solide', 'password2': 'Un-mot-de-passe-solide'})
+        self.assertRedirects(response, reverse('feed'))  # login() sans authenticate() : backend explicite
+        self.assertEqual(self.client.session['_auth_user_backend'], 'reviews.auth_cache.CachedModelBackend')
+
+    def test_deactivation_logs_out_and_permissions_are_not_cached(self):
+        self.backend.get_user(self.alice.pk)
+        group = Group.objects.create(name='moderateurs')
+        group.permissions.add(Permission.objects.get(codename='delete_comment'))
+        self.alice.groups.add(group)  # Sans invalidation : les permissions sont relues à chaque requête
+        self.assertTrue(self.backend.get_user(self.alice.pk).has_perm('reviews.delete_comment'))
+
+        self.client.force_login(self.alice)
+        purge.soft_delete_user(self.alice)  # Mise à jour sans signal
+        self.assertIsNone(self.backend.get_user(self.alice.pk))
+        self.assertEqual(self.client.get(reverse('feed')).status_code, 302)
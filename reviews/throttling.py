@@ -0,0 +1,182 @@
+"""Limitation du débit des écritures : seaux à jetons par utilisateur et par adresse IP.
+
+SQLite n'a qu'un écrivain à la fois : un script qui publie en boucle garde le
+verrou d'écriture et ralentit le flux de tout le monde. Chaque vue d'écriture
+décorée par @throttle(scope) consomme, pour chaque requête d'écriture (POST...),
+un jeton dans deux seaux :
+
+- celui de l'utilisateur pour ce type d'écriture, THROTTLE_RATES[scope] (celui de
+  son adresse IP s'il n'est pas connecté : inscription, connexion) ;
+- celui de son adresse IP, commun à toutes les écritures, THROTTLE_IP_RATE.
+
+Un débit (capacité, période) absorbe une rafale de `capacité` écritures, puis en
+accepte `capacité` par `période` secondes. Sans jeton, la vue n'est pas appelée :
+réponse 429 avec l'en-tête Retry-After. L'affichage des formulaires (GET) n'est pas limité.
+
+Un seau est stocké dans le cache, partagé entre les processus, sous la forme
+d'une seule date : celle à laquelle il sera de nouveau plein (algorithme GCRA,
+équivalent au seau à jetons). Une vérification coûte un get_many et un set_many.
+Elles ne sont pas atomiques : des requêtes simultanées peuvent lire le même état
+et laisser passer une écriture de plus chacune. Si le cache est injoignable, des
+seaux en mémoire du processus prennent le relais (limite par processus).
+"""
+import functools
+import ipaddress
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from inspect import iscoroutinefunction
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.shortcuts import render
+
+logger = logging.getLogger(__name__)
+
+THROTTLE_ENABLED = getattr(settings, 'THROTTLE_ENABLED', True)
+THROTTLE_RATES = getattr(settings, 'THROTTLE_RATES', {  # (capacité, période en secondes) par utilisateur et par type
+    'ticket': (10, 60),
+    'comment': (20, 60),
+    'follow': (30, 60),
+    'account': (10, 300),  # Inscription et connexion, par adresse IP
+})
+THROTTLE_IP_RATE = getattr(settings, 'THROTTLE_IP_RATE', (120, 60))  # Toutes les écritures d'une adresse IP
+THROTTLE_PROXY_COUNT = getattr(settings, 'THROTTLE_PROXY_COUNT', 0)  # Proxys de confiance qui ajoutent X-Forwarded-For
+LOCAL_MAX_BUCKETS = 10000  # Seaux gardés en mémoire quand le cache est injoignable
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+
+def _cache():
+    return caches[getattr(settings, 'THROTTLE_CACHE_ALIAS', 'default')]
+
+
+class LocalBuckets:
+    """Seaux en mémoire du processus, avec la même interface que le cache ; les plus anciens sont évincés."""
+
+    def __init__(self, max_entries=LOCAL_MAX_BUCKETS):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get_many(self, keys):
+        with self.lock:
+            return {key: self.entries[key] for key in keys if key in self.entries}
+
+    def set_many(self, mapping, timeout=None):
+        with self.lock:
+            for key, value in mapping.items():
+                self.entries[key] = value
+                self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+local_buckets = LocalBuckets()
+_fallback_logged = False
+
+
+def client_ip(request):
+    """Adresse du client : REMOTE_ADDR, ou l'entrée de X-Forwarded-For ajoutée par le premier proxy de confiance.
+
+    Une adresse IPv6 est ramenée à son réseau /64, qu'un client obtient en entier.
+    """
+    address = request.META.get('REMOTE_ADDR', '')
+    if THROTTLE_PROXY_COUNT:
+        forwarded = [part.strip() for part in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if part.strip()]
+        if len(forwarded) >= THROTTLE_PROXY_COUNT:
+            address = forwarded[-THROTTLE_PROXY_COUNT]
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return address
+    if ip.version == 6:
+        return str(ipaddress.ip_network(f'{ip}/64', strict=False))
+    return str(ip)
+
+
+def _buckets(request, scope, user):
+    """Seaux (clé, capacité, période) consommés par la requête."""
+    ip = client_ip(request)
+    owner = f'user:{user.pk}' if user.is_authenticated else f'ip:{ip}'
+    return [(f'throttle:{scope}:{owner}', *THROTTLE_RATES[scope]), (f'throttle:ip:{ip}', *THROTTLE_IP_RATE)]
+
+
+def _consume(store, buckets, now):
+    """Prend un jeton dans chaque seau ; retourne 0, ou le délai (secondes) avant le prochain jeton sans rien prendre."""
+    stored = store.get_many([key for key, _, _ in buckets])
+    updates, wait = {}, 0.0
+    for key, capacity, period in buckets:
+        full_at = max(stored.get(key, now), now) + period / capacity  # Date à laquelle le seau sera plein après ce jeton
+        if full_at - now > period:  # Plus aucun jeton : le seau est vide
+            wait = max(wait, full_at - period - now)
+        updates[key] = full_at
+    if wait:
+        return wait
+    store.set_many(updates, timeout=max(math.ceil(period) for _, _, period in buckets) + 1)
+    return 0
+
+
+def check(request, scope, user):
+    """Consomme les jetons d'une requête d'écriture ; retourne 0 si elle est acceptée, sinon le délai Retry-After."""
+    global _fallback_logged
+    buckets = _buckets(request, scope, user)
+    now = time.time()
+    try:
+        wait = _consume(_cache(), buckets, now)
+    except Exception:  # Cache injoignable (memcached, Redis...) : les écritures restent limitées, par processus
+        if not _fallback_logged:
+            logger.warning('Cache de limitation injoignable : seaux en mémoire du processus', exc_info=True)
+            _fallback_logged = True
+        wait = _consume(local_buckets, buckets, now)
+    return math.ceil(wait)
+
+
+def throttled(request, retry_after):
+    response = render(request, 'throttled.html', {'retry_after': retry_after}, status=429)
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+@contextmanager
+def disabled():
+    """Désactive la limitation dans le bloc : benchmarks qui mesurent le coût des vues d'écriture elles-mêmes."""
+    global THROTTLE_ENABLED
+    enabled, THROTTLE_ENABLED = THROTTLE_ENABLED, False
+    try:
+        yield
+    finally:
+        THROTTLE_ENABLED = enabled
+
+
+def throttle(scope):
+    """Décorateur des vues d'écriture : au-delà du débit de `scope` ou de celui de l'adresse IP, répond 429."""
+    if scope not in THROTTLE_RATES:
+        raise KeyError(f'Débit non configuré : {scope}')
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def wrapper(request, *args, **kwargs):
+                if THROTTLE_ENABLED and request.method not in SAFE_METHODS:
+                    retry_after = await sync_to_async(check)(request, scope, await request.auser())
+                    if retry_after:
+                        return await sync_to_async(throttled)(request, retry_after)
+                return await view(request, *args, **kwargs)
+        else:
+            @functools.wraps(view)
+            def wrapper(request, *args, **kwargs):
+                if THROTTLE_ENABLED and request.method not in SAFE_METHODS:
+                    retry_after = check(request, scope, request.user)
+                    if retry_after:
+                        return throttled(request, retry_after)
+                return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
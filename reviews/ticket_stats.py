@@ -0,0 +1,133 @@
+"""Agrégats des billets (nombre de critiques, note moyenne, nombre de commentaires).
+
+Les compteurs sont mis à jour par des UPDATE ... SET col = col + n (expressions F),
+sans lecture préalable : deux écritures concurrentes ne peuvent pas s'écraser.
+Si la ligne TicketStats manque, elle est recréée depuis les tables sources.
+"""
+import logging
+
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Review, Ticket, TicketStats
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000  # Nombre de billets recalculés par lot
+FIELDS = ['review_count', 'rating_sum', 'comment_count']  # Colonnes d'agrégats
+
+
+def _add(ticket_id, reviews=0, ratings=0, comments=0, rebuild=True):
+    updated = TicketStats.objects.filter(ticket_id=ticket_id).update(
+        review_count=F('review_count') + reviews,
+        rating_sum=F('rating_sum') + ratings,
+        comment_count=F('comment_count') + comments,
+    )
+    # Ligne absente : l'incrément serait perdu, les agrégats sont recalculés (écriture déjà faite). Pas lors d'une
+    # suppression : la suppression d'un billet retire sa ligne avant ses critiques et commentaires.
+    if not updated and rebuild:
+        logger.warning('Agrégats absents pour le billet %s : recalcul', ticket_id)
+        _upsert(ticket_id)
+
+
+def _upsert(ticket_id):
+    """Crée ou remplace la ligne TicketStats d'un billet à partir des tables sources (rien si le billet n'existe plus)."""
+    rows = _computed(Ticket.objects.filter(pk=ticket_id)).values_list(
+        'pk', 'computed_review_count', 'computed_rating_sum', 'computed_comment_count')
+    TicketStats.objects.bulk_create(
+        [TicketStats(ticket_id=pk, review_count=reviews, rating_sum=ratings, comment_count=comments)
+         for pk, reviews, ratings, comments in rows],
+        update_conflicts=True, unique_fields=['ticket'], update_fields=FIELDS)
+
+
+def ticket_created(ticket):
+    TicketStats.objects.get_or_create(ticket=ticket)
+
+
+def review_saved(review, created):
+    """Met à jour les agrégats après la création ou la modification d'une critique."""
+    if created:
+        _add(review.ticket_id, reviews=1, ratings=review.rating)
+        return
+    old_ticket_id, old_rating = review._stats_original
+    if old_ticket_id != review.ticket_id:  # Critique déplacée vers un autre billet
+        _add(old_ticket_id, reviews=-1, ratings=-old_rating)
+        _add(review.ticket_id, reviews=1, ratings=review.rating)
+    elif old_rating != review.rating:
+        _add(review.ticket_id, ratings=review.rating - old_rating)
+
+
+def review_deleted(review):
+    old_ticket_id, old_rating = review._stats_original
+    _add(old_ticket_id, reviews=-1, ratings=-old_rating, rebuild=False)
+
+
+def comment_added(comment):
+    _add(comment.ticket_id, comments=1)
+
+
+def comment_deleted(comment):
+    _add(comment.ticket_id, comments=-1, rebuild=False)
+
+
+def _computed(tickets):
+    """Annote des billets avec leurs agrégats calculés depuis les tables sources."""
+    def aggregate(model, expression):
+        return Coalesce(Subquery(
+            model.objects.filter(ticket=OuterRef('pk')).order_by().values('ticket')
+            .annotate(value=expression).values('value'),
+            output_field=IntegerField(),
+        ), Value(0))
+
+    return tickets.annotate(
+        computed_review_count=aggregate(Review, Count('pk')),
+        computed_rating_sum=aggregate(Review, Sum('rating')),
+        computed_comment_count=aggregate(Comment, Count('pk')),
+    )
+
+
+def refresh(ticket_ids):
+    """Recalcule les agrégats de quelques billets (par exemple après la suppression des posts d'un utilisateur)."""
+    rows = _computed(Ticket.objects.filter(pk__in=ticket_ids)).values_list(
+        'pk', 'computed_review_count', 'computed_rating_sum', 'computed_comment_count')
+    TicketStats.objects.bulk_update(
+        [TicketStats(ticket_id=pk, review_count=reviews, rating_sum=ratings, comment_count=comments)
+         for pk, reviews, ratings, comments in rows],
+        FIELDS, batch_size=BATCH_SIZE)
+
+
+def recompute(batch_size=BATCH_SIZE):
+    """Recalcule les agrégats de tous les billets par lots et corrige les écarts.
+
+    Retourne la liste des (ticket_id, agrégats stockés, agrégats calculés) qui différaient ;
+    les agrégats stockés valent None si la ligne TicketStats manquait.
+    """
+    drift = []
+    last_pk = 0
+    while True:
+        batch = list(
+            _computed(Ticket.objects.filter(pk__gt=last_pk).order_by('pk'))
+            .values_list('pk', 'computed_review_count', 'computed_rating_sum', 'computed_comment_count')[:batch_size]
+        )
+        if not batch:
+            return drift
+        last_pk = batch[-1][0]
+
+        stored = TicketStats.objects.in_bulk([row[0] for row in batch])
+        to_create, to_update = [], []
+        for pk, review_count, rating_sum, comment_count in batch:
+            computed = (review_count, rating_sum, comment_count)
+            stats = stored.get(pk)
+            if stats is None:
+                drift.append((pk, None, computed))
+                to_create.append(TicketStats(ticket_id=pk, review_count=review_count,
+                                             rating_sum=rating_sum, comment_count=comment_count))
+                continue
+            current = (stats.review_count, stats.rating_sum, stats.comment_count)
+            if current != computed:
+                drift.append((pk, current, computed))
+                stats.review_count, stats.rating_sum, stats.comment_count = computed
+                to_update.append(stats)
+
+        TicketStats.objects.bulk_create(to_create, ignore_conflicts=True)
+        TicketStats.objects.bulk_update(to_update, FIELDS)
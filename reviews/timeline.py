@@ -0,0 +1,113 @@
+"""Flux matérialisé : chaque billet ou critique est poussé dans le flux de ses lecteurs à l'écriture."""
+from django.db.models import Q
+
+from . import follow_graph
+from .models import FeedEntry, Review, Ticket
+
+BATCH_SIZE = 1000  # Taille des lots pour bulk_create
+
+
+def _bulk_insert(entries, batch_size=BATCH_SIZE):
+    """Insère un itérable d'entrées par lots ; les doublons (owner, kind, object_id) sont ignorés."""
+    batch = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) >= batch_size:
+            FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def ticket_readers(ticket):
+    """Retourne les identifiants des utilisateurs qui voient ce billet : son auteur et ses abonnés."""
+    return {ticket.user_id, *follow_graph.follower_ids(ticket.user_id)}
+
+
+def review_readers(review, ticket_owner_id=None):
+    """Retourne les lecteurs d'une critique : son auteur, ses abonnés et l'auteur du billet critiqué."""
+    if ticket_owner_id is None:
+        ticket_owner_id = Ticket.objects.filter(pk=review.ticket_id).values_list('user_id', flat=True).first()
+    readers = {review.user_id, *follow_graph.follower_ids(review.user_id)}
+    if ticket_owner_id is not None:
+        readers.add(ticket_owner_id)
+    return readers
+
+
+def push_ticket(ticket, readers=None):
+    """Ajoute un billet nouvellement créé au flux de `readers` (par défaut : tous ses lecteurs)."""
+    _bulk_insert(
+        FeedEntry(owner_id=owner_id, author_id=ticket.user_id, kind=FeedEntry.TICKET,
+                  object_id=ticket.pk, time_created=ticket.time_created)
+        for owner_id in (ticket_readers(ticket) if readers is None else readers)
+    )
+
+
+def push_review(review, readers=None):
+    """Ajoute une critique nouvellement créée au flux de `readers` (par défaut : tous ses lecteurs)."""
+    _bulk_insert(
+        FeedEntry(owner_id=owner_id, author_id=review.user_id, kind=FeedEntry.REVIEW,
+                  object_id=review.pk, time_created=review.time_created)
+        for owner_id in (review_readers(review) if readers is None else readers)
+    )
+
+
+def remove_post(kind, object_id):
+    """Retire un post supprimé de tous les flux."""
+    FeedEntry.objects.filter(kind=kind, object_id=object_id).delete()
+
+
+def backfill(owner_id, author_id):
+    """Ajoute au flux de `owner_id` tout l'historique de `author_id` (appelé lors d'un abonnement)."""
+    tickets = Ticket.objects.filter(user_id=author_id).values_list('pk', 'time_created')
+    reviews = Review.objects.filter(user_id=author_id).values_list('pk', 'time_created')
+    _bulk_insert(
+        FeedEntry(owner_id=owner_id, author_id=author_id, kind=kind, object_id=pk, time_created=time_created)
+        for kind, rows in ((FeedEntry.TICKET, tickets), (FeedEntry.REVIEW, reviews))
+        for pk, time_created in rows.iterator(chunk_size=BATCH_SIZE)
+    )
+
+
+def prune(owner_id, author_id):
+    """Retire de son flux les posts d'un auteur dont `owner_id` s'est désabonné.
+
+    Les critiques de cet auteur sur les billets du propriétaire du flux restent visibles.
+    """
+    if owner_id == author_id:
+        return
+    reviews_on_own_tickets = Review.objects.filter(user_id=author_id, ticket__user_id=owner_id).values('pk')
+    FeedEntry.objects.filter(owner_id=owner_id, author_id=author_id).exclude(
+        kind=FeedEntry.REVIEW, object_id__in=reviews_on_own_tickets
+    ).delete()
+
+
+def live_entries(user_id):
+    """Calcule, à partir des tables sources, les entrées que devrait contenir le flux de `user_id`."""
+    authors = Q(user_id__in={user_id, *follow_graph.followed_ids(user_id)})
+    tickets = Ticket.objects.filter(authors).values_list('pk', 'user_id', 'time_created')
+    reviews = Review.objects.filter(authors | Q(ticket__user_id=user_id)).values_list('pk', 'user_id', 'time_created')
+    for kind, rows in ((FeedEntry.TICKET, tickets), (FeedEntry.REVIEW, reviews)):
+        for pk, author_id, time_created in rows.iterator(chunk_size=BATCH_SIZE):
+            yield FeedEntry(owner_id=user_id, author_id=author_id, kind=kind, object_id=pk,
+                            time_created=time_created)
+
+
+def rebuild(user_id, batch_size=BATCH_SIZE):
+    """Reconstruit entièrement le flux matérialisé d'un utilisateur."""
+    FeedEntry.objects.filter(owner_id=user_id).delete()
+    _bulk_insert(live_entries(user_id), batch_size=batch_size)
+
+
+def check(user):
+    """Compare le flux matérialisé d'un utilisateur aux requêtes de visibilité en direct.
+
+    Retourne un couple (manquants, en_trop) d'ensembles de (kind, object_id).
+    """
+    from .views import get_users_viewable_reviews, get_users_viewable_tickets
+
+    expected = {(FeedEntry.TICKET, pk) for pk in get_users_viewable_tickets(user).values_list('pk', flat=True)}
+    expected |= {(FeedEntry.REVIEW, pk) for pk in get_users_viewable_reviews(user).values_list('pk', flat=True)}
+    # Les critiques sur les billets de l'utilisateur font aussi partie de son flux
+    expected |= {(FeedEntry.REVIEW, pk) for pk in Review.objects.filter(ticket__user=user).values_list('pk', flat=True)}
+    actual = set(FeedEntry.objects.filter(owner=user).values_list('kind', 'object_id'))
+    return expected - actual, actual - expected
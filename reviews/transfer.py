@@ -0,0 +1,364 @@
+"""Import et export en masse au format JSONL : une ligne JSON par objet.
+
+Les sections se suivent dans l'ordre des dépendances (utilisateurs, billets,
+critiques, commentaires, fils archivés, abonnements). Les utilisateurs sont
+référencés par leur nom d'utilisateur ; billets, critiques et commentaires,
+vivants ou archivés, gardent l'identifiant de la base d'origine, décalé à l'import
+du dernier identifiant attribué par la base cible. Un post archivé garde
+l'identifiant de son post vivant d'origine (voir reviews.archive) : il reçoit le
+même décalage que les posts vivants de son type.
+Ces identifiants déterministes rendent l'import d'un lot idempotent : rejouer
+un lot après un crash n'insère pas de doublons.
+
+Avant le premier lot, reserve_offsets() avance la séquence de chaque table
+(sqlite_sequence) au-delà de la plage des identifiants importés : les écritures
+faites pendant l'import, ou entre un crash et la reprise, ne peuvent pas prendre
+un identifiant de la plage réservée.
+"""
+import datetime
+import json
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.db.models import Max
+from django.db.models.constants import OnConflict
+from django.utils import timezone
+
+from .models import (ArchivedComment, ArchivedReview, ArchivedTicket, Comment, Review, Ticket, UserFollows,
+                     username_key)
+
+USER = 'user'
+TICKET = 'ticket'
+REVIEW = 'review'
+COMMENT = 'comment'
+ARCHIVED_TICKET = 'archived_ticket'
+ARCHIVED_REVIEW = 'archived_review'
+ARCHIVED_COMMENT = 'archived_comment'
+FOLLOW = 'follow'
+SECTIONS = (USER, TICKET, REVIEW, COMMENT, ARCHIVED_TICKET, ARCHIVED_REVIEW, ARCHIVED_COMMENT,
+            FOLLOW)  # Ordre d'écriture et d'insertion
+# Sections qui gardent leur identifiant : (section, table vivante, table d'archive) ; une seule plage pour les deux
+ID_SECTIONS = ((TICKET, Ticket, ArchivedTicket), (REVIEW, Review, ArchivedReview), (COMMENT, Comment, ArchivedComment))
+ID_RANGES = {TICKET: TICKET, REVIEW: REVIEW, COMMENT: COMMENT,  # Plage d'identifiants de chaque section
+             ARCHIVED_TICKET: TICKET, ARCHIVED_REVIEW: REVIEW, ARCHIVED_COMMENT: COMMENT}
+
+CHUNK_SIZE = 2000  # Nombre de lignes lues par requête à l'export
+BATCH_SIZE = 1000  # Nombre d'objets par bulk_create à l'import
+
+USER_FIELDS = ('username', 'email', 'password', 'first_name', 'last_name', 'birth_date', 'gender',
+               'is_active', 'date_joined')  # Les droits d'administration ne sont jamais exportés
+
+
+class JSONEncoder(DjangoJSONEncoder):
+    """DjangoJSONEncoder tronque les dates à la milliseconde ; l'export garde la précision complète."""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def _export_querysets():
+    """Requêtes de chaque section : (section, queryset de values(), renommage des colonnes)."""
+    User = get_user_model()
+    return (
+        (USER, User.objects.order_by('pk').values(*USER_FIELDS), {}),
+        (TICKET, Ticket.objects.order_by('pk').values('id', 'user__username', 'title', 'description', 'time_created'),
+         {'user__username': 'user'}),
+        (REVIEW, Review.objects.order_by('pk').values('id', 'ticket_id', 'user__username', 'rating', 'headline',
+                                                      'body', 'time_created'),
+         {'ticket_id': 'ticket', 'user__username': 'user'}),
+        (COMMENT, Comment.objects.order_by('pk').values('id', 'ticket_id', 'user__username', 'body', 'time_created'),
+         {'ticket_id': 'ticket', 'user__username': 'user'}),
+        (ARCHIVED_TICKET, ArchivedTicket.objects.order_by('pk').values(
+            'id', 'user__username', 'title', 'description', 'time_created', 'updated_at', 'archived_at',
+            'review_count', 'rating_sum', 'comment_count'),
+         {'user__username': 'user'}),
+        (ARCHIVED_REVIEW, ArchivedReview.objects.order_by('pk').values(
+            'id', 'ticket_id', 'user__username', 'rating', 'headline', 'body', 'time_created', 'updated_at'),
+         {'ticket_id': 'ticket', 'user__username': 'user'}),
+        (ARCHIVED_COMMENT, ArchivedComment.objects.order_by('pk').values(
+            'id', 'ticket_id', 'user__username', 'body', 'time_created', 'updated_at'),
+         {'ticket_id': 'ticket', 'user__username': 'user'}),
+        (FOLLOW, UserFollows.objects.order_by('pk').values('user__username', 'followed_user__username'),
+         {'user__username': 'user', 'followed_user__username': 'followed_user'}),
+    )
+
+
+def export_records(chunk_size=CHUNK_SIZE):
+    """Génère les enregistrements à exporter, section par section, en mémoire constante."""
+    for section, queryset, renames in _export_querysets():
+        for row in queryset.iterator(chunk_size=chunk_size):
+            record = {'model': section}
+            record.update((renames.get(key, key), value) for key, value in row.items())
+            yield record
+
+
+def max_source_ids(lines):
+    """Plus grand identifiant d'origine de chaque plage (billets, critiques, commentaires), lu sur les lignes JSON."""
+    found = {section: 0 for section, _, _ in ID_SECTIONS}
+    for raw in lines:
+        try:
+            record = json.loads(raw)
+        except ValueError:
+            continue  # Signalée à l'import
+        if isinstance(record, dict) and record.get('model') in ID_RANGES and isinstance(record.get('id'), int):
+            section = ID_RANGES[record['model']]
+            found[section] = max(found[section], record['id'])
+    return found
+
+
+def reserve_offsets(max_ids):
+    """Décalages des identifiants importés ; réserve dans chaque table la plage décalage + 1 à décalage + max_ids.
+
+    Le décalage est le dernier identifiant attribué par la table (sqlite_sequence : lignes supprimées et
+    archivées comprises). Lecture et réservation se font dans la même transaction IMMEDIATE.
+    """
+    offsets = {}
+    with transaction.atomic(), connection.cursor() as cursor:
+        for section, model, archived_model in ID_SECTIONS:
+            table = model._meta.db_table
+            cursor.execute('SELECT seq FROM sqlite_sequence WHERE name = %s', [table])
+            row = cursor.fetchone()
+            offset = max(row[0] if row else 0,
+                         *(manager.aggregate(max_pk=Max('pk'))['max_pk'] or 0
+                           for manager in (model._base_manager, archived_model._base_manager)))
+            reserved = offset + max_ids.get(section, 0)
+            if row:
+                cursor.execute('UPDATE sqlite_sequence SET seq = %s WHERE name = %s', [reserved, table])
+            else:  # Table encore jamais remplie
+                cursor.execute('INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)', [table, reserved])
+            offsets[section] = offset
+    return offsets
+
+
+def _raw_insert(objects, batch_size):
+    """INSERT OR IGNORE des objets tels quels, sans pre_save (auto_now_add, auto_now), comme loaddata."""
+    model = type(objects[0])
+    fields = model._meta.local_concrete_fields
+    batch_size = min(batch_size, connection.ops.bulk_batch_size(fields, objects))
+    for start in range(0, len(objects), batch_size):
+        model._base_manager._insert(objects[start:start + batch_size], fields=fields, raw=True,
+                                    on_conflict=OnConflict.IGNORE)
+
+
+class RowError(Exception):
+    """Ligne rejetée à l'import."""
+
+
+class Importer:
+    """Importe des lots d'enregistrements ; chaque lot est inséré dans sa propre transaction."""
+
+    def __init__(self, offsets, batch_size=BATCH_SIZE):
+        self.offsets = offsets
+        self.batch_size = batch_size
+
+    def import_chunk(self, records):
+        """Importe une liste de (numéro de ligne, enregistrement).
+
+        Retourne un couple (nombre d'objets créés par section, liste de (numéro de ligne, erreur)).
+        """
+        groups = defaultdict(list)
+        errors = []
+        for line_no, record in records:
+            if record.get('model') in SECTIONS:
+                groups[record['model']].append((line_no, record))
+            else:
+                errors.append((line_no, f"type d'objet inconnu : {record.get('model')!r}"))
+
+        created = {}
+        with transaction.atomic():
+            for section in SECTIONS:
+                if groups[section]:
+                    objects = self._build(section, groups[section], errors)
+                    created[section] = self._insert(section, objects)
+        errors.sort()
+        return created, errors
+
+    def _build(self, section, rows, errors):
+        """Construit et valide les objets d'une section ; les lignes invalides sont écartées."""
+        context = getattr(self, f'_lookup_{section}')(rows)
+        build = getattr(self, f'_build_{section}')
+        objects = []
+        for line_no, record in rows:
+            try:
+                obj = build(record, context)
+            except RowError as error:
+                errors.append((line_no, str(error)))
+            except ValidationError as error:
+                errors.append((line_no, '; '.join(f'{field} : {" ".join(messages)}'
+                                                   for field, messages in error.message_dict.items())))
+            except (KeyError, TypeError, ValueError) as error:
+                errors.append((line_no, f'enregistrement mal formé ({error!r})'))
+            else:
+                if obj is not None:  # None : objet déjà présent en base
+                    objects.append(obj)
+        return objects
+
+    def _insert(self, section, objects):
+        """Insère les objets par lots et retourne le nombre de lignes réellement insérées."""
+        if not objects:
+            return 0
+        connection.ensure_connection()
+        before = connection.connection.total_changes  # Les lignes ignorées (déjà présentes) ne sont pas comptées
+        # Conflits ignorés : un lot rejoué après un crash ne crée pas de doublons
+        if section in ID_RANGES:
+            _raw_insert(objects, self.batch_size)  # Dates d'origine conservées : time_created est en auto_now_add
+        else:
+            type(objects[0]).objects.bulk_create(objects, batch_size=self.batch_size, ignore_conflicts=True)
+        return connection.connection.total_changes - before
+
+    # Recherches faites une fois par lot, pour ne jamais interroger la base ligne par ligne
+
+    def _lookup_user(self, rows):
+        User = get_user_model()
+        usernames = [record.get('username') for _, record in rows]
+        emails = [record.get('email') for _, record in rows]
+        return {
+            'usernames': set(User.objects.filter(username__in=usernames).values_list('username', flat=True)),
+            'emails': set(User.objects.filter(email__in=emails).values_list('email', flat=True)),
+        }
+
+    def _lookup_ticket(self, rows):
+        return {'users': self._user_ids(rows, 'user')}
+
+    def _lookup_review(self, rows, tickets=Ticket.objects):
+        wanted = [record['ticket'] + self.offsets[TICKET] for _, record in rows if isinstance(record.get('ticket'), int)]
+        return {
+            'users': self._user_ids(rows, 'user'),
+            'tickets': set(tickets.filter(pk__in=wanted).values_list('pk', flat=True)),
+        }
+
+    _lookup_comment = _lookup_review
+    _lookup_archived_ticket = _lookup_ticket
+
+    def _lookup_archived_review(self, rows):
+        return self._lookup_review(rows, tickets=ArchivedTicket.objects)
+
+    _lookup_archived_comment = _lookup_archived_review
+
+    def _lookup_follow(self, rows):
+        users = self._user_ids(rows, 'user', 'followed_user')
+        existing = UserFollows.objects.filter(user_id__in=users.values(), followed_user_id__in=users.values())
+        return {'users': users, 'follows': set(existing.values_list('user_id', 'followed_user_id'))}
+
+    def _user_ids(self, rows, *keys):
+        """Identifiants locaux des utilisateurs référencés par le lot : {nom d'utilisateur: id}."""
+        usernames = {record.get(key) for _, record in rows for key in keys}
+        return dict(get_user_model().objects.filter(username__in=usernames - {None}).values_list('username', 'pk'))
+
+    def _local_id(self, section, source_id):
+        """Identifiant local d'un objet exporté : identifiant d'origine + décalage de sa plage."""
+        if not isinstance(source_id, int):
+            raise RowError(f'identifiant invalide : {source_id!r}')
+        return source_id + self.offsets[ID_RANGES[section]]
+
+    def _resolve_user(self, context, username):
+        if username not in context['users']:
+            raise RowError(f'utilisateur inconnu : {username!r}')
+        return context['users'][username]
+
+    def _resolve_ticket(self, context, source_id):
+        ticket_id = self._local_id(TICKET, source_id)
+        if ticket_id not in context['tickets']:
+            raise RowError(f'billet inconnu : {source_id!r}')
+        return ticket_id
+
+    def _clean(self, obj, exclude=()):
+        """Valide les champs (longueurs, choix, validateurs de la note) sans requête par ligne."""
+        obj.clean_fields(exclude=exclude)
+        return obj
+
+    def _build_user(self, record, context):
+        if record['username'] in context['usernames']:  # Compte déjà présent : réutilisé tel quel
+            return None
+        if record.get('email') in context['emails']:
+            raise RowError(f"email déjà utilisé par un autre compte : {record['email']!r}")
+        fields = {field: record[field] for field in USER_FIELDS if record.get(field) is not None}
+        fields.setdefault('password', make_password(None))  # Sans mot de passe exporté : connexion impossible
+        user = self._clean(get_user_model()(**fields))
+        user.username_lower = username_key(user.username)  # Colonne de recherche : bulk_create n'appelle pas save()
+        context['usernames'].add(user.username)
+        context['emails'].add(user.email)
+        return user
+
+    def _build_ticket(self, record, context):
+        return self._clean(Ticket(
+            pk=self._local_id(TICKET, record['id']),
+            user_id=self._resolve_user(context, record['user']),
+            title=record['title'],
+            description=record.get('description') or '',
+            time_created=record.get('time_created') or timezone.now(),
+            updated_at=timezone.now(),
+        ), exclude=['user'])
+
+    def _build_review(self, record, context):
+        return self._clean(Review(
+            pk=self._local_id(REVIEW, record['id']),
+            ticket_id=self._resolve_ticket(context, record['ticket']),
+            user_id=self._resolve_user(context, record['user']),
+            rating=record['rating'],
+            headline=record['headline'],
+            body=record.get('body') or '',
+            time_created=record.get('time_created') or timezone.now(),
+            updated_at=timezone.now(),
+        ), exclude=['ticket', 'user'])
+
+    def _build_comment(self, record, context):
+        return self._clean(Comment(
+            pk=self._local_id(COMMENT, record['id']),
+            ticket_id=self._resolve_ticket(context, record['ticket']),
+            user_id=self._resolve_user(context, record['user']),
+            body=record['body'],
+            time_created=record.get('time_created') or timezone.now(),
+            updated_at=timezone.now(),
+        ), exclude=['ticket', 'user'])
+
+    def _build_archived_ticket(self, record, context):
+        return self._clean(ArchivedTicket(
+            pk=self._local_id(ARCHIVED_TICKET, record['id']),
+            user_id=self._resolve_user(context, record['user']),
+            title=record['title'],
+            description=record.get('description') or '',
+            time_created=record['time_created'],
+            updated_at=record.get('updated_at') or record['time_created'],
+            archived_at=record.get('archived_at') or timezone.now(),
+            review_count=record.get('review_count', 0),
+            rating_sum=record.get('rating_sum', 0),
+            comment_count=record.get('comment_count', 0),
+        ), exclude=['user'])
+
+    def _build_archived_review(self, record, context):
+        return self._clean(ArchivedReview(
+            pk=self._local_id(ARCHIVED_REVIEW, record['id']),
+            ticket_id=self._resolve_ticket(context, record['ticket']),
+            user_id=self._resolve_user(context, record['user']),
+            rating=record['rating'],
+            headline=record['headline'],
+            body=record.get('body') or '',
+            time_created=record['time_created'],
+            updated_at=record.get('updated_at') or record['time_created'],
+        ), exclude=['ticket', 'user'])
+
+    def _build_archived_comment(self, record, context):
+        return self._clean(ArchivedComment(
+            pk=self._local_id(ARCHIVED_COMMENT, record['id']),
+            ticket_id=self._resolve_ticket(context, record['ticket']),
+            user_id=self._resolve_user(context, record['user']),
+            body=record['body'],
+            time_created=record['time_created'],
+            updated_at=record.get('updated_at') or record['time_created'],
+        ), exclude=['ticket', 'user'])
+
+    def _build_follow(self, record, context):
+        pair = (self._resolve_user(context, record['user']), self._resolve_user(context, record['followed_user']))
+        if pair[0] == pair[1]:
+            raise RowError('un utilisateur ne peut pas se suivre lui-même')
+        if pair in context['follows']:  # Abonnement déjà présent
+            return None
+        context['follows'].add(pair)
+        return UserFollows(user_id=pair[0], followed_user_id=pair[1])
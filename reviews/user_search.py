@@ -0,0 +1,79 @@
+"""Recherche d'utilisateurs par nom : recherche exacte et autocomplétion par préfixe.
+
+Les deux passent par la colonne indexée username_lower (username_key() du nom) :
+- une recherche exacte est un accès direct par l'index ;
+- une recherche par préfixe est un parcours d'intervalle de l'index
+  (prefix <= username_lower < prefix suivant). LIKE 'prefix%' ne l'utiliserait
+  pas sous SQLite, qui le compare sans tenir compte de la casse.
+Le coût ne dépend donc pas du nombre de comptes.
+
+Les premiers candidats d'un préfixe sont communs à tous les utilisateurs : ils
+sont gardés USER_SEARCH_CACHE_TIMEOUT secondes dans le cache, ce qui absorbe la
+frappe des préfixes courts et populaires. Les comptes déjà suivis sont retirés
+ensuite, avec l'ensemble en cache des abonnements (follow_graph).
+"""
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+
+from . import follow_graph
+from .models import username_key
+
+USER_SEARCH_LIMIT = getattr(settings, 'USER_SEARCH_LIMIT', 10)  # Suggestions retournées
+USER_SEARCH_CANDIDATES = getattr(settings, 'USER_SEARCH_CANDIDATES', 50)  # Candidats mis en cache par préfixe
+USER_SEARCH_CACHE_TIMEOUT = getattr(settings, 'USER_SEARCH_CACHE_TIMEOUT', 60)  # Durée de vie des candidats (secondes)
+
+
+def _cache():
+    return caches[getattr(settings, 'USER_SEARCH_CACHE_ALIAS', 'default')]
+
+
+def _live_users():
+    return get_user_model().objects.filter(deleted_at__isnull=True, is_active=True)
+
+
+def prefix_range(prefix):
+    """Bornes (incluse, exclue) des clés commençant par `prefix`, pour un parcours d'intervalle de l'index."""
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def _matching(prefix):
+    low, high = prefix_range(prefix)
+    return _live_users().filter(username_lower__gte=low, username_lower__lt=high).order_by('username_lower')
+
+
+def _candidates(prefix):
+    """Premiers comptes (id, nom) dont la clé commence par `prefix`, depuis le cache ou l'index."""
+    key = 'usersearch:' + hashlib.sha1(prefix.encode()).hexdigest()  # Préfixe quelconque : clé sûre pour memcached
+    candidates = _cache().get(key)
+    if candidates is None:
+        candidates = list(_matching(prefix).values_list('pk', 'username')[:USER_SEARCH_CANDIDATES])
+        _cache().set(key, candidates, USER_SEARCH_CACHE_TIMEOUT)
+    return candidates
+
+
+def suggest(user, prefix, limit=USER_SEARCH_LIMIT):
+    """Noms des comptes commençant par `prefix`, sans l'utilisateur ni les comptes qu'il suit déjà."""
+    prefix = username_key(prefix)
+    if not prefix:
+        return []
+    excluded = follow_graph.followed_ids(user.pk) | {user.pk}
+    candidates = _candidates(prefix)
+    found = [row for row in candidates if row[0] not in excluded][:limit]
+    if len(found) < limit and len(candidates) == USER_SEARCH_CANDIDATES:
+        # Candidats en cache épuisés par les comptes suivis : la suite est lue dans l'index
+        found = list(_matching(prefix).exclude(pk__in=excluded).values_list('pk', 'username')[:limit])
+    return [username for _, username in found]
+
+
+def find_user(username):
+    """Compte actif portant ce nom, à la casse près ; None s'il n'existe pas ou si la casse ne permet pas de choisir."""
+    if not username:
+        return None
+    users = list(_live_users().filter(username_lower=username_key(username)))
+    for user in users:
+        if user.username == username:  # Casse exacte prioritaire (les noms ne sont uniques qu'à la casse près)
+            return user
+    return users[0] if len(users) == 1 else None
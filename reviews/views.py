@@ -1,23 +1,40 @@
 from django.shortcuts import render, redirect, get_object_or_404  # Importation des fonctions pour rendre des templates et rediriger
-from .models import Review, Ticket, UserFollows, Comment  # Importation des modèles nécessaires
-from django.contrib.auth import authenticate, login, get_user_model  # Importation des fonctions d'authentification
+from .models import ArchivedTicket, RatingSnapshot, Review, Ticket, UserFollows, Comment  # Importation des modèles nécessaires
+from django.contrib.auth import authenticate, login  # Importation des fonctions d'authentification
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import AuthenticationForm  # Importation du formulaire d'authentification
 from django.contrib import messages  # Importation du module pour les messages flash
 from .forms import CustomUserCreationForm, TicketForm, CommentForm # Importation du formulaire personnalisé pour l'inscription des utilisateurs
-from itertools import chain
-from django.db.models import CharField, Value
-from django.db import models
-
-
-
+from asgiref.sync import sync_to_async  # Exécution du code synchrone (rendu, cache) depuis les vues asynchrones
+from .feed import aget_feed_page, get_feed_page  # Pagination par curseur du flux
+from . import comments, feed_api, feed_cache, follow_graph, fragments, search, user_search  # Fils de commentaires, Flux JSON, caches du flux, des abonnements et du HTML des posts, recherche de posts et de comptes
+from .feed import decode_cursor
+from django.db.models import Q  # Conditions combinées (OU) des requêtes
+from django.http import Http404, JsonResponse, StreamingHttpResponse  # Page introuvable, réponse JSON, réponse envoyée par morceaux
+from django.views.decorators.http import condition, require_POST, require_safe  # Requêtes conditionnelles (ETag, 304), méthodes acceptées
+from .signals import follow_added  # Mise à jour du flux après un abonnement
+from .query_budget import query_budget  # Budget de requêtes SQL par vue (détection des N+1)
+from .db_routing import read_from_replica  # Lectures du flux et des listes sur la réplique
+from .throttling import throttle  # Débit des écritures limité par utilisateur et par adresse IP
+from . import profiling  # Mesures des requêtes (percentiles par vue)
+from . import purge  # Suppression logique des billets, purge en arrière-plan
+from . import recommendations  # Suggestions d'abonnement précalculées
+from . import analytics  # Statistiques des notes précalculées
+from . import archive  # Fils anciens déplacés hors des tables vivantes
+from django.contrib import admin
+from django.contrib.admin.views.decorators import staff_member_required
+from django.conf import settings
+
+
+
+@throttle('account')
 def register_view(request):
     """Vue pour gérer l'inscription d'un nouvel utilisateur."""
     if request.method == 'POST':  # Vérifie si la méthode de la requête est POST
         form = CustomUserCreationForm(request.POST)  # Crée une instance du formulaire avec les données POST
         if form.is_valid():  # Cette ligne vérifie si les données du formulaire sont valides
             user = form.save()  # Enregistre l'utilisateur dans la base de données
-            login(request, user)  # Connexion automatique après l'inscription
+            login(request, user, backend=settings.AUTHENTICATION_BACKENDS[0])  # Connexion automatique après l'inscription (backend avec cache)
             return redirect('feed')  # Redirection vers la page d'accueil ou 'feed'
         else:
             print(form.errors)  # Affiche les erreurs de formulaire dans la console
@@ -29,8 +46,8 @@ def register_view(request):
 
 def get_users_viewable_reviews(user):
     """Retourne les critiques des utilisateurs suivis par l'utilisateur donné et ses propres critiques."""
-    # Récupère les utilisateurs suivis par l'utilisateur donné
-    followed_users = UserFollows.objects.filter(user=user).values_list('followed_user', flat=True)
+    # Récupère les utilisateurs suivis par l'utilisateur donné (ensemble d'identifiants en cache)
+    followed_users = follow_graph.followed_ids(user.pk)
     
     # Obtenir les critiques des utilisateurs suivis et les critiques de l'utilisateur lui-même
     reviews = Review.objects.filter(user__in=followed_users).union(Review.objects.filter(user=user))
@@ -40,8 +57,8 @@ def get_users_viewable_reviews(user):
 
 def get_users_viewable_tickets(user):
     """Retourne les tickets des utilisateurs suivis par l'utilisateur donné et ses propres tickets."""
-    # Récupère les utilisateurs suivis par l'utilisateur donné
-    followed_users = UserFollows.objects.filter(user=user).values_list('followed_user', flat=True)
+    # Récupère les utilisateurs suivis par l'utilisateur donné (ensemble d'identifiants en cache)
+    followed_users = follow_graph.followed_ids(user.pk)
     
     # Obtenir les tickets des utilisateurs suivis et les tickets de l'utilisateur lui-même
     tickets = Ticket.objects.filter(user__in=followed_users).union(Ticket.objects.filter(user=user))
@@ -49,46 +66,117 @@ def get_users_viewable_tickets(user):
     return tickets  # Retourne les tickets trouvés
 
 
+def build_feed_page(user, cursor):
+    """Page du flux avec l'aperçu des commentaires de chaque billet (mis en cache avec la page)."""
+    posts, next_cursor = get_feed_page(user, cursor)
+    return comments.attach_previews(posts), next_cursor
+
+
+async def abuild_feed_page(user, cursor):
+    """Version asynchrone de build_feed_page()."""
+    posts, next_cursor = await aget_feed_page(user, cursor)
+    return await sync_to_async(comments.attach_previews)(posts), next_cursor
+
+
 @login_required
+@read_from_replica
+@query_budget(4)  # Page du flux + billets + critiques (auteurs chargés par jointure) + aperçu des commentaires
 def feed(request):
-    user = request.user  # Récupérer l'utilisateur actuellement connecté
-
-    # Récupérer les utilisateurs suivis (des instances de CustomUser)
-    followed_users = UserFollows.objects.filter(user=user).values_list('followed_user', flat=True)
-
-    # Récupérer tous les tickets (de l'utilisateur et des utilisateurs suivis)
-    tickets = Ticket.objects.filter(
-        models.Q(user=user) | models.Q(user__in=followed_users)
-    ).annotate(content_type=Value('TICKET', CharField()))
-
-    # Récupérer toutes les critiques (de l'utilisateur et des utilisateurs suivis)
-    reviews = Review.objects.filter(
-        models.Q(user=user) | models.Q(user__in=followed_users)
-    ).annotate(content_type=Value('REVIEW', CharField()))
-
-    # Récupérer les critiques sur les billets de l'utilisateur (postées par n'importe qui)
-    reviews_on_user_tickets = Review.objects.filter(
-        ticket__user=user
-    ).annotate(content_type=Value('REVIEW', CharField()))
-
-    # Utiliser la fonction chain() pour combiner les différents querysets (billets et avis) 
-    # en une seule liste de "posts"
-    posts = sorted(
-        chain(
-            tickets,
-            reviews,
-            reviews_on_user_tickets
-        ),
-        # Trier les posts selon le champ "time_created" (date de création) 
-        # en ordre décroissant (les plus récents en premier)
-        key=lambda post: post.time_created,
-        reverse=True
-    )
-
-    # Renvoyer la page 'feed.html' avec les posts combinés dans le contexte
-    return render(request, 'feed.html', {'posts': posts})
+    """Affiche une page du flux, paginée par curseur (paramètre GET 'cursor')."""
+    cursor = request.GET.get('cursor')
+    posts, next_cursor = feed_cache.get_or_build_page(
+        request.user, cursor, lambda: build_feed_page(request.user, cursor))  # Page en cache tant que le flux n'a pas changé
+
+    return render_feed(request, posts, next_cursor)
+
+
+@login_required
+@read_from_replica
+@query_budget(4)  # Abonnements (si absents du cache), page des archives, billets et critiques (auteurs par jointure)
+def archive_feed(request):
+    """Posts archivés visibles par l'utilisateur, plus anciens que le flux, paginés par curseur (paramètre GET 'cursor')."""
+    posts, next_cursor = archive.get_archive_page(request.user, request.GET.get('cursor'))
+    return render(request, 'archive.html', {'posts': posts, 'next_cursor': next_cursor})
+
+
+@login_required
+@read_from_replica
+@query_budget(3)  # Billet archivé, critiques, commentaires (auteurs chargés par jointure)
+def archived_ticket(request, ticket_id):
+    """Fil complet d'un billet archivé, en lecture seule."""
+    ticket = get_object_or_404(ArchivedTicket.objects.select_related('user'), id=ticket_id)
+    reviews = ticket.reviews.select_related('user').order_by('time_created')
+    thread = ticket.comments.select_related('user').order_by('-time_created')
+    return render(request, 'archived_ticket.html', {'ticket': ticket, 'reviews': reviews, 'comments': thread})
 
 
+def render_feed(request, posts, next_cursor):
+    """Rend 'feed.html' avec les posts de la page (HTML de chaque post lu dans le cache) et le curseur suivant."""
+    fragments.render_posts(posts)  # Seuls les posts absents du cache sont rendus
+    return render(request, 'feed.html', {'posts': posts, 'next_cursor': next_cursor})
+
+
+@login_required
+@read_from_replica
+@require_safe
+@condition(etag_func=feed_api.etag, last_modified_func=feed_api.last_modified)  # 304 sans charger de post
+def feed_json(request):
+    """Flux au format JSON, diffusé au fil de la lecture (paramètres GET 'cursor' et 'limit')."""
+    cursor = request.GET.get('cursor')
+    cursor = decode_cursor(cursor) if cursor else None  # Curseur validé avant d'envoyer les en-têtes
+    limit = feed_api.parse_limit(request.GET.get('limit'))
+    response = StreamingHttpResponse(feed_api.stream_feed(request.user, cursor, limit),
+                                     content_type='application/json')
+    response['Cache-Control'] = 'private, no-cache'  # Le client revalide à chaque appel avec If-None-Match
+    return response
+
+
+@login_required
+@read_from_replica
+@query_budget(5)  # Abonnements (si absents du cache), recherche, puis billets, critiques et commentaires trouvés
+def search_view(request):
+    """Recherche plein texte dans les posts visibles par l'utilisateur (paramètres GET 'q' et 'page')."""
+    query = request.GET.get('q', '').strip()
+    try:
+        page = max(1, int(request.GET.get('page', 1)))
+    except ValueError:
+        page = 1
+    results, has_next = search.search(request.user, query, page) if query else ([], False)
+    return render(request, 'search.html', {'query': query, 'results': results, 'page': page, 'has_next': has_next})
+
+
+@login_required
+@read_from_replica
+@query_budget(2)  # Derniers billets de l'utilisateur, puis tous les instantanés affichés
+def stats_view(request):
+    """Statistiques des notes précalculées : critiques de l'utilisateur et critiques reçues par ses derniers billets."""
+    tickets = list(Ticket.objects.filter(user=request.user).order_by('-time_created')[:analytics.STATS_TICKET_COUNT])
+    snapshots = {(snapshot.kind, snapshot.object_id): snapshot for snapshot in RatingSnapshot.objects.filter(
+        Q(kind=RatingSnapshot.USER, object_id=request.user.pk)
+        | Q(kind=RatingSnapshot.TICKET, object_id__in=[ticket.pk for ticket in tickets]))}
+    own = snapshots.get((RatingSnapshot.USER, request.user.pk))
+    ticket_stats = [(ticket, snapshots.get((RatingSnapshot.TICKET, ticket.pk))) for ticket in tickets]
+    return render(request, 'stats.html', {
+        'snapshot': own,
+        'distribution': analytics.distribution_rows(own),
+        'activity': analytics.activity_rows(own),
+        'tickets': [(ticket, snapshot, analytics.distribution_rows(snapshot)) for ticket, snapshot in ticket_stats],
+    })
+
+
+@staff_member_required
+def profiling_report(request):
+    """Page d'administration : percentiles des temps de réponse par vue, sur les dernières requêtes profilées."""
+    context = {
+        **admin.site.each_context(request),  # En-tête et navigation de l'administration
+        'title': 'Profilage des vues',
+        'stats': profiling.view_stats(),
+        'buffer_size': profiling.BUFFER_SIZE,
+    }
+    return render(request, 'profiling_report.html', context)
+
+
+@throttle('account')
 def login_view(request):
     """Gère la connexion de l'utilisateur."""
     if request.method == 'POST':  # Vérifie si la méthode de la requête est POST
@@ -112,6 +200,7 @@ def login_view(request):
 
 # Vue pour ajouter un billet
 @login_required  # L'utilisateur doit être connecté pour accéder à cette vue
+@throttle('ticket')
 def add_ticket(request):
     if request.method == 'POST':  # Vérifie si le formulaire est soumis (POST)
         form = TicketForm(request.POST)  # Remplit le formulaire avec les données soumises
@@ -127,10 +216,12 @@ def add_ticket(request):
 
 # Vue pour modifier un billet existant
 @login_required
+@throttle('ticket')
+@query_budget(5)  # Lecture, mise à jour, recherche des flux à invalider (2), tâche de réindexation en file
 def edit_ticket(request, ticket_id):
     ticket = Ticket.objects.get(id=ticket_id)  # Récupère le billet à modifier grâce à son ID
     
-    if ticket.user != request.user:  # Vérifie que l'utilisateur connecté est bien l'auteur du billet
+    if ticket.user_id != request.user.id:  # Vérifie que l'utilisateur connecté est bien l'auteur du billet (sans charger l'auteur)
         return redirect('feed')  # Si ce n'est pas l'auteur, redirige vers le feed
     
     if request.method == 'POST':
@@ -145,37 +236,45 @@ def edit_ticket(request, ticket_id):
 
 # Vue pour supprimer un billet
 @login_required
+@throttle('ticket')
 def delete_ticket(request, ticket_id):
-    ticket = Ticket.objects.get(id=ticket_id)  # Récupère le billet à supprimer grâce à son ID
+    ticket = get_object_or_404(Ticket, id=ticket_id)  # Récupère le billet à supprimer grâce à son ID (404 s'il est déjà supprimé)
     
-    if ticket.user != request.user:  # Vérifie que l'utilisateur connecté est l'auteur du billet
+    if ticket.user_id != request.user.id:  # Vérifie que l'utilisateur connecté est l'auteur du billet
         return redirect('feed')  # Si ce n'est pas l'auteur, redirige vers le feed
     
     if request.method == 'POST':  # Vérifie que la requête est bien une méthode POST pour la suppression
-        ticket.delete()  # Supprime le billet
+        purge.soft_delete_ticket(ticket)  # Masque le billet et ses critiques ; la suppression définitive se fait en arrière-plan
         return redirect('feed')  # Redirige vers la page "feed" après la suppression
 
     return render(request, 'delete_ticket.html', {'ticket': ticket})  # Affiche une page demandant confirmation avant suppression
 
 # Vue pour ajouter un commentaire
-def add_comment(request):
+@login_required
+@throttle('comment')
+def add_comment(request, ticket_id):
+    ticket = get_object_or_404(Ticket, id=ticket_id)  # Billet commenté, ou erreur 404
     if request.method == 'POST':  # Vérifie si la requête est de type POST
         form = CommentForm(request.POST)  # Remplit le formulaire avec les données soumises
         if form.is_valid():  # Vérifie que le formulaire est valide
             comment = form.save(commit=False)  # Crée un objet Comment sans le sauvegarder
             comment.user = request.user  # Associe le commentaire à l'utilisateur connecté
+            comment.ticket = ticket  # Associe le commentaire au billet
             comment.save()  # Sauvegarde le commentaire dans la base de données
             return redirect('feed')  # Redirige l'utilisateur vers la page 'feed'
     else:
         form = CommentForm()  # Si ce n'est pas une requête POST, affiche un formulaire vide
 
-    return render(request, 'add_comment.html', {'form': form})  # Renvoie la page avec le formulaire
+    return render(request, 'add_comment.html', {'form': form, 'ticket': ticket})  # Renvoie la page avec le formulaire
 
 # Vue pour modifier un commentaire
+@login_required
+@throttle('comment')
+@query_budget(5)  # Lecture, mise à jour, recherche des flux à invalider (2), tâche de réindexation en file
 def edit_comment(request, comment_id):
     comment = get_object_or_404(Comment, id=comment_id)  # Récupère le commentaire ou renvoie une erreur 404
     
-    if comment.user != request.user:  # Vérifie que l'utilisateur connecté est bien celui qui a créé le commentaire
+    if comment.user_id != request.user.id:  # Vérifie que l'utilisateur connecté est bien celui qui a créé le commentaire
         return redirect('feed')  # Si ce n'est pas le cas, on le redirige
 
     if request.method == 'POST':  # Si la requête est de type POST
@@ -189,10 +288,12 @@ def edit_comment(request, comment_id):
     return render(request, 'edit_comment.html', {'form': form})  # Renvoie la page de modification avec le formulaire
 
 # Vue pour supprimer un commentaire
+@login_required
+@throttle('comment')
 def delete_comment(request, comment_id):
     comment = get_object_or_404(Comment, id=comment_id)  # Récupère le commentaire ou renvoie une erreur 404
     
-    if comment.user != request.user:  # Vérifie que l'utilisateur est celui qui a créé le commentaire
+    if comment.user_id != request.user.id:  # Vérifie que l'utilisateur est celui qui a créé le commentaire
         return redirect('feed')  # Redirige si ce n'est pas le cas
 
     if request.method == 'POST':  # Si la requête est de type POST (pour la suppression)
@@ -201,35 +302,74 @@ def delete_comment(request, comment_id):
 
     return render(request, 'delete_comment.html', {'comment': comment})  # Affiche une page de confirmation de suppression
 
+@login_required
+@read_from_replica
+@query_budget(2)  # Billet + page de commentaires (auteurs chargés par jointure)
+def comment_thread(request, ticket_id):
+    """Fil des commentaires d'un billet, du plus récent au plus ancien, paginé par curseur (paramètre GET 'cursor').
+
+    Avec le paramètre 'partial', seule la liste est rendue : le flux la charge à la demande sous le billet.
+    """
+    try:
+        ticket = get_object_or_404(Ticket, id=ticket_id)
+    except Http404:
+        if ArchivedTicket.objects.filter(pk=ticket_id).exists():  # Fil archivé : les anciens liens restent valides
+            return redirect('archived_ticket', ticket_id)
+        raise
+    cursor = request.GET.get('cursor')
+    thread, next_cursor = comments.get_thread_page(ticket.pk, comments.decode_cursor(cursor) if cursor else None)
+    template = 'snippets/comment_list.html' if request.GET.get('partial') else 'comment_thread.html'
+    return render(request, template, {'ticket': ticket, 'comments': thread, 'next_cursor': next_cursor})
+
+
 @login_required  # Décorateur pour exiger que l'utilisateur soit connecté avant d'accéder à cette vue
+@read_from_replica
+@query_budget(2)  # Abonnements, suggestions précalculées
 def list_followed_users(request):  # Vue pour lister les utilisateurs suivis par l'utilisateur connecté
-    followed_users = UserFollows.objects.filter(user=request.user)  # Récupérer tous les utilisateurs suivis par l'utilisateur connecté
-    return render(request, 'followed_users_list.html', {'followed_users': followed_users})  # Retourner la page HTML avec les utilisateurs suivis
+    followed_users = list(UserFollows.objects.filter(user=request.user).select_related('followed_user'))  # Récupérer les utilisateurs suivis et leurs noms en une requête
+    # Suggestions « qui suivre » lues dans la table précalculée, sans les comptes suivis depuis le dernier calcul
+    suggestions = recommendations.suggestions_for(request.user, exclude={follow.followed_user_id for follow in followed_users})
+    return render(request, 'followed_users_list.html', {'followed_users': followed_users, 'suggestions': suggestions})  # Retourner la page HTML avec les utilisateurs suivis
 
 @login_required  # Décorateur pour exiger que l'utilisateur soit connecté avant d'accéder à cette vue
+@throttle('follow')
+@query_budget(7)  # Compte (index username_lower), abonnements (si absents du cache), insertion et marque des suggestions (BEGIN + écriture chacune), tâche d'historique du flux en file
 def add_follow(request):  # Vue pour ajouter un utilisateur à suivre
     if request.method == 'POST':  # Vérifie si la requête est de type POST (formulaire soumis)
         username_to_follow = request.POST.get('username')  # Récupère le nom d'utilisateur saisi dans le formulaire
-        try:
-            user_to_follow = get_user_model().objects.get(username=username_to_follow)  # Récupère l'utilisateur par son nom d'utilisateur
+        user_to_follow = user_search.find_user(username_to_follow)  # Recherche indexée, à la casse près, hors comptes supprimés
+        if user_to_follow is None:  # Si l'utilisateur n'existe pas dans la base de données
+            messages.error(request, "Cet utilisateur n'existe pas.")  # Affiche un message d'erreur
+        else:
             if user_to_follow == request.user:  # Vérifie que l'utilisateur ne se suit pas lui-même
                 messages.error(request, "Vous ne pouvez pas vous suivre vous-même.")  # Affiche un message d'erreur si c'est le cas
-            elif UserFollows.objects.filter(user=request.user, followed_user=user_to_follow).exists():  # Vérifie si l'utilisateur suit déjà cette personne
+            elif user_to_follow.pk in follow_graph.followed_ids(request.user.pk):  # Vérifie dans le cache si l'utilisateur suit déjà cette personne
                 messages.error(request, "Vous suivez déjà cet utilisateur.")  # Affiche un message si la relation existe déjà
             else:
-                UserFollows.objects.create(user=request.user, followed_user=user_to_follow)  # Crée une nouvelle relation de suivi
+                # Insertion unique « INSERT OR IGNORE » : pas d'aller-retour de vérification, pas d'erreur en cas de double envoi
+                UserFollows.objects.bulk_create([UserFollows(user=request.user, followed_user=user_to_follow)], ignore_conflicts=True)
+                follow_added(request.user.pk, user_to_follow.pk)  # bulk_create n'envoie pas post_save
                 messages.success(request, f"Vous suivez maintenant {user_to_follow.username}.")  # Affiche un message de succès
             return redirect('list_followed_users')  # Redirige vers la page des utilisateurs suivis
-        except get_user_model.DoesNotExist:  # Si l'utilisateur n'existe pas dans la base de données
-            messages.error(request, "Cet utilisateur n'existe pas.")  # Affiche un message d'erreur
     
     return render(request, 'add_follow.html')  # Affiche la page avec le formulaire d'ajout si la requête n'est pas de type POST
 
 
+@login_required
+@read_from_replica
+@require_safe
+@query_budget(3)  # Abonnements (si absents du cache), candidats du préfixe (si absents du cache), complément éventuel
+def user_search_view(request):
+    """Autocomplétion du formulaire d'abonnement : comptes dont le nom commence par le paramètre GET 'q'."""
+    return JsonResponse({'results': user_search.suggest(request.user, request.GET.get('q', ''))})
+
+
 @login_required  # Décorateur pour exiger que l'utilisateur soit connecté avant d'accéder à cette vue
+@require_POST  # Suppression par formulaire uniquement (un GET ne doit rien modifier)
+@throttle('follow')
 def remove_follow(request, follow_id):  # Vue pour supprimer un utilisateur suivi
     try:
-        follow = UserFollows.objects.get(id=follow_id, user=request.user)  # Récupère la relation de suivi en fonction de l'ID et de l'utilisateur connecté
+        follow = UserFollows.objects.select_related('followed_user').get(id=follow_id, user=request.user)  # Récupère la relation de suivi et l'utilisateur suivi
         follow.delete()  # Supprime la relation de suivi
         messages.success(request, f"Vous avez cessé de suivre {follow.followed_user.username}.")  # Affiche un message de succès
     except UserFollows.DoesNotExist:  # Si la relation de suivi n'existe pas
@@ -239,6 +379,71 @@ def remove_follow(request, follow_id):  # Vue pour supprimer un utilisateur suiv
 
 
 
+# Versions asynchrones des vues du flux et des abonnements, pour le déploiement ASGI.
+# Les requêtes passent par l'ORM asynchrone ; le rendu des templates, synchrone,
+# est délégué à un thread avec sync_to_async.
+
+@login_required
+@read_from_replica
+async def afeed(request):
+    """Version asynchrone de feed()."""
+    user = await request.auser()
+    cursor = request.GET.get('cursor')
+    posts, next_cursor = await feed_cache.aget_or_build_page(
+        user, cursor, lambda: abuild_feed_page(user, cursor))
+    return await sync_to_async(render_feed)(request, posts, next_cursor)
+
+
+@login_required
+@read_from_replica
+async def alist_followed_users(request):
+    """Version asynchrone de list_followed_users()."""
+    user = await request.auser()
+    followed_users = [follow async for follow in UserFollows.objects.filter(user=user).select_related('followed_user')]
+    suggestions = await sync_to_async(recommendations.suggestions_for)(
+        user, exclude={follow.followed_user_id for follow in followed_users})
+    return await sync_to_async(render)(request, 'followed_users_list.html',
+                                       {'followed_users': followed_users, 'suggestions': suggestions})
+
+
+@login_required
+@throttle('follow')
+async def aadd_follow(request):
+    """Version asynchrone de add_follow()."""
+    if request.method == 'POST':
+        user = await request.auser()
+        user_to_follow = await sync_to_async(user_search.find_user)(request.POST.get('username'))
+        if user_to_follow is None:
+            messages.error(request, "Cet utilisateur n'existe pas.")
+        else:
+            if user_to_follow.pk == user.pk:
+                messages.error(request, "Vous ne pouvez pas vous suivre vous-même.")
+            elif user_to_follow.pk in await sync_to_async(follow_graph.followed_ids)(user.pk):
+                messages.error(request, "Vous suivez déjà cet utilisateur.")
+            else:
+                await UserFollows.objects.abulk_create([UserFollows(user=user, followed_user=user_to_follow)], ignore_conflicts=True)
+                await sync_to_async(follow_added)(user.pk, user_to_follow.pk)
+                messages.success(request, f"Vous suivez maintenant {user_to_follow.username}.")
+            return redirect('alist_followed_users')
+
+    return await sync_to_async(render)(request, 'add_follow.html')
+
+
+@login_required
+@require_POST
+@throttle('follow')
+async def aremove_follow(request, follow_id):
+    """Version asynchrone de remove_follow()."""
+    user = await request.auser()
+    try:
+        follow = await UserFollows.objects.select_related('followed_user').aget(id=follow_id, user=user)
+        await follow.adelete()
+        messages.success(request, f"Vous avez cessé de suivre {follow.followed_user.username}.")
+    except UserFollows.DoesNotExist:
+        messages.error(request, "Relation de suivi introuvable.")
+
+    return redirect('alist_followed_users')
+
 
 # Vérifie si l'utilisateur est le propriétaire du ticket.
 # def user_is_ticket_owner(ticket, user):